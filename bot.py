@@ -8,10 +8,22 @@ import hashlib
 import html
 import difflib
 import io
+import sys
 import math
+import heapq
+import bisect
+import array
+import struct
+import itertools
+import urllib.parse
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, List, Tuple, Any, Callable, Awaitable, Iterable
 from datetime import datetime, timedelta, timezone
 
 import discord
@@ -36,6 +48,12 @@ except ImportError:
     print("[WARN] yt-dlp yüklenemedi. Müzik özellikleri devre dışı.")
     YTDLP_OK = False
 
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    INOTIFY_OK = True
+except ImportError:
+    INOTIFY_OK = False  # activity_state.json izleme mtime/size kontrolüne düşer
+
 # =========================================================
 #                  ACHIEVEMENTS SYSTEM (DEVRE DIŞI)
 # =========================================================
@@ -105,6 +123,236 @@ def get_albion_item_image_url(item_id: str, quality: int = 1) -> str:
     """Item görsel URL'si döndür."""
     return f"https://render.albiononline.com/v1/item/{item_id}.png?quality={quality}"
 
+# =========================================================
+#                  STATE STORAGE (JSON / SQLite)
+# =========================================================
+# STATE_BACKEND=json   -> her alt sistem kendi JSON dosyasında (varsayılan, eski davranış)
+# STATE_BACKEND=sqlite -> tek SQLite (WAL) veritabanı; alt sistem başına tablo, satır bazlı yazım
+STATE_BACKEND = (os.getenv("STATE_BACKEND", "json") or "json").strip().lower()
+STATE_DB_FILE = os.getenv("STATE_DB_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state.db"))
+# activity_state.json harici voice tracker tarafından yazılıyorsa JSON'da kalmalı
+# (VOICE_TRACKER=1 ile dahili tracker kullanılıyorsa activity de SQLite'a geçer)
+STATE_DB_ACTIVITY = os.getenv("STATE_DB_ACTIVITY", "0").strip() in ("1", "true", "True", "yes")
+
+class StateDB:
+    """Bot state'leri için SQLite (WAL) deposu.
+    Her alt sistem (key TEXT PRIMARY KEY, value JSON) şeklinde kendi tablosunda durur.
+    SPLIT'teki alt sistemlerde iç içe sözlük (ör. "users") satır satır saklanır ("users/<id>").
+    Tüm erişim tek bir özel thread'den yapılır; kaydetmede sadece değişen satırlar yazılır/silinir."""
+
+    SPLIT: Dict[str, Optional[str]] = {
+        "puan": "users",
+        "activity": "users",
+        "tickets": None,
+        "loot_sessions": None,
+        "player_links": None,
+        "sheet_events": None,
+        "killbot": None,
+        "battleboard": None,
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ex = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._rows: Dict[str, Dict[str, str]] = {}  # tablo -> {key: son yazılan json}
+        self._imported: set = set()  # eski JSON kontrolü yapılmış tablolar
+        # metrics
+        self.saves = 0
+        self.rows_written = 0
+        self.rows_deleted = 0
+        self.migrated: List[str] = []
+
+    # ---- db thread ----
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            for table in self.SPLIT:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL) WITHOUT ROWID")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _encode(self, table: str, doc: Dict[str, Any]) -> Dict[str, str]:
+        split = self.SPLIT[table]
+        rows: Dict[str, str] = {}
+        for k, v in doc.items():
+            if split and k == split and isinstance(v, dict):
+                for sk, sv in v.items():
+                    rows[f"{k}/{sk}"] = json.dumps(sv, ensure_ascii=False, sort_keys=True)
+            else:
+                rows[str(k)] = json.dumps(v, ensure_ascii=False, sort_keys=True)
+        return rows
+
+    def _decode(self, table: str, rows: Dict[str, str]) -> Dict[str, Any]:
+        split = self.SPLIT[table]
+        doc: Dict[str, Any] = {split: {}} if split else {}
+        for k, v in rows.items():
+            if split and k.startswith(split + "/"):
+                doc[split][k[len(split) + 1:]] = json.loads(v)
+            else:
+                doc[k] = json.loads(v)
+        return doc
+
+    def _read_rows(self, table: str) -> Dict[str, str]:
+        if table not in self._rows:
+            cur = self._db().execute(f"SELECT key, value FROM {table}")
+            self._rows[table] = {k: v for k, v in cur.fetchall()}
+        return self._rows[table]
+
+    def _apply(self, table: str, rows: Dict[str, str]) -> Tuple[int, int]:
+        conn = self._db()
+        old = self._read_rows(table)
+        upserts = [(k, v, time.time()) for k, v in rows.items() if old.get(k) != v]
+        deletes = [(k,) for k in old if k not in rows]
+        if upserts or deletes:
+            with conn:
+                if upserts:
+                    conn.executemany(
+                        f"INSERT INTO {table} (key, value, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany(f"DELETE FROM {table} WHERE key = ?", deletes)
+            self._rows[table] = dict(rows)
+        self.saves += 1
+        self.rows_written += len(upserts)
+        self.rows_deleted += len(deletes)
+        return len(upserts), len(deletes)
+
+    def _import_json(self, table: str, path: str, list_key: Optional[str], force: bool) -> bool:
+        conn = self._db()
+        flag = f"migrated:{table}"
+        if not force and table in self._imported:
+            return False
+        self._imported.add(table)
+        if not force and conn.execute("SELECT 1 FROM meta WHERE key = ?", (flag,)).fetchone():
+            return False
+        data: Any = None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        if isinstance(data, list) and list_key:
+            data = {str(item.get(list_key)): item for item in data if isinstance(item, dict)}
+        if isinstance(data, dict) and (force or not self._read_rows(table)):
+            self._apply(table, self._encode(table, data))
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (flag, path or ""))
+        if isinstance(data, dict):
+            self.migrated.append(table)
+            print(f"[STATE] {table}: {path} -> {self.path}")
+        return isinstance(data, dict)
+
+    def _load(self, table: str, legacy_path: str, list_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        self._import_json(table, legacy_path, list_key, False)
+        rows = self._read_rows(table)
+        return self._decode(table, rows) if rows else None
+
+    # ---- public ----
+    def load(self, table: str, legacy_path: str = "", list_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Alt sistemin state'ini döndürür (yoksa None). İlk erişimde eski JSON dosyası içe aktarılır."""
+        return self._ex.submit(self._load, table, legacy_path, list_key).result()
+
+    def save(self, table: str, doc: Dict[str, Any], wait: bool = False) -> None:
+        """State'i kaydeder; satırlar çağıran thread'de kodlanır, yazım db thread'inde sırayla yapılır."""
+        rows = self._encode(table, doc)
+        fut = self._ex.submit(self._apply, table, rows)
+        if wait:
+            fut.result()
+        else:
+            fut.add_done_callback(lambda f: f.exception() and print(f"[STATE] {table} kaydetme hatası: {f.exception()}"))
+
+    def get(self, table: str, key: str, legacy_path: str = "") -> Optional[Any]:
+        """Tek satırı (indeksli) okur, ör. get("puan", "users/123")."""
+        return self._ex.submit(self._get, table, key, legacy_path).result()
+
+    def _get(self, table: str, key: str, legacy_path: str = "") -> Optional[Any]:
+        if legacy_path:
+            self._import_json(table, legacy_path, None, False)
+        rows = self._rows.get(table)
+        if rows is not None:  # tablo zaten okunduysa sadece o satır decode edilir
+            raw = rows.get(key)
+        else:
+            row = self._db().execute(f"SELECT value FROM {table} WHERE key = ?", (key,)).fetchone()
+            raw = row[0] if row else None
+        return json.loads(raw) if raw is not None else None
+
+    def _patch(self, table: str, fns: Dict[str, Callable[[Optional[Any]], Any]], legacy_path: str = "") -> Dict[str, Any]:
+        """Verilen satırları db thread'inde oku-değiştir-yaz (tek thread'de sıralı olduğu için atomik);
+        tüm tablo decode/encode edilmez, sadece değişen satırlar tek transaction'da yazılır."""
+        if legacy_path:
+            self._import_json(table, legacy_path, None, False)
+        rows = self._read_rows(table)
+        out: Dict[str, Any] = {}
+        upserts = []
+        for key, fn in fns.items():
+            old = rows.get(key)
+            value = out[key] = fn(json.loads(old) if old is not None else None)
+            raw = json.dumps(value, ensure_ascii=False, sort_keys=True)
+            if raw != old:
+                upserts.append((key, raw, time.time()))
+        if upserts:
+            conn = self._db()
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO {table} (key, value, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+                    upserts,
+                )
+            for key, raw, _ in upserts:
+                rows[key] = raw
+        self.rows_written += len(upserts)
+        return out
+
+    def patch(self, table: str, fns: Dict[str, Callable[[Optional[Any]], Any]], legacy_path: str = "") -> Dict[str, Any]:
+        return self._ex.submit(self._patch, table, fns, legacy_path).result()
+
+    # ---- event loop için (db thread'i beklenirken loop bloklanmaz) ----
+    async def aload(self, table: str, legacy_path: str = "", list_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return await asyncio.wrap_future(self._ex.submit(self._load, table, legacy_path, list_key))
+
+    async def asave(self, table: str, doc: Dict[str, Any]) -> None:
+        rows = self._encode(table, doc)
+        await asyncio.wrap_future(self._ex.submit(self._apply, table, rows))
+
+    async def aget(self, table: str, key: str, legacy_path: str = "") -> Optional[Any]:
+        return await asyncio.wrap_future(self._ex.submit(self._get, table, key, legacy_path))
+
+    async def apatch(self, table: str, fns: Dict[str, Callable[[Optional[Any]], Any]], legacy_path: str = "") -> Dict[str, Any]:
+        """{key: fn(eski değer) -> yeni değer}; `fn`'ler db thread'inde çalışır."""
+        return await asyncio.wrap_future(self._ex.submit(self._patch, table, fns, legacy_path))
+
+    def import_json(self, table: str, path: str, list_key: Optional[str] = None, force: bool = True) -> bool:
+        return self._ex.submit(self._import_json, table, path, list_key, force).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "saves": self.saves, "rows_written": self.rows_written,
+                "rows_deleted": self.rows_deleted, "migrated": list(self.migrated)}
+
+    def close(self) -> None:
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        try:
+            self._ex.submit(_close).result()
+        finally:
+            self._ex.shutdown(wait=True)
+
+STATE_DB: Optional[StateDB] = StateDB(STATE_DB_FILE) if STATE_BACKEND == "sqlite" else None
+
+def _state_db_for(table: str) -> Optional[StateDB]:
+    """Alt sistem SQLite'ta tutuluyorsa StateDB'yi döndürür, JSON'daysa None."""
+    if STATE_DB is None:
+        return None
+    if table == "activity" and not (STATE_DB_ACTIVITY or VOICE_TRACKER_ENABLED):
+        return None
+    return STATE_DB
+
 # =========================================================
 #                  PLAYER LINK SYSTEM (Basit)
 # =========================================================
@@ -113,7 +361,7 @@ from dataclasses import dataclass, asdict
 from pathlib import Path
 import json
 
-_LINKS_FILE = Path(__file__).parent / "player_links.json"
+_LINKS_FILE = Path(__file__).parent / os.getenv("PLAYER_LINKS_FILE", "player_links.json")
 
 @dataclass
 class PlayerLink:
@@ -129,8 +377,14 @@ _albion_to_discord: Dict[str, int] = {}  # albion_id -> discord_id
 def _load_player_links():
     global _player_links, _albion_to_discord
     try:
-        if _LINKS_FILE.exists():
+        db = _state_db_for("player_links")
+        if db is not None:
+            data = db.load("player_links", str(_LINKS_FILE), list_key="discord_id")
+        elif _LINKS_FILE.exists():
             data = json.loads(_LINKS_FILE.read_text(encoding="utf-8"))
+        else:
+            data = None
+        if data:
             
             # Liste formatı (yeni format)
             if isinstance(data, list):
@@ -183,13 +437,17 @@ def _load_player_links():
             print(f"[LINK] {len(_player_links)} oyuncu bağlantısı yüklendi.")
             
             # Yeni formata kaydet
-            if _player_links:
+            if _player_links and db is None:
                 _save_player_links()
     except Exception as e:
         print(f"[LINK] Yükleme hatası: {e}")
 
 def _save_player_links():
     try:
+        db = _state_db_for("player_links")
+        if db is not None:
+            db.save("player_links", {str(k): asdict(v) for k, v in _player_links.items()})
+            return
         data = [asdict(link) for link in _player_links.values()]
         _LINKS_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
     except Exception as e:
@@ -264,198 +522,6 @@ except ImportError:
     print("[WARN] panel_bridge.py bulunamadı, panel entegrasyonu devre dışı.")
     _PANEL_BRIDGE_OK = False
 
-# =========================
-# Battleboard (AlbionBB list + AO API rows) - py3.8 safe
-# =========================
-BATTLEBOARD_CHANNEL_ID = int(os.getenv("BATTLEBOARD_CHANNEL_ID", "1456372978995433706"))
-# Uses your guild id already present in env (AO_GUILD_ID). Falls back to CALLIDUS guild id if missing.
-_AO_GID = os.getenv("AO_GUILD_ID", "A8Iv8vP2RLOWg5u5rUDZJA")
-ALBIONBB_GUILD_BATTLES_URL = os.getenv(
-    "ALBIONBB_GUILD_BATTLES_URL",
-    "https://europe.albionbb.com/guilds/%s/battles?minPlayers=5" % _AO_GID
-)
-BATTLEBOARD_POLL_SECONDS = int(os.getenv("BATTLEBOARD_POLL_SECONDS", "60"))
-MIN_CALLIDUS_PLAYERS = int(os.getenv("MIN_CALLIDUS_PLAYERS", "6"))
-AO_API_BASE = os.getenv("AO_API_BASE", "https://gameinfo-ams.albiononline.com/api/gameinfo").rstrip("/")
-_BB_STATE_FILE = os.getenv("BATTLEBOARD_STATE_FILE", "battleboard_state.json")
-
-def _bb_log(msg: str) -> None:
-    try:
-        print("[BB]", msg)
-    except Exception:
-        pass
-
-def _bb_load_state() -> Dict[str, Any]:
-    try:
-        from pathlib import Path
-        import json
-        return json.loads(Path(_BB_STATE_FILE).read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-def _bb_save_state(st: Dict[str, Any]) -> None:
-    try:
-        from pathlib import Path
-        import json
-        Path(_BB_STATE_FILE).write_text(json.dumps(st, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-def _bb_albionbb_link(battle_id: int) -> str:
-    return "https://europe.albionbb.com/battles/%s" % int(battle_id)
-
-def _bb_fmt_k(n: int) -> str:
-    try:
-        n = int(n)
-    except Exception:
-        return str(n)
-    if n >= 1_000_000:
-        return ("%0.1fm" % (n / 1_000_000)).rstrip("0").rstrip(".")
-    if n >= 1_000:
-        return "%dk" % int(round(n / 1000.0))
-    return str(n)
-
-async def _bb_http_text(url: str) -> Optional[str]:
-    try:
-        import aiohttp
-        async with aiohttp.ClientSession(headers={"User-Agent": "CALLIDUS-DiscordBot/1.0"}) as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as resp:
-                if resp.status != 200:
-                    return None
-                return await resp.text()
-    except Exception:
-        return None
-
-async def _bb_http_json(url: str) -> Optional[Dict[str, Any]]:
-    try:
-        import aiohttp
-        async with aiohttp.ClientSession(headers={"User-Agent": "CALLIDUS-DiscordBot/1.0"}) as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as resp:
-                if resp.status != 200:
-                    return None
-                j = await resp.json()
-                return j if isinstance(j, dict) else None
-    except Exception:
-        return None
-
-async def _bb_pick_battle_id(n: int) -> Optional[int]:
-    """
-    n is 1-based: 1=latest, 2=previous, ...
-    We only use AlbionBB for LISTING (battle ids) because its battle detail pages are JS-rendered.
-    """
-    txt = await _bb_http_text(ALBIONBB_GUILD_BATTLES_URL)
-    if not txt:
-        return None
-    ids = re.findall(r"/battles/(\d+)", txt)
-    if not ids:
-        return None
-    seen: List[str] = []
-    for x in ids:
-        if x not in seen:
-            seen.append(x)
-    idx = max(0, int(n) - 1)
-    if idx >= len(seen):
-        return None
-    return int(seen[idx])
-
-def _bb_rows_from_ao(detail: Dict[str, Any]) -> List[Dict[str, Any]]:
-    guilds = detail.get("guilds") or {}
-    players = detail.get("players") or {}
-    counts: Dict[str, int] = {}
-    for p in players.values():
-        gid = (p.get("guildId") or "").strip()
-        if gid:
-            counts[gid] = counts.get(gid, 0) + 1
-
-    rows: List[Dict[str, Any]] = []
-    for gid, g in guilds.items():
-        rows.append({
-            "guild": g.get("name") or "Unknown",
-            "alliance": g.get("alliance") or "-",
-            "players": int(counts.get(gid, 0)),
-            "kills": int(g.get("kills") or 0),
-            "deaths": int(g.get("deaths") or 0),
-            "fame": int(g.get("killFame") or 0),
-        })
-    rows.sort(key=lambda r: (r["fame"], r["kills"]), reverse=True)
-    return rows
-
-def _bb_callidus_players(detail: Dict[str, Any]) -> int:
-    gid = (os.getenv("AO_GUILD_ID", "") or "").strip() or (globals().get("_AO_GID") or "")
-    if not gid:
-        return 0
-    players = detail.get("players") or {}
-    c = 0
-    for p in players.values():
-        if (p.get("guildId") or "").strip() == gid:
-            c += 1
-    return c
-
-
-def _bb_table(rows: List[Dict[str, Any]]) -> str:
-    top = rows[:10]
-    gw = min(20, max([5] + [len(r["guild"]) for r in top]))
-    aw = min(10, max([7] + [len((r.get("alliance") or "-")) for r in top]))
-    head = f'{"Guild":<{gw}}  {"Alliance":<{aw}}  {"P":>2}  {"K":>2}  {"D":>2}  {"Fame":>6}'
-    lines = [head]
-    for r in top:
-        g = r["guild"]
-        a = r.get("alliance") or "-"
-        if len(g) > gw:
-            g = g[:gw-1] + "…"
-        if len(a) > aw:
-            a = a[:aw-1] + "…"
-        lines.append(f'{g:<{gw}}  {a:<{aw}}  {r["players"]:>2}  {r["kills"]:>2}  {r["deaths"]:>2}  {_bb_fmt_k(r["fame"]):>6}')
-    return "```\n" + "\n".join(lines) + "\n```"
-
-async def _bb_post_battleboard(client: discord.Client, battle_id: int) -> bool:
-    detail = await _bb_http_json("%s/battles/%s" % (AO_API_BASE, int(battle_id)))
-    if not detail:
-        return False
-    callidus_p = _bb_callidus_players(detail)
-    if callidus_p < MIN_CALLIDUS_PLAYERS:
-        return False
-    rows = _bb_rows_from_ao(detail)
-    if not rows:
-        return False
-
-    ch = client.get_channel(BATTLEBOARD_CHANNEL_ID)
-    if ch is None:
-        return False
-
-    total_fame = int(detail.get("totalFame") or 0)
-    total_kills = int(detail.get("totalKills") or 0)
-
-    embed = discord.Embed(
-        title="Battle #%s" % int(battle_id),
-        description=_bb_table(rows)
-    )
-    embed.add_field(name="Toplam", value="Fame: **%s** | Öldürme: **%s**" % (_bb_fmt_k(total_fame), total_kills), inline=False)
-    embed.add_field(name="Link", value=_bb_albionbb_link(battle_id), inline=False)
-
-    await ch.send(embed=embed)
-    return True
-
-async def _bb_worker(client: discord.Client):
-    await client.wait_until_ready()
-    st = _bb_load_state()
-    last = int(st.get("last_battle_id") or 0)
-
-    while not client.is_closed():
-        try:
-            battle_id = await _bb_pick_battle_id(1)
-            if battle_id and battle_id > last:
-                ok = await _bb_post_battleboard(client, battle_id)
-                # Advance state even if we skip (e.g., CALLIDUS players < threshold)
-                last = battle_id
-                st["last_battle_id"] = last
-                _bb_save_state(st)
-        except Exception as e:
-            _bb_log("worker error: %r" % (e,))
-        await asyncio.sleep(BATTLEBOARD_POLL_SECONDS)
-
-
-
 TOKEN = os.getenv("DISCORD_TOKEN", "")
 GUILD_ID = int(os.getenv("GUILD_ID", "0"))
 PING_ROLE_ID = int(os.getenv("PING_ROLE_ID", "0"))
@@ -599,6 +665,17 @@ LEAVE_LOG_CHANNEL_ID = 1445358898726047744  # Ayrılan üyeler log kanalı
 ACTIVITY_STATE_FILE = os.getenv("ACTIVITY_STATE_FILE", os.path.join(BASE_DIR, "activity_state.json"))
 ACTIVITY_INACTIVITY_DAYS = 5  # Kaç gün sonra DM gönderilsin
 
+# Dahili voice tracker (harici voice_tracker_bot.py yerine). Açıkken harici bot kapatılmalı.
+VOICE_TRACKER_ENABLED = os.getenv("VOICE_TRACKER", "0").strip() in ("1", "true", "True", "yes")
+VOICE_TRACKER_FLUSH_SECONDS = int(os.getenv("VOICE_TRACKER_FLUSH_SECONDS", "60"))
+# JSON backend'de voice_minutes activity_state.json'a en fazla bu aralıkla yazılır (puan her flush'ta işlenir)
+VOICE_TRACKER_SAVE_SECONDS = int(os.getenv("VOICE_TRACKER_SAVE_SECONDS", "300"))
+VOICE_TRACKER_COUNT_MUTED = os.getenv("VOICE_TRACKER_COUNT_MUTED", "1").strip() in ("1", "true", "True", "yes")
+VOICE_TRACKER_MIN_MEMBERS = int(os.getenv("VOICE_TRACKER_MIN_MEMBERS", "1"))  # kanalda en az kaç kişi (bot hariç)
+VOICE_TRACKER_EXCLUDED_CHANNELS = {
+    int(x) for x in os.getenv("VOICE_TRACKER_EXCLUDED_CHANNELS", "").replace(" ", "").split(",") if x.isdigit()
+}
+
 
 # =========================================================
 #           PUAN SİSTEMİ (Voice Tabanlı - Modüler)
@@ -606,7 +683,7 @@ ACTIVITY_INACTIVITY_DAYS = 5  # Kaç gün sonra DM gönderilsin
 """
 Puan Sistemi Kuralları:
 - Voice verisi ayrı Voice Tracker Bot tarafından activity_state.json'a yazılır
-- Bu bot sadece voice verisini OKUR
+  (VOICE_TRACKER=1 ise bu bot kendisi sayar, bkz. VoiceTracker)
 - 1 puan = 2 dakika (0.5 puan/dakika)
 - Günlük maksimum: 60 puan (120 dakika puan kazandırır)
 - Her gün TR 00:00'da günlük limitler sıfırlanır
@@ -626,70 +703,423 @@ PUAN_KICK_THRESHOLD = -5000     # Kick eşiği (otomatik değil)
 # Puan Log Kanalı (opsiyonel)
 PUAN_LOG_CHANNEL_ID = int(os.getenv("PUAN_LOG_CHANNEL_ID", "0"))
 
+# Değişikliklerden sonra diske yazmadan önce beklenen süre (art arda değişiklikler tek yazım)
+PUAN_FLUSH_DELAY = float(os.getenv("PUAN_FLUSH_DELAY", "5"))
+# Günlük voice/content/puan geçmişi (kompakt binary zaman serisi)
+PUAN_HISTORY_FILE = os.path.join(BASE_DIR, os.getenv("PUAN_HISTORY_FILE", "puan_history.bin"))
+
+class LeaderboardIndex:
+    """Skora göre sıralı indeks (sıralama komutları için).
+    (-skor, user_id) çiftleri sıralı listede tutulur: sıra sorgusu bisect ile O(log n),
+    top-N / sayfa dilimleme ile, güncelleme bisect + tek eleman kaydırma.
+    Eşit skorda user_id'ye göre sabit sıra."""
+
+    def __init__(self):
+        self._keys: List[Tuple[float, int]] = []
+        self._score: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, user_id: int, score: float) -> None:
+        old = self._score.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            i = bisect.bisect_left(self._keys, (-old, user_id))
+            del self._keys[i]
+        bisect.insort(self._keys, (-score, user_id))
+        self._score[user_id] = score
+
+    def remove(self, user_id: int) -> None:
+        old = self._score.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, user_id))]
+
+    def rebuild(self, items) -> None:
+        self._score = {uid: score for uid, score in items}
+        self._keys = sorted((-score, uid) for uid, score in self._score.items())
+
+    def score(self, user_id: int) -> Optional[float]:
+        return self._score.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1'den başlayan sıra (indekste yoksa None)."""
+        score = self._score.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._keys, (-score, user_id)) + 1
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, float]]:
+        return [(uid, -neg) for neg, uid in self._keys[offset:offset + limit]]
+
+@dataclass
+class PuanUser:
+    """puan_state.json'daki tek kullanıcı kaydı."""
+    total_points: float = 0.0           # Toplam puan (tüm zamanlar)
+    daily_points: float = 0.0           # Bugün kazanılan puan
+    daily_minutes_counted: int = 0      # Bugün sayılan dakika
+    last_voice_minutes: int = 0         # Son okunan voice_minutes değeri
+    last_update_date: Optional[str] = None  # Son güncelleme tarihi
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "PuanUser":
+        return cls(
+            total_points=float(d.get("total_points", 0.0) or 0.0),
+            daily_points=float(d.get("daily_points", 0.0) or 0.0),
+            daily_minutes_counted=int(d.get("daily_minutes_counted", 0) or 0),
+            last_voice_minutes=int(d.get("last_voice_minutes", 0) or 0),
+            last_update_date=d.get("last_update_date"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_points": self.total_points,
+            "daily_points": self.daily_points,
+            "daily_minutes_counted": self.daily_minutes_counted,
+            "last_voice_minutes": self.last_voice_minutes,
+            "last_update_date": self.last_update_date,
+        }
+
+class PuanStore:
+    """Puan verisinin bellekteki tek kaynağı.
+    Dosya ilk erişimde bir kez okunur; değişiklikler mark_dirty() ile işaretlenir ve
+    PUAN_FLUSH_DELAY sonra tek atomik yazımla (disk havuzu) diske gider."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.users: Dict[str, PuanUser] = {}
+        self.last_reset_date: Optional[str] = None
+        self.warned_users: List[str] = []
+        self.kick_warned_users: List[str] = []
+        self._extra: Dict[str, Any] = {}  # bilinmeyen üst seviye alanlar (olduğu gibi geri yazılır)
+        self.leaderboard = LeaderboardIndex()  # toplam puana göre sıralı (/puan-top)
+        self._loaded = False
+        self.dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # metrics
+        self.mutations = 0
+        self.flushes = 0
+
+    def _ensure(self) -> "PuanStore":
+        if not self._loaded:
+            data: Dict[str, Any] = {}
+            try:
+                db = _state_db_for("puan")
+                if db is not None:
+                    data = db.load("puan", self.path) or {}
+                elif os.path.exists(self.path):
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f) or {}
+            except Exception as e:
+                print(f"[PUAN] State yükleme hatası: {e}")
+            self._apply(data)
+            self._loaded = True
+        return self
+
+    def _apply(self, data: Dict[str, Any]) -> None:
+        users = data.get("users") or {}
+        self.users = {str(k): PuanUser.from_dict(v) for k, v in users.items() if isinstance(v, dict)}
+        self.last_reset_date = data.get("last_reset_date")
+        self.warned_users = [str(x) for x in data.get("warned_users") or []]
+        self.kick_warned_users = [str(x) for x in data.get("kick_warned_users") or []]
+        self._extra = {k: v for k, v in data.items()
+                       if k not in ("users", "last_reset_date", "warned_users", "kick_warned_users")}
+        self.reindex()
+
+    def reindex(self) -> None:
+        """Sıralama indeksini baştan kurar (yükleme / toplu değişiklik sonrası)."""
+        self.leaderboard.rebuild((int(uid), u.total_points) for uid, u in self.users.items() if uid.isdigit())
+
+    def touch(self, user_id: Any) -> None:
+        """Tek kullanıcının değiştiğini bildirir: sıralama güncellenir, store kaydedilecek olarak işaretlenir."""
+        u = self.users.get(str(user_id))
+        if u is not None and str(user_id).isdigit():
+            self.leaderboard.update(int(user_id), u.total_points)
+        self.mark_dirty()
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._ensure()
+        out = dict(self._extra)
+        out.update({
+            "users": {uid: u.to_dict() for uid, u in self.users.items()},
+            "last_reset_date": self.last_reset_date,
+            "warned_users": list(self.warned_users),
+            "kick_warned_users": list(self.kick_warned_users),
+        })
+        return out
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        """Dict halindeki state'i (panel köprüsü vb.) store'a uygular."""
+        self._ensure()
+        self._apply(data)
+        self.mark_dirty()
+
+    def get(self, user_id: Any) -> Optional[PuanUser]:
+        return self._ensure().users.get(str(user_id))
+
+    def user(self, user_id: Any) -> PuanUser:
+        """Kullanıcının kaydını döndürür, yoksa oluşturur (oluşturmak tek başına kaydettirmez)."""
+        users = self._ensure().users
+        uid = str(user_id)
+        u = users.get(uid)
+        if u is None:
+            u = users[uid] = PuanUser()
+        return u
+
+    def all_users(self) -> Dict[str, PuanUser]:
+        return self._ensure().users
+
+    def reset_daily_if_needed(self) -> bool:
+        """
+        TR 00:00 reset kontrolü yapar.
+        Eğer yeni gün başladıysa tüm günlük sayaçları sıfırlar.
+        Returns: True if reset yapıldı
+        """
+        self._ensure()
+        today = _get_today_tr()
+        if self.last_reset_date == today:
+            return False
+        print(f"[PUAN] Günlük reset yapılıyor: {self.last_reset_date} -> {today}")
+        for u in self.users.values():
+            u.daily_points = 0.0
+            u.daily_minutes_counted = 0
+            # last_voice_minutes'ı SIFIRLAMIYORUZ - fark hesabı için gerekli
+        self.last_reset_date = today
+        self.mark_dirty()
+        return True
+
+    # ---- persistence ----
+    def mark_dirty(self) -> None:
+        self.dirty = True
+        self.mutations += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # event loop dışı (script/araç): hemen yaz
+            self._write(self.to_dict())
+            self.dirty = False
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(PUAN_FLUSH_DELAY, lambda: asyncio.ensure_future(self.flush()))
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        db = _state_db_for("puan")
+        if db is not None:
+            db.save("puan", data, wait=True)  # sadece değişen kullanıcı satırları yazılır
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    async def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self.dirty:
+                return
+            data = self.to_dict()  # snapshot event loop thread'inde alınır
+            self.dirty = False
+            try:
+                await run_io(self._write, data, pool="disk")
+                self.flushes += 1
+            except Exception as e:
+                print(f"[PUAN] State kaydetme hatası: {e}")
+                self.mark_dirty()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"users": len(self._ensure().users), "dirty": self.dirty,
+                "mutations": self.mutations, "flushes": self.flushes}
+
+PUAN_STORE = PuanStore(PUAN_STATE_FILE)
+
+class PuanHistory:
+    """Kullanıcı başına günlük zaman serisi: voice dakika, content sayısı, kazanılan puan.
+    Her kullanıcı için ilk günün ordinal'i + gün indeksli üç dizi (array 'I', 'H', 'f') tutulur;
+    bugüne yazmak O(1) (son eleman güncellenir, yeni gün eklenir), aralık sorgusu dilimlemedir.
+
+    Dosya formatı (little endian):
+      b"PHS1", u32 kullanıcı sayısı, sonra her kullanıcı için
+      u64 user_id, u32 başlangıç ordinal, u32 gün sayısı (n),
+      n*u32 dakika, n*u16 content, n*f32 puan"""
+
+    MAGIC = b"PHS1"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.users: Dict[int, Tuple[int, array.array, array.array, array.array]] = {}
+        self._loaded = False
+        self.dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    # ---- binary io ----
+    @staticmethod
+    def _le(arr: array.array) -> bytes:
+        if sys.byteorder != "little":
+            arr = array.array(arr.typecode, arr)
+            arr.byteswap()
+        return arr.tobytes()
+
+    @staticmethod
+    def _from_le(typecode: str, raw: bytes) -> array.array:
+        arr = array.array(typecode)
+        arr.frombytes(raw)
+        if sys.byteorder != "little":
+            arr.byteswap()
+        return arr
+
+    def _ensure(self) -> "PuanHistory":
+        if self._loaded:
+            return self
+        self._loaded = True
+        try:
+            if not os.path.exists(self.path):
+                return self
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            if raw[:4] != self.MAGIC:
+                print(f"[HISTORY] Tanınmayan dosya formatı: {self.path}")
+                return self
+            (count,) = struct.unpack_from("<I", raw, 4)
+            off = 8
+            for _ in range(count):
+                uid, start, n = struct.unpack_from("<QII", raw, off)
+                off += 16
+                mins = self._from_le("I", raw[off:off + 4 * n]); off += 4 * n
+                cont = self._from_le("H", raw[off:off + 2 * n]); off += 2 * n
+                pts = self._from_le("f", raw[off:off + 4 * n]); off += 4 * n
+                self.users[uid] = (start, mins, cont, pts)
+        except Exception as e:
+            print(f"[HISTORY] Yükleme hatası: {e}")
+        return self
+
+    def _encode(self) -> bytes:
+        parts = [self.MAGIC, struct.pack("<I", len(self.users))]
+        for uid, (start, mins, cont, pts) in self.users.items():
+            parts.append(struct.pack("<QII", uid, start, len(mins)))
+            parts += [self._le(mins), self._le(cont), self._le(pts)]
+        return b"".join(parts)
+
+    def _write(self, data: bytes) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def mark_dirty(self) -> None:
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._encode())
+            self.dirty = False
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(PUAN_FLUSH_DELAY, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:  # zamanlayıcı ve close() aynı .tmp dosyasına aynı anda yazmasın
+            if not self.dirty:
+                return
+            data = self._encode()  # snapshot event loop thread'inde
+            self.dirty = False
+            try:
+                await run_io(self._write, data, pool="disk")
+            except Exception as e:
+                print(f"[HISTORY] Kaydetme hatası: {e}")
+                self.mark_dirty()
+
+    # ---- kayıt ----
+    def _slot(self, user_id: int, day: str) -> Tuple[Tuple[int, array.array, array.array, array.array], int]:
+        """Kullanıcının serisinde günün indeksini döndürür; gerekirse seriyi o güne kadar uzatır."""
+        ordinal = datetime.strptime(day, "%Y-%m-%d").toordinal()
+        rec = self._ensure().users.get(user_id)
+        if rec is None:
+            rec = self.users[user_id] = (ordinal, array.array("I"), array.array("H"), array.array("f"))
+        start, mins, cont, pts = rec
+        if ordinal < start:
+            # geçmişe dönük kayıt (nadiren): seri başa doğru genişletilir
+            pad = start - ordinal
+            rec = self.users[user_id] = (
+                ordinal,
+                array.array("I", [0] * pad) + mins,
+                array.array("H", [0] * pad) + cont,
+                array.array("f", [0.0] * pad) + pts,
+            )
+            start, mins, cont, pts = rec
+        idx = ordinal - start
+        if idx >= len(mins):
+            gap = idx + 1 - len(mins)
+            mins.extend([0] * gap)
+            cont.extend([0] * gap)
+            pts.extend([0.0] * gap)
+        return rec, idx
+
+    def record_voice(self, user_id: int, day: str, minutes: int, points: float) -> None:
+        """Günün voice dakikasını ve kazanılan puanı yazar (günün güncel toplamları)."""
+        (_, mins, _, pts), idx = self._slot(int(user_id), day)
+        minutes = max(0, min(int(minutes), 0xFFFFFFFF))
+        if mins[idx] != minutes or pts[idx] != points:
+            mins[idx] = minutes
+            pts[idx] = points
+            self.mark_dirty()
+
+    def add_content(self, user_id: int, day: str, n: int = 1) -> None:
+        (_, _, cont, _), idx = self._slot(int(user_id), day)
+        cont[idx] = min(cont[idx] + n, 0xFFFF)
+        self.mark_dirty()
+
+    # ---- sorgu ----
+    def series(self, user_id: int, start_day: str, end_day: str) -> Dict[str, List]:
+        """[start_day, end_day] aralığı için gün gün seriler (veri olmayan günler 0)."""
+        a = datetime.strptime(start_day, "%Y-%m-%d").toordinal()
+        b = datetime.strptime(end_day, "%Y-%m-%d").toordinal()
+        n = max(0, b - a + 1)
+        out = {"minutes": [0] * n, "content": [0] * n, "points": [0.0] * n}
+        rec = self._ensure().users.get(int(user_id))
+        if rec is None or n == 0:
+            return out
+        start, mins, cont, pts = rec
+        lo, hi = max(a, start), min(b, start + len(mins) - 1)
+        if lo <= hi:
+            i, j = lo - start, hi - start + 1
+            k = lo - a
+            out["minutes"][k:k + j - i] = mins[i:j].tolist()
+            out["content"][k:k + j - i] = cont[i:j].tolist()
+            out["points"][k:k + j - i] = [round(x, 2) for x in pts[i:j]]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        users = self._ensure().users
+        return {"users": len(users), "days": sum(len(r[1]) for r in users.values()), "dirty": self.dirty}
+
+PUAN_HISTORY = PuanHistory(PUAN_HISTORY_FILE)
+
 def _load_puan_state() -> Dict[str, Any]:
-    """Puan state dosyasını yükler."""
-    try:
-        if os.path.exists(PUAN_STATE_FILE):
-            with open(PUAN_STATE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                # Yapı doğrulama
-                if "users" not in data:
-                    data["users"] = {}
-                if "last_reset_date" not in data:
-                    data["last_reset_date"] = None
-                return data
-    except Exception as e:
-        print(f"[PUAN] State yükleme hatası: {e}")
-    return {"users": {}, "last_reset_date": None, "warned_users": [], "kick_warned_users": []}
+    """Puan state'inin dict kopyası (panel köprüsü uyumluluğu; disk okunmaz)."""
+    return PUAN_STORE.to_dict()
 
 def _save_puan_state(state: Dict[str, Any]) -> None:
-    """Puan state dosyasını kaydeder."""
-    try:
-        with open(PUAN_STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[PUAN] State kaydetme hatası: {e}")
+    """Dict halindeki state'i store'a uygular; diske toplu yazım ile gider."""
+    PUAN_STORE.replace(state)
 
 def _get_today_tr() -> str:
     """Bugünün tarihini TR timezone'da döndürür (YYYY-MM-DD)."""
     now_tr = datetime.now(TR_TZ)
     return now_tr.strftime("%Y-%m-%d")
 
-def _get_user_puan_data(state: Dict[str, Any], user_id: int) -> Dict[str, Any]:
-    """Kullanıcının puan verisini döndürür, yoksa oluşturur."""
-    user_id_str = str(user_id)
-    if user_id_str not in state["users"]:
-        state["users"][user_id_str] = {
-            "total_points": 0.0,          # Toplam puan (tüm zamanlar)
-            "daily_points": 0.0,          # Bugün kazanılan puan
-            "daily_minutes_counted": 0,   # Bugün sayılan dakika
-            "last_voice_minutes": 0,      # Son okunan voice_minutes değeri
-            "last_update_date": None,     # Son güncelleme tarihi
-        }
-    return state["users"][user_id_str]
-
-def _check_and_reset_daily(state: Dict[str, Any]) -> bool:
-    """
-    TR 00:00 reset kontrolü yapar.
-    Eğer yeni gün başladıysa tüm günlük sayaçları sıfırlar.
-    Returns: True if reset yapıldı
-    """
-    today = _get_today_tr()
-    last_reset = state.get("last_reset_date")
-    
-    if last_reset != today:
-        print(f"[PUAN] Günlük reset yapılıyor: {last_reset} -> {today}")
-        
-        for user_id_str, user_data in state.get("users", {}).items():
-            user_data["daily_points"] = 0.0
-            user_data["daily_minutes_counted"] = 0
-            # last_voice_minutes'ı SIFIRLAMIYORUZ - fark hesabı için gerekli
-        
-        state["last_reset_date"] = today
-        return True
-    return False
-
-def _calculate_voice_points(user_id: int, current_voice_minutes: int, puan_state: Dict[str, Any]) -> Tuple[float, int]:
+def _calculate_voice_points(user_data: PuanUser, current_voice_minutes: int) -> Tuple[float, int]:
     """
     Voice dakikalarından puan hesaplar.
     
@@ -700,20 +1130,13 @@ def _calculate_voice_points(user_id: int, current_voice_minutes: int, puan_state
     - Günlük max 60 puan (120 dakika)
     - Günlük limit aşılırsa puan yazılmaz ama dakika sayılmaya devam eder
     """
-    user_data = _get_user_puan_data(puan_state, user_id)
-    
-    last_minutes = user_data.get("last_voice_minutes", 0) or 0
-    new_minutes = max(0, current_voice_minutes - last_minutes)
+    new_minutes = max(0, current_voice_minutes - user_data.last_voice_minutes)
     
     if new_minutes <= 0:
         return 0.0, 0
     
-    # Günlük limit kontrolü
-    daily_points = user_data.get("daily_points", 0.0) or 0.0
-    daily_minutes = user_data.get("daily_minutes_counted", 0) or 0
-    
     # Kalan puan kapasitesi
-    remaining_daily_points = max(0, PUAN_DAILY_MAX - daily_points)
+    remaining_daily_points = max(0, PUAN_DAILY_MAX - user_data.daily_points)
     remaining_daily_minutes = int(remaining_daily_points / PUAN_PER_MINUTE)
     
     # Sayılacak dakika (günlük limiti aşmayacak şekilde)
@@ -735,50 +1158,48 @@ def _update_user_points_from_voice(user_id: int, current_voice_minutes: int) ->
         "limit_reached": bool
     }
     """
-    puan_state = _load_puan_state()
-    
     # Günlük reset kontrolü
-    _check_and_reset_daily(puan_state)
+    PUAN_STORE.reset_daily_if_needed()
     
-    user_data = _get_user_puan_data(puan_state, user_id)
+    user_data = PUAN_STORE.user(user_id)
     today = _get_today_tr()
+    before = user_data.to_dict()
     
-    earned_points, new_minutes = _calculate_voice_points(user_id, current_voice_minutes, puan_state)
+    earned_points, new_minutes = _calculate_voice_points(user_data, current_voice_minutes)
     
     # Günlük limit kontrolü
-    daily_points_before = user_data.get("daily_points", 0.0) or 0.0
+    daily_points_before = user_data.daily_points
     limit_reached = (daily_points_before + earned_points) >= PUAN_DAILY_MAX
     
     # Güncelle
-    user_data["total_points"] = (user_data.get("total_points", 0.0) or 0.0) + earned_points
-    user_data["daily_points"] = min(PUAN_DAILY_MAX, daily_points_before + earned_points)
-    user_data["daily_minutes_counted"] = (user_data.get("daily_minutes_counted", 0) or 0) + new_minutes
-    user_data["last_voice_minutes"] = current_voice_minutes
-    user_data["last_update_date"] = today
+    user_data.total_points += earned_points
+    user_data.daily_points = min(PUAN_DAILY_MAX, daily_points_before + earned_points)
+    user_data.daily_minutes_counted += new_minutes
+    user_data.last_voice_minutes = current_voice_minutes
+    user_data.last_update_date = today
     
-    _save_puan_state(puan_state)
+    if user_data.to_dict() != before:
+        PUAN_STORE.touch(user_id)
+        PUAN_HISTORY.record_voice(user_id, today, user_data.daily_minutes_counted, user_data.daily_points)
     
     return {
         "earned_points": earned_points,
-        "total_points": user_data["total_points"],
-        "daily_points": user_data["daily_points"],
-        "daily_minutes": user_data["daily_minutes_counted"],
+        "total_points": user_data.total_points,
+        "daily_points": user_data.daily_points,
+        "daily_minutes": user_data.daily_minutes_counted,
         "new_minutes": new_minutes,
         "limit_reached": limit_reached
     }
 
 def _get_user_total_points(user_id: int) -> float:
     """Kullanıcının toplam puanını döndürür."""
-    puan_state = _load_puan_state()
-    user_data = _get_user_puan_data(puan_state, user_id)
-    return user_data.get("total_points", 0.0) or 0.0
+    u = PUAN_STORE.get(user_id)
+    return u.total_points if u else 0.0
 
 def _set_user_total_points(user_id: int, points: float) -> None:
     """Kullanıcının toplam puanını manuel ayarlar."""
-    puan_state = _load_puan_state()
-    user_data = _get_user_puan_data(puan_state, user_id)
-    user_data["total_points"] = points
-    _save_puan_state(puan_state)
+    PUAN_STORE.user(user_id).total_points = points
+    PUAN_STORE.touch(user_id)
 
 def _check_puan_thresholds(user_id: int) -> Dict[str, Any]:
     """
@@ -792,56 +1213,37 @@ def _check_puan_thresholds(user_id: int) -> Dict[str, Any]:
         "already_kick_warned": bool
     }
     """
-    puan_state = _load_puan_state()
-    user_data = _get_user_puan_data(puan_state, user_id)
-    total_points = user_data.get("total_points", 0.0) or 0.0
-    
+    total_points = _get_user_total_points(user_id)
     user_id_str = str(user_id)
-    warned_users = puan_state.get("warned_users", [])
-    kick_warned_users = puan_state.get("kick_warned_users", [])
-    
-    needs_warning = total_points <= PUAN_WARNING_THRESHOLD
-    needs_kick_warning = total_points <= PUAN_KICK_THRESHOLD
-    already_warned = user_id_str in warned_users
-    already_kick_warned = user_id_str in kick_warned_users
     
     return {
         "total_points": total_points,
-        "needs_warning": needs_warning,
-        "needs_kick_warning": needs_kick_warning,
-        "already_warned": already_warned,
-        "already_kick_warned": already_kick_warned
+        "needs_warning": total_points <= PUAN_WARNING_THRESHOLD,
+        "needs_kick_warning": total_points <= PUAN_KICK_THRESHOLD,
+        "already_warned": user_id_str in PUAN_STORE.warned_users,
+        "already_kick_warned": user_id_str in PUAN_STORE.kick_warned_users
     }
 
 def _mark_user_warned(user_id: int, warn_type: str = "warning") -> None:
     """Kullanıcıyı uyarıldı olarak işaretler."""
-    puan_state = _load_puan_state()
+    PUAN_STORE._ensure()
     user_id_str = str(user_id)
-    
-    if warn_type == "kick":
-        if "kick_warned_users" not in puan_state:
-            puan_state["kick_warned_users"] = []
-        if user_id_str not in puan_state["kick_warned_users"]:
-            puan_state["kick_warned_users"].append(user_id_str)
-    else:
-        if "warned_users" not in puan_state:
-            puan_state["warned_users"] = []
-        if user_id_str not in puan_state["warned_users"]:
-            puan_state["warned_users"].append(user_id_str)
-    
-    _save_puan_state(puan_state)
+    lst = PUAN_STORE.kick_warned_users if warn_type == "kick" else PUAN_STORE.warned_users
+    if user_id_str not in lst:
+        lst.append(user_id_str)
+        PUAN_STORE.mark_dirty()
 
 def _clear_user_warnings(user_id: int) -> None:
     """Kullanıcının uyarılarını temizler (puan yükseldiğinde)."""
-    puan_state = _load_puan_state()
+    PUAN_STORE._ensure()
     user_id_str = str(user_id)
-    
-    if user_id_str in puan_state.get("warned_users", []):
-        puan_state["warned_users"].remove(user_id_str)
-    if user_id_str in puan_state.get("kick_warned_users", []):
-        puan_state["kick_warned_users"].remove(user_id_str)
-    
-    _save_puan_state(puan_state)
+    changed = False
+    for lst in (PUAN_STORE.warned_users, PUAN_STORE.kick_warned_users):
+        if user_id_str in lst:
+            lst.remove(user_id_str)
+            changed = True
+    if changed:
+        PUAN_STORE.mark_dirty()
 
 
 # =========================================================
@@ -869,55 +1271,196 @@ Content Log Yapısı (YENİ):
 CONTENT_LOG_TAB_NAME = os.getenv("CONTENT_LOG_TAB_NAME", "Content Log").strip() or "Content Log"
 CONTENT_LOG_MEMBER_START_ROW = 4  # A4'ten başlar
 
-def _get_content_log_worksheet():
-    """Content Log worksheet'ini döndürür."""
+async def _get_content_log_worksheet() -> "SheetTab":
+    """Content Log worksheet'ini döndürür (yoksa oluşturur)."""
     sheet_id = ACTIVITY_SHEET_ID
     if not sheet_id:
         raise RuntimeError("ACTIVITY_SHEET_ID ayarlı değil.")
     
-    sh = _gs_open_sheet_sync(sheet_id)
-    try:
-        return sh.worksheet(CONTENT_LOG_TAB_NAME)
-    except Exception:
-        ws = sh.add_worksheet(title=CONTENT_LOG_TAB_NAME, rows=500, cols=100)
-        ws.update_acell("A3", "Content")
-        return ws
-
-def _get_sheets_service():
-    """Google Sheets API service döndürür (merge işlemleri için)."""
-    from google.oauth2.service_account import Credentials
-    from googleapiclient.discovery import build
-    
-    scopes = ['https://www.googleapis.com/auth/spreadsheets']
-    creds = Credentials.from_service_account_file(GOOGLE_CREDS_JSON, scopes=scopes)
-    return build('sheets', 'v4', credentials=creds)
-
-def _merge_cells(sheet_id: int, start_row: int, end_row: int, start_col: int, end_col: int):
-    """Google Sheets API ile hücreleri birleştirir."""
-    try:
-        service = _get_sheets_service()
-        request = {
-            "requests": [{
-                "mergeCells": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "startRowIndex": start_row,
-                        "endRowIndex": end_row,
-                        "startColumnIndex": start_col,
-                        "endColumnIndex": end_col
-                    },
-                    "mergeType": "MERGE_ALL"
-                }
-            }]
+    ws, created = await _gs_tab(sheet_id, CONTENT_LOG_TAB_NAME, create_rows=500, create_cols=100)
+    if created:
+        await ws.batch_update([{"range": "A3", "values": [["Content"]]}])
+    return ws
+
+def _merge_request(sheet_id: int, start_row: int, end_row: int, start_col: int, end_col: int) -> Dict[str, Any]:
+    return {
+        "mergeCells": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": start_row,
+                "endRowIndex": end_row,
+                "startColumnIndex": start_col,
+                "endColumnIndex": end_col
+            },
+            "mergeType": "MERGE_ALL"
         }
-        service.spreadsheets().batchUpdate(
-            spreadsheetId=ACTIVITY_SHEET_ID,
-            body=request
-        ).execute()
-        return True
-    except Exception as e:
-        log(f"[SHEETS] Merge hatası: {e}")
-        return False
+    }
+
+def _cell_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"userEnteredValue": {"boolValue": v}}
+    if isinstance(v, (int, float)):
+        return {"userEnteredValue": {"numberValue": v}}
+    return {"userEnteredValue": {"stringValue": "" if v is None else str(v)}}
+
+async def _write_header_block(ws: "SheetTab", first_col: int, rows: List[List[Any]], *, merge_cols: int = 2) -> None:
+    """Yeni content/gün bloğunu TEK batchUpdate ile yazar:
+    row 1'de first_col'dan (1-indexed) merge_cols sütunu birleştirir + rows'u row 1'den itibaren yazar.
+    None hücreler atlanır (mevcut değer korunur)."""
+    gid = _get_worksheet_id(ws)
+    requests: List[Dict[str, Any]] = []
+    if merge_cols > 1:
+        requests.append(_merge_request(gid, 0, 1, first_col - 1, first_col - 1 + merge_cols))
+    for r, row in enumerate(rows):
+        for c, v in enumerate(row):
+            if v is None:
+                continue
+            requests.append({
+                "updateCells": {
+                    "start": {"sheetId": gid, "rowIndex": r, "columnIndex": first_col - 1 + c},
+                    "rows": [{"values": [_cell_value(v)]}],
+                    "fields": "userEnteredValue",
+                }
+            })
+    if requests:
+        await SHEETS_API.batch_update(ws.spreadsheet_id, requests)
+        if rows and rows[0] and rows[0][0]:
+            SHEET_LAYOUT.put(ws, str(rows[0][0]), first_col)
+
+# Row 1 blok index'i (kalıcı): tarih -> (V, C), content -> (Loot, ✅) sütunu.
+# Eşleşme bir kez tek başlık hücresiyle doğrulanır, sonra SHEET_LAYOUT_VERIFY_TTL boyunca
+# API çağrısı yapılmaz. Index'te yoksa row 1 bir kez okunup yeniden index'lenir.
+SHEET_LAYOUT_FILE = os.path.join(BASE_DIR, os.getenv("SHEET_LAYOUT_FILE", "sheet_layout.json"))
+SHEET_LAYOUT_VERIFY_TTL = int(os.getenv("SHEET_LAYOUT_VERIFY_TTL", "21600"))
+
+class SheetLayoutIndex:
+    """(spreadsheet, worksheet gid) -> {başlık (lower): bloğun ilk sütunu (1-indexed)}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tabs: Optional[Dict[str, Dict[str, int]]] = None
+        self._verified: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        # metrics
+        self.hits = 0
+        self.verifies = 0
+        self.rescans = 0
+
+    @staticmethod
+    def _tab_key(ws) -> str:
+        return f"{getattr(ws, 'spreadsheet_id', '') or ''}:{_get_worksheet_id(ws)}"
+
+    @staticmethod
+    def _norm(key: str) -> str:
+        return (key or "").strip().lower()
+
+    def _ensure_loaded(self) -> Dict[str, Dict[str, int]]:
+        if self._tabs is None:
+            tabs: Dict[str, Dict[str, int]] = {}
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    for tk, m in (data or {}).items():
+                        if isinstance(m, dict):
+                            tabs[str(tk)] = {str(k): int(v) for k, v in m.items()}
+            except Exception as e:
+                log(f"[SHEETS] Layout index okunamadı: {e}")
+            self._tabs = tabs
+        return self._tabs
+
+    def _save(self) -> None:
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._tabs or {}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            log(f"[SHEETS] Layout index yazılamadı: {e}")
+
+    async def lookup(self, ws: "SheetTab", key: str) -> Optional[int]:
+        tk, k = self._tab_key(ws), self._norm(key)
+        with self._lock:
+            col = self._ensure_loaded().get(tk, {}).get(k)
+            checked = self._verified.get((tk, k))
+        if not col:
+            return None
+        if checked is not None and time.monotonic() - checked < SHEET_LAYOUT_VERIFY_TTL:
+            self.hits += 1
+            return col
+        # tek hücre ile doğrula (sütun elle silinmiş/kaymış olabilir)
+        self.verifies += 1
+        cell = await ws.acell(f"{_col_num_to_letter(col)}1")
+        with self._lock:
+            if self._norm(cell) == k:
+                self._verified[(tk, k)] = time.monotonic()
+                return col
+            # layout değişmiş: bu tab'ın index'i geçersiz, bir sonraki adımda row 1'den yeniden kurulur
+            self._ensure_loaded().pop(tk, None)
+            self._verified = {vk: t for vk, t in self._verified.items() if vk[0] != tk}
+            self._save()
+        return None
+
+    def reindex(self, ws, row1: List[str], first_col: int) -> None:
+        tk = self._tab_key(ws)
+        m: Dict[str, int] = {}
+        for idx in range(first_col - 1, len(row1), 2):
+            k = self._norm(row1[idx])
+            if k and k not in m:
+                m[k] = idx + 1
+        now = time.monotonic()
+        with self._lock:
+            self.rescans += 1
+            tabs = self._ensure_loaded()
+            changed = tabs.get(tk) != m
+            tabs[tk] = m
+            self._verified = {vk: t for vk, t in self._verified.items() if vk[0] != tk}
+            self._verified.update({(tk, k): now for k in m})
+            if changed:
+                self._save()
+
+    def put(self, ws, key: str, col: int) -> None:
+        tk, k = self._tab_key(ws), self._norm(key)
+        with self._lock:
+            self._ensure_loaded().setdefault(tk, {})[k] = int(col)
+            self._verified[(tk, k)] = time.monotonic()
+            self._save()
+
+SHEET_LAYOUT = SheetLayoutIndex(SHEET_LAYOUT_FILE)
+
+async def _find_or_create_header_block(ws: "SheetTab", first_col: int, key: str, rows: List[List[Any]]) -> Tuple[int, bool]:
+    """2 sütunluk başlık bloğunu (content / gün) bulur, yoksa oluşturur.
+    Returns: (bloğun ilk sütunu, yeni_mi). Index isabetinde 0 API çağrısı,
+    yeni blokta 1 okuma (row 1) + 1 batchUpdate."""
+    col = await SHEET_LAYOUT.lookup(ws, key)
+    if col:
+        return (col, False)
+    row1 = await ws.row_values(1)
+    SHEET_LAYOUT.reindex(ws, row1, first_col)
+    found, col = _header_pair_slot(row1, first_col, key)
+    if found:
+        return (col, False)
+    await _write_header_block(ws, col, rows)
+    return (col, True)
+
+def _header_pair_slot(row1: List[str], first_col: int, key: str) -> Tuple[bool, int]:
+    """Row 1'i first_col'dan (1-indexed) itibaren 2'şer sütunluk bloklar halinde tarar.
+    Returns: (bulundu, bloğun ilk sütunu). Bulunamazsa ilk boş blok ya da sondan sonraki blok."""
+    key = key.strip().lower()
+    col_idx = first_col - 1
+    while col_idx < len(row1):
+        if (row1[col_idx] or "").strip().lower() == key:
+            return (True, col_idx + 1)
+        col_idx += 2
+    col_idx = first_col - 1
+    while col_idx < len(row1):
+        if not (row1[col_idx] or "").strip():
+            return (False, col_idx + 1)
+        col_idx += 2
+    next_col = len(row1) + 1
+    if (next_col - first_col) % 2 == 1:
+        next_col += 1
+    return (False, next_col)
 
 def _get_worksheet_id(ws) -> int:
     """Worksheet'in ID'sini döndürür."""
@@ -925,139 +1468,81 @@ def _get_worksheet_id(ws) -> int:
 
 async def _sync_members_to_content_log(bot_client) -> int:
     """Member rolü olan tüm üyeleri Content Log'a yazar."""
-    def _do_sync():
-        guild = bot_client.get_guild(GUILD_ID)
-        if not guild:
-            return 0
-        
-        member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID)
-        if not member_role:
-            return 0
-        
-        ws = _get_content_log_worksheet()
-        
-        members_data = []
-        for member in guild.members:
-            if member.bot or member_role not in member.roles:
-                continue
-            members_data.append(member.display_name)
-        
-        if not members_data:
-            return 0
-        
-        members_data.sort(key=lambda x: x.lower())
-        
-        try:
-            ws.batch_clear([f"A{CONTENT_LOG_MEMBER_START_ROW}:A500"])
-        except Exception:
-            pass
-        
-        start_row = CONTENT_LOG_MEMBER_START_ROW
-        end_row = start_row + len(members_data) - 1
-        ws.update(
-            values=[[name] for name in members_data],
-            range_name=f"A{start_row}:A{end_row}"
-        )
-        
-        # A3'e "Content" yaz
-        ws.update_acell("A3", "Content")
-        
-        log(f"[CONTENT LOG] {len(members_data)} üye yazıldı.")
-        return len(members_data)
+    guild = bot_client.get_guild(GUILD_ID)
+    if not guild:
+        return 0
+    
+    member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID)
+    if not member_role:
+        return 0
+    
+    ws = await _get_content_log_worksheet()
+    
+    members_data = []
+    for member in guild.members:
+        if member.bot or member_role not in member.roles:
+            continue
+        members_data.append(member.display_name)
+    
+    if not members_data:
+        return 0
+    
+    members_data.sort(key=lambda x: x.lower())
+    
+    try:
+        await ws.batch_clear([f"A{CONTENT_LOG_MEMBER_START_ROW}:A500"])
+    except Exception:
+        pass
+    
+    start_row = CONTENT_LOG_MEMBER_START_ROW
+    end_row = start_row + len(members_data) - 1
+    # üye listesi + A3 "Content": tek batch
+    await ws.batch_update([
+        {"range": f"A{start_row}:A{end_row}", "values": [[name] for name in members_data]},
+        {"range": "A3", "values": [["Content"]]},
+    ])
     
-    return await run_io(_do_sync)
+    log(f"[CONTENT LOG] {len(members_data)} üye yazıldı.")
+    return len(members_data)
 
 async def _add_content_to_log(content_name: str, content_date: str, content_time: str) -> Tuple[int, int]:
     """
     Yeni content ekler (2 sütun, merge ile).
     Returns: (loot_col, tick_col) tuple
     """
-    def _do_add():
-        ws = _get_content_log_worksheet()
-        sheet_id = _get_worksheet_id(ws)
-        content_lower = content_name.strip().lower()
-        
-        row1 = ws.row_values(1)
-        
-        # Mevcut content'i ara (2'li atlayarak)
-        col_idx = 1  # B sütunu (0-indexed)
-        while col_idx < len(row1):
-            val = (row1[col_idx] or "").strip().lower()
-            if val == content_lower:
-                loot_col = col_idx + 1
-                tick_col = col_idx + 2
-                return (loot_col, tick_col)
-            col_idx += 2
-        
-        # Yeni sütun bul
-        next_col = 2  # B (1-indexed)
-        col_idx = 1
-        while col_idx < len(row1):
-            if not (row1[col_idx] or "").strip():
-                next_col = col_idx + 1
-                break
-            col_idx += 2
-        else:
-            next_col = len(row1) + 1
-            if next_col % 2 == 1:
-                next_col += 1
-        
-        loot_col = next_col
-        tick_col = next_col + 1
-        
-        loot_letter = _col_num_to_letter(loot_col)
-        tick_letter = _col_num_to_letter(tick_col)
-        
-        # Merge header (row 1)
-        _merge_cells(sheet_id, 0, 1, loot_col - 1, tick_col)
-        
-        # Content adını yaz
-        ws.update_acell(f"{loot_letter}1", content_name)
-        
-        # Tarih ve saat
-        ws.update_acell(f"{loot_letter}2", content_date)
-        ws.update_acell(f"{tick_letter}2", content_time)
-        
-        # Sub-headers
-        ws.update_acell(f"{loot_letter}3", "Loot")
-        ws.update_acell(f"{tick_letter}3", "✅")
-        
-        log(f"[CONTENT LOG] Content eklendi: {content_name} @ {loot_letter}:{tick_letter}")
+    ws = await _get_content_log_worksheet()
+    
+    # Mevcut content'i ara (layout index); yoksa merge + content adı + tarih/saat
+    # + sub-header'lar tek batchUpdate ile yazılır
+    loot_col, created = await _find_or_create_header_block(ws, 2, content_name, [
+        [content_name, None],
+        [content_date, content_time],
+        ["Loot", "✅"],
+    ])
+    tick_col = loot_col + 1
+    if not created:
         return (loot_col, tick_col)
     
-    return await run_io(_do_add)
+    loot_letter = _col_num_to_letter(loot_col)
+    tick_letter = _col_num_to_letter(tick_col)
+    log(f"[CONTENT LOG] Content eklendi: {content_name} @ {loot_letter}:{tick_letter}")
+    return (loot_col, tick_col)
 
 async def _mark_content_participation(tick_col: int, participant_names: List[str]) -> int:
     """Katılımcıları ✅ ile işaretler."""
-    def _do_mark():
-        ws = _get_content_log_worksheet()
-        col_a = ws.col_values(1)
-        
-        marked = 0
-        col_letter = _col_num_to_letter(tick_col)
-        updates = []
-        
-        for row_idx, name in enumerate(col_a, start=1):
-            if row_idx < CONTENT_LOG_MEMBER_START_ROW:
-                continue
-            
-            name_lower = (name or "").strip().lower()
-            for participant in participant_names:
-                if participant.lower() == name_lower:
-                    updates.append({
-                        "range": f"{col_letter}{row_idx}",
-                        "values": [["✅"]]
-                    })
-                    marked += 1
-                    break
-        
-        if updates:
-            ws.batch_update(updates)
-        
-        log(f"[CONTENT LOG] {marked} katılımcı işaretlendi @ {col_letter}")
-        return marked
+    ws = await _get_content_log_worksheet()
+    index, _ = await _member_row_index(ws, CONTENT_LOG_MEMBER_START_ROW, with_ign=False)
+    
+    col_letter = _col_num_to_letter(tick_col)
+    rows = sorted({r for r in (index.find(p, fuzzy=False) for p in participant_names) if r is not None})
+    updates = [{"range": f"{col_letter}{r}", "values": [["✅"]]} for r in rows]
+    marked = len(updates)
+    
+    if updates:
+        await ws.batch_update(updates)
     
-    return await run_io(_do_mark)
+    log(f"[CONTENT LOG] {marked} katılımcı işaretlendi @ {col_letter}")
+    return marked
 
 def _col_num_to_letter(col: int) -> str:
     """Sütun numarasını harf(ler)e çevirir. 1=A, 2=B, 27=AA, vb."""
@@ -1100,213 +1585,227 @@ CONTENT_JOINED_POINTS = 150
 CONTENT_MISSED_POINTS = -250
 CONTENT_NONE_POINTS = 0
 
-def _get_puan_log_worksheet():
-    """Puan Log worksheet'ini döndürür."""
-    import gspread
+async def _get_puan_log_worksheet() -> "SheetTab":
+    """Puan Log worksheet'ini döndürür (yoksa oluşturur)."""
     sheet_id = ACTIVITY_SHEET_ID
     if not sheet_id:
         raise RuntimeError("ACTIVITY_SHEET_ID ayarlı değil.")
     
-    sh = _gs_open_sheet_sync(sheet_id)
-    try:
-        return sh.worksheet(PUAN_LOG_TAB_NAME)
-    except gspread.exceptions.WorksheetNotFound:
-        import time
-        time.sleep(1)
-        ws = sh.add_worksheet(title=PUAN_LOG_TAB_NAME, rows=500, cols=200)
-        time.sleep(1)
-        ws.update_acell("A1", "Üye")
-        ws.update_acell("B1", "IGN")
-        ws.update_acell("C1", "Toplam")
-        return ws
+    ws, created = await _gs_tab(sheet_id, PUAN_LOG_TAB_NAME, create_rows=500, create_cols=200)
+    if created:
+        await ws.batch_update([{"range": "A1:C1", "values": [["Üye", "IGN", "Toplam"]]}])
+    return ws
 
 def _get_today_date_str() -> str:
     """Bugünün tarihini DD.MM formatında döndürür."""
     return datetime.now(TR_TZ).strftime("%d.%m")
 
-def _find_or_create_daily_columns(ws, date_str: str) -> Tuple[int, int]:
+async def _find_or_create_daily_columns(ws: "SheetTab", date_str: str) -> Tuple[int, int]:
     """
     Belirtilen tarih için Voice ve Content sütunlarını bulur veya oluşturur.
     Tarih header'ı merge edilir.
     Returns: (voice_col_num, content_col_num)
     """
-    row1 = ws.row_values(1)
-    
-    # Mevcut sütunlarda ara (2'li atlayarak, D'den başla)
-    col_idx = 3  # D sütunu (0-indexed)
-    while col_idx < len(row1):
-        val = (row1[col_idx] or "").strip()
-        if val == date_str:
-            voice_col = col_idx + 1
-            content_col = col_idx + 2
-            return (voice_col, content_col)
-        col_idx += 2
-    
-    # Bulunamadı, yeni sütunlar oluştur
-    next_col = 4  # D sütunu (1-indexed)
-    col_idx = 3
-    while col_idx < len(row1):
-        if not (row1[col_idx] or "").strip():
-            next_col = col_idx + 1
-            break
-        col_idx += 2
-    else:
-        next_col = len(row1) + 1
-        # Çift sütunda başla (D=4, F=6, H=8...)
-        if (next_col - 4) % 2 == 1:
-            next_col += 1
-    
-    voice_col = next_col
-    content_col = next_col + 1
+    # Layout index'te ara (D'den başlayan 2'li bloklar); yoksa merge + tarih tek batchUpdate
+    voice_col, created = await _find_or_create_header_block(ws, 4, date_str, [[date_str, None]])
+    content_col = voice_col + 1
+    if not created:
+        return (voice_col, content_col)
     
     voice_letter = _col_num_to_letter(voice_col)
     content_letter = _col_num_to_letter(content_col)
     
-    # Merge header
-    sheet_id = _get_worksheet_id(ws)
-    _merge_cells(sheet_id, 0, 1, voice_col - 1, content_col)
-    
-    # Tarih yaz
-    ws.update_acell(f"{voice_letter}1", date_str)
-    
     log(f"[PUAN LOG] Günlük sütunlar: {date_str} @ {voice_letter}:{content_letter}")
     return (voice_col, content_col)
 
-def _find_member_row_puan(ws, member_name: str, ign: str, col_a: List = None, col_b: List = None) -> Optional[int]:
-    """Üyenin satır numarasını bulur. col_a/col_b cache olarak verilebilir."""
-    if col_a is None:
-        col_a = ws.col_values(1)
-    if col_b is None:
-        try:
-            col_b = ws.col_values(2)
-        except Exception:
-            col_b = []
-    
-    member_lower = member_name.strip().lower()
-    ign_lower = (ign or "").strip().lower()
-    
-    for row_idx, val in enumerate(col_a):
-        if row_idx < PUAN_LOG_MEMBER_START_ROW - 1:
-            continue
-        
-        name_lower = (val or "").strip().lower()
-        
-        if member_lower in name_lower or name_lower in member_lower:
-            return row_idx + 1
-        
-        if ign_lower and row_idx < len(col_b):
-            ign_val = (col_b[row_idx] or "").strip().lower()
-            if ign_lower in ign_val or ign_val in ign_lower:
-                return row_idx + 1
-    
-    return None
+class MemberRowIndex:
+    """A (isim) / B (IGN) sütunlarından bir kez kurulan satır index'i.
+    - Tam eşleşme: casefold isim / IGN -> ilk satır (O(1))
+    - Fuzzy (isim hücrede geçiyor ya da hücre isimde geçiyor): hücreler 3-gram posting
+      listelerine ve tam-değer map'ine önceden konur; aday satırlar sadece bunlardan gelir.
+    Satır numaraları 1-indexed (sheet satırı)."""
+
+    def __init__(self, col_a: List[str], col_b: Optional[List[str]] = None, start_row: int = 2):
+        self.start_row = start_row
+        self.names = self._build(col_a, start_row)
+        self.igns = self._build(col_b or [], start_row)
+        # ilk boş A hücresi (yoksa son dolu satırın altı) - yeni üyeler buraya yazılır
+        self.next_row = start_row
+        for i in range(start_row - 1, len(col_a)):
+            if (col_a[i] or "").strip():
+                self.next_row = i + 2
+            else:
+                self.next_row = i + 1
+                break
 
-def _add_member_to_puan_log_batch(ws, member_name: str, ign: str, col_a: List) -> int:
-    """Yeni üye satır numarasını hesaplar (batch için). Yazmaz!"""
-    next_row = PUAN_LOG_MEMBER_START_ROW
-    for i, val in enumerate(col_a):
-        if i < PUAN_LOG_MEMBER_START_ROW - 1:
-            continue
-        if val and val.strip():
-            next_row = i + 2
-        else:
-            next_row = i + 1
-            break
-    return next_row
+    @staticmethod
+    def _norm(v: Any) -> str:
+        return str(v or "").strip().casefold()
 
-def _add_member_to_puan_log(ws, member_name: str, ign: str) -> int:
-    """Yeni üye ekler, satır numarası döndürür."""
-    col_a = ws.col_values(1)
-    
-    next_row = PUAN_LOG_MEMBER_START_ROW
-    for i, val in enumerate(col_a):
-        if i < PUAN_LOG_MEMBER_START_ROW - 1:
-            continue
-        if val and val.strip():
-            next_row = i + 2
+    @classmethod
+    def _build(cls, col: List[str], start_row: int) -> Dict[str, Any]:
+        exact: Dict[str, int] = {}
+        grams: Dict[str, set] = {}
+        for i in range(start_row - 1, len(col)):
+            v = cls._norm(col[i])
+            if not v:
+                continue
+            row = i + 1
+            exact.setdefault(v, row)
+            for j in range(len(v) - 2):
+                grams.setdefault(v[j:j + 3], set()).add(row)
+        return {"exact": exact, "grams": grams,
+                "by_row": {row: v for v, row in exact.items()}}
+
+    @staticmethod
+    def _fuzzy(ix: Dict[str, Any], q: str) -> Optional[int]:
+        best: Optional[int] = None
+        # hücre, aranan ismin alt dizisi: ismin alt dizileri tam-değer map'inde aranır
+        exact = ix["exact"]
+        n = len(q)
+        for i in range(n):
+            for j in range(i + 1, n + 1):
+                row = exact.get(q[i:j])
+                if row is not None and (best is None or row < best):
+                    best = row
+        # aranan isim, hücrenin alt dizisi: 3-gram posting kesişimi + doğrulama
+        if n >= 3:
+            cands: Optional[set] = None
+            for j in range(n - 2):
+                rows = ix["grams"].get(q[j:j + 3])
+                if not rows:
+                    cands = set()
+                    break
+                cands = set(rows) if cands is None else (cands & rows)
+                if not cands:
+                    break
+            for row in cands or ():
+                if q in ix["by_row"].get(row, "") and (best is None or row < best):
+                    best = row
         else:
-            next_row = i + 1
-            break
+            for v, row in exact.items():
+                if q in v and (best is None or row < best):
+                    best = row
+        return best
+
+    def find(self, name: str, ign: str = "", *, fuzzy: bool = True) -> Optional[int]:
+        """Önce tam eşleşme (isim, sonra IGN); fuzzy=True ise substring eşleşmesi (en üstteki satır)."""
+        q, qi = self._norm(name), self._norm(ign)
+        if q and q in self.names["exact"]:
+            return self.names["exact"][q]
+        if qi and qi in self.igns["exact"]:
+            return self.igns["exact"][qi]
+        if not fuzzy:
+            return None
+        rows = [r for r in (self._fuzzy(self.names, q) if q else None,
+                            self._fuzzy(self.igns, qi) if qi else None) if r is not None]
+        return min(rows) if rows else None
+
+class SheetColumns:
+    """Tek values.batchGet ile okunmuş sütunların hafif görünümü (1-indexed sütun -> değerler)."""
+
+    def __init__(self, cols: Dict[int, List[str]]):
+        self._cols = cols
+
+    def col(self, n: int) -> List[str]:
+        return self._cols.get(n, [])
+
+    def cell(self, row: int, col: int) -> str:
+        vals = self._cols.get(col, [])
+        return vals[row - 1] if 0 < row <= len(vals) else ""
+
+async def _read_columns(ws: "SheetTab", *cols: int) -> SheetColumns:
+    """İstenen sütunları TEK batchGet ile okur (bitişik sütunlar tek range: A:B, F:F ...)."""
+    want = sorted({int(c) for c in cols if c and int(c) > 0})
+    groups: List[List[int]] = []
+    for c in want:
+        if groups and c == groups[-1][-1] + 1:
+            groups[-1].append(c)
+        else:
+            groups.append([c])
+    if not groups:
+        return SheetColumns({})
+    ranges = [f"{_col_num_to_letter(g[0])}:{_col_num_to_letter(g[-1])}" for g in groups]
+    got = await ws.batch_get(ranges, major_dimension="COLUMNS")
+    out: Dict[int, List[str]] = {}
+    for g, vr in zip(groups, got):
+        vr = list(vr or [])
+        for i, c in enumerate(g):
+            out[c] = [str(v) for v in vr[i]] if i < len(vr) else []
+    return SheetColumns(out)
+
+async def _member_row_index(ws: "SheetTab", start_row: int, *, with_ign: bool = True, extra_cols: Tuple[int, ...] = ()) -> Tuple[MemberRowIndex, SheetColumns]:
+    """A (+B) ve ek sütunları tek okumada alır, üye index'i + okunan sütunları döndürür."""
+    snap = await _read_columns(ws, 1, *((2,) if with_ign else ()), *extra_cols)
+    return MemberRowIndex(snap.col(1), snap.col(2) if with_ign else [], start_row), snap
+
+async def _add_member_to_puan_log(ws: "SheetTab", member_name: str, ign: str) -> int:
+    """Yeni üye ekler, satır numarası döndürür."""
+    index, _ = await _member_row_index(ws, PUAN_LOG_MEMBER_START_ROW, with_ign=False)
+    next_row = index.next_row
     
-    ws.update_acell(f"A{next_row}", member_name)
+    updates = [{"range": f"A{next_row}", "values": [[member_name]]}]
     if ign:
-        ws.update_acell(f"B{next_row}", ign)
-    
-    ws.update_acell(f"C{next_row}", f"=SUM(D{next_row}:ZZ{next_row})")
+        updates.append({"range": f"B{next_row}", "values": [[ign]]})
+    updates.append({"range": f"C{next_row}", "values": [[f"=SUM(D{next_row}:ZZ{next_row})"]]})
+    await ws.batch_update(updates, value_input_option='USER_ENTERED')
     
     log(f"[PUAN LOG] Yeni üye: {member_name} @ satır {next_row}")
     return next_row
 
 async def _sync_members_to_puan_log(bot_client) -> int:
     """Member rolü olan tüm üyeleri Puan Log'a ekler. (Optimized - batch)"""
-    def _do_sync():
-        import time
-        
-        guild = bot_client.get_guild(GUILD_ID)
-        if not guild:
-            return 0
-        
-        member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID)
-        if not member_role:
-            return 0
-        
-        ws = _get_puan_log_worksheet()
-        
-        # Tüm verileri BİR KERE oku (rate limit için kritik!)
-        col_a = ws.col_values(1)
-        try:
-            col_b = ws.col_values(2)
-        except Exception:
-            col_b = []
-        
-        # Yeni üyeleri topla
-        new_members = []
-        for member in guild.members:
-            if member.bot or member_role not in member.roles:
-                continue
-            
-            member_name = member.display_name
-            ign = ""
-            if member.id in _player_links:
-                ign = _player_links[member.id].albion_name
-            
-            # Cache'li arama
-            row = _find_member_row_puan(ws, member_name, ign, col_a, col_b)
-            if row is None:
-                new_members.append((member_name, ign))
-        
-        if not new_members:
-            log("[PUAN LOG] Yeni üye yok.")
-            return 0
-        
-        # Batch olarak yaz
-        next_row = PUAN_LOG_MEMBER_START_ROW
-        for i, val in enumerate(col_a):
-            if i < PUAN_LOG_MEMBER_START_ROW - 1:
-                continue
-            if val and val.strip():
-                next_row = i + 2
-            else:
-                next_row = i + 1
-                break
-        
-        updates = []
-        for idx, (name, ign) in enumerate(new_members):
-            row = next_row + idx
-            updates.append({"range": f"A{row}", "values": [[name]]})
-            if ign:
-                updates.append({"range": f"B{row}", "values": [[ign]]})
-            updates.append({"range": f"C{row}", "values": [[f"=SUM(D{row}:ZZ{row})"]]})
+    guild = bot_client.get_guild(GUILD_ID)
+    if not guild:
+        return 0
+    
+    member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID)
+    if not member_role:
+        return 0
+    
+    ws = await _get_puan_log_worksheet()
+    
+    # A + B tek batchGet ile BİR KERE oku (rate limit için kritik!) ve index'le
+    index, _ = await _member_row_index(ws, PUAN_LOG_MEMBER_START_ROW)
+    
+    # Yeni üyeleri topla
+    new_members = []
+    for member in guild.members:
+        if member.bot or member_role not in member.roles:
+            continue
         
-        if updates:
-            # Batch update (tek API çağrısı)
-            ws.batch_update(updates, value_input_option='USER_ENTERED')
-            time.sleep(1)  # Rate limit koruması
+        member_name = member.display_name
+        ign = ""
+        if member.id in _player_links:
+            ign = _player_links[member.id].albion_name
         
-        log(f"[PUAN LOG] {len(new_members)} yeni üye eklendi (batch).")
-        return len(new_members)
+        # Index'li arama
+        row = index.find(member_name, ign)
+        if row is None:
+            new_members.append((member_name, ign))
+    
+    if not new_members:
+        log("[PUAN LOG] Yeni üye yok.")
+        return 0
+    
+    # Batch olarak yaz
+    next_row = index.next_row
+    
+    updates = []
+    for idx, (name, ign) in enumerate(new_members):
+        row = next_row + idx
+        updates.append({"range": f"A{row}", "values": [[name]]})
+        if ign:
+            updates.append({"range": f"B{row}", "values": [[ign]]})
+        updates.append({"range": f"C{row}", "values": [[f"=SUM(D{row}:ZZ{row})"]]})
     
-    return await run_io(_do_sync)
+    if updates:
+        # Batch update (tek API çağrısı)
+        await ws.batch_update(updates, value_input_option='USER_ENTERED')
+    
+    log(f"[PUAN LOG] {len(new_members)} yeni üye eklendi (batch).")
+    return len(new_members)
+
 
 async def _write_daily_voice_to_puan_log(bot_client) -> int:
     """
@@ -1314,148 +1813,129 @@ async def _write_daily_voice_to_puan_log(bot_client) -> int:
     Voice Tracker'dan activity_state.json'dan GÜNLÜK dakikayı okur.
     (Optimized - tek okuma, batch yazma)
     """
-    def _do_write():
-        import time
-        
-        guild = bot_client.get_guild(GUILD_ID)
-        if not guild:
-            return 0
-        
-        member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID)
-        if not member_role:
-            return 0
-        
-        ws = _get_puan_log_worksheet()
-        today = _get_today_date_str()
-        
-        voice_col, _ = _find_or_create_daily_columns(ws, today)
-        voice_letter = _col_num_to_letter(voice_col)
+    guild = bot_client.get_guild(GUILD_ID)
+    if not guild:
+        return 0
+    
+    member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID)
+    if not member_role:
+        return 0
+    
+    ws = await _get_puan_log_worksheet()
+    today = _get_today_date_str()
+    
+    voice_col, _ = await _find_or_create_daily_columns(ws, today)
+    voice_letter = _col_num_to_letter(voice_col)
+    
+    # A + B tek batchGet ile BİR KERE oku ve index'le (günlük sütunlar layout index'ten)
+    index, _ = await _member_row_index(ws, PUAN_LOG_MEMBER_START_ROW)
+    
+    
+    updates = []
+    member_updates = []
+    new_members = []
+    count = 0
+    
+    for member in guild.members:
+        if member.bot or member_role not in member.roles:
+            continue
         
-        # Tüm verileri BİR KERE oku
-        col_a = ws.col_values(1)
-        try:
-            col_b = ws.col_values(2)
-        except Exception:
-            col_b = []
+        member_name = member.display_name
+        ign = ""
+        if member.id in _player_links:
+            ign = _player_links[member.id].albion_name
         
-        # Puan state'i yükle
-        puan_state = _load_puan_state()
+        # Index'li arama
+        row = index.find(member_name, ign)
+        if row is None:
+            # Yeni üye - listeye ekle, sonra batch yazacağız
+            new_members.append((member_name, ign, member.id))
+            continue
         
-        updates = []
-        new_members = []
-        count = 0
+        # Günlük voice dakikasını al (bellekteki puan store'undan)
+        user_puan = PUAN_STORE.get(member.id)
+        daily_minutes = user_puan.daily_minutes_counted if user_puan else 0
         
-        for member in guild.members:
-            if member.bot or member_role not in member.roles:
-                continue
-            
-            member_name = member.display_name
-            ign = ""
-            if member.id in _player_links:
-                ign = _player_links[member.id].albion_name
-            
-            # Cache'li arama
-            row = _find_member_row_puan(ws, member_name, ign, col_a, col_b)
-            if row is None:
-                # Yeni üye - listeye ekle, sonra batch yazacağız
-                new_members.append((member_name, ign, member.id))
-                continue
-            
-            # Günlük voice dakikasını al
-            user_puan = puan_state.get("users", {}).get(str(member.id), {})
-            daily_minutes = user_puan.get("daily_minutes_counted", 0) or 0
+        if daily_minutes > 0:
+            updates.append({
+                "range": f"{voice_letter}{row}",
+                "values": [[daily_minutes]]
+            })
+            count += 1
+    
+    # Yeni üyeleri önce ekle
+    if new_members:
+        next_row = index.next_row
+        for idx, (name, ign, uid) in enumerate(new_members):
+            row = next_row + idx
+            member_updates.append({"range": f"A{row}", "values": [[name]]})
+            if ign:
+                member_updates.append({"range": f"B{row}", "values": [[ign]]})
+            member_updates.append({"range": f"C{row}", "values": [[f"=SUM(D{row}:ZZ{row})"]]})
             
+            # Voice dakikasını da ekle
+            user_puan = PUAN_STORE.get(uid)
+            daily_minutes = user_puan.daily_minutes_counted if user_puan else 0
             if daily_minutes > 0:
-                updates.append({
-                    "range": f"{voice_letter}{row}",
-                    "values": [[daily_minutes]]
-                })
+                updates.append({"range": f"{voice_letter}{row}", "values": [[daily_minutes]]})
                 count += 1
-        
-        # Yeni üyeleri önce ekle
-        if new_members:
-            next_row = _add_member_to_puan_log_batch(ws, "", "", col_a)
-            member_updates = []
-            for idx, (name, ign, uid) in enumerate(new_members):
-                row = next_row + idx
-                member_updates.append({"range": f"A{row}", "values": [[name]]})
-                if ign:
-                    member_updates.append({"range": f"B{row}", "values": [[ign]]})
-                member_updates.append({"range": f"C{row}", "values": [[f"=SUM(D{row}:ZZ{row})"]]})
-                
-                # Voice dakikasını da ekle
-                user_puan = puan_state.get("users", {}).get(str(uid), {})
-                daily_minutes = user_puan.get("daily_minutes_counted", 0) or 0
-                if daily_minutes > 0:
-                    updates.append({"range": f"{voice_letter}{row}", "values": [[daily_minutes]]})
-                    count += 1
-            
-            if member_updates:
-                ws.batch_update(member_updates, value_input_option='USER_ENTERED')
-                time.sleep(1)
-        
-        if updates:
-            ws.batch_update(updates)
-        
-        log(f"[PUAN LOG] {count} üyenin voice dakikası yazıldı ({today})")
-        return count
     
-    return await run_io(_do_write)
+    # Yeni üye satırları + voice dakikaları: tek batch (formüller için USER_ENTERED)
+    if member_updates or updates:
+        await ws.batch_update(member_updates + updates, value_input_option='USER_ENTERED')
+    
+    log(f"[PUAN LOG] {count} üyenin voice dakikası yazıldı ({today})")
+    return count
+
 
 async def _write_content_count_to_puan_log(participant_names: List[str]) -> int:
     """
     Bugün bir content oldu - katılanların content sayısını +1 artırır.
     """
-    def _do_write():
-        ws = _get_puan_log_worksheet()
-        today = _get_today_date_str()
-        
-        _, content_col = _find_or_create_daily_columns(ws, today)
-        content_letter = _col_num_to_letter(content_col)
-        
-        # Mevcut content sayılarını oku
-        try:
-            content_values = ws.col_values(content_col)
-        except Exception:
-            content_values = []
-        
-        col_a = ws.col_values(1)
-        updates = []
-        count = 0
-        
-        for row_idx, name in enumerate(col_a, start=1):
-            if row_idx < PUAN_LOG_MEMBER_START_ROW:
-                continue
-            
-            name_lower = (name or "").strip().lower()
-            
-            for participant in participant_names:
-                if participant.lower() == name_lower:
-                    # Mevcut değeri al ve +1 ekle
-                    current = 0
-                    if row_idx <= len(content_values):
-                        try:
-                            current = int(content_values[row_idx - 1] or 0)
-                        except (ValueError, TypeError):
-                            current = 0
-                    
-                    updates.append({
-                        "range": f"{content_letter}{row_idx}",
-                        "values": [[current + 1]]
-                    })
-                    count += 1
-                    break
-        
-        if updates:
-            ws.batch_update(updates)
+    ws = await _get_puan_log_worksheet()
+    today = _get_today_date_str()
+    
+    _, content_col = await _find_or_create_daily_columns(ws, today)
+    content_letter = _col_num_to_letter(content_col)
+    
+    # Üye isimleri + mevcut content sayıları: tek batchGet
+    index, snap = await _member_row_index(ws, PUAN_LOG_MEMBER_START_ROW, with_ign=False, extra_cols=(content_col,))
+    content_values = snap.col(content_col)
+    updates = []
+    count = 0
+    seen = set()
+    
+    for participant in participant_names:
+        row_idx = index.find(participant, fuzzy=False)
+        if row_idx is None or row_idx in seen:
+            continue
+        seen.add(row_idx)
+        # Mevcut değeri al ve +1 ekle
+        current = 0
+        if row_idx <= len(content_values):
+            try:
+                current = int(content_values[row_idx - 1] or 0)
+            except (ValueError, TypeError):
+                current = 0
         
-        log(f"[PUAN LOG] {count} üyenin content sayısı güncellendi ({today})")
-        return count
+        updates.append({
+            "range": f"{content_letter}{row_idx}",
+            "values": [[current + 1]]
+        })
+        count += 1
     
-    return await run_io(_do_write)
+    if updates:
+        await ws.batch_update(updates)
+    
+    log(f"[PUAN LOG] {count} üyenin content sayısı güncellendi ({today})")
+    return count
+
 
 def _load_activity_state() -> Dict[str, Any]:
     try:
+        db = _state_db_for("activity")
+        if db is not None:
+            return db.load("activity", ACTIVITY_STATE_FILE) or {"users": {}, "warned_users": []}
         if os.path.exists(ACTIVITY_STATE_FILE):
             with open(ACTIVITY_STATE_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
@@ -1463,49 +1943,445 @@ def _load_activity_state() -> Dict[str, Any]:
         pass
     return {"users": {}, "warned_users": []}
 
-def _save_activity_state(state: Dict[str, Any]) -> None:
+async def _aload_activity_state() -> Dict[str, Any]:
+    """Event loop'tan yükleme: SQLite'ta db thread'i, JSON'da disk havuzu beklenir (loop bloklanmaz)."""
+    db = _state_db_for("activity")
+    if db is None:
+        return await run_io(_load_activity_state, pool="disk")
     try:
-        with open(ACTIVITY_STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+        return await db.aload("activity", ACTIVITY_STATE_FILE) or {"users": {}, "warned_users": []}
     except Exception:
-        pass
+        return {"users": {}, "warned_users": []}
+
+async def _aget_activity_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Tek kullanıcının aktivite verisi; SQLite'ta sadece o satır okunur."""
+    db = _state_db_for("activity")
+    if db is None:
+        return (await _aload_activity_state()).get("users", {}).get(str(user_id))
+    try:
+        data = await db.aget("activity", f"users/{user_id}", ACTIVITY_STATE_FILE)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _write_activity_file(state: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """activity_state.json'ı atomik yazar (okuyan thread yarım dosya görmez);
+    kayıttan önceki dosya imzasını döndürür (harici yazım tespiti)."""
+    with _ACTIVITY_FILE_LOCK:
+        pre_sig = ACTIVITY_LEADERBOARD._file_sig()
+        tmp = f"{ACTIVITY_STATE_FILE}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, ACTIVITY_STATE_FILE)
+        return pre_sig
+
+def _activity_saved(state: Dict[str, Any], changed: Iterable[int], pre_sig: Optional[Tuple[int, int]]) -> None:
+    try:
+        ACTIVITY_LEADERBOARD.saved(state, changed, pre_sig)
+    except Exception as e:
+        # indeks güvenilmez -> sonraki sorguda tam yeniden kurulur
+        ACTIVITY_LEADERBOARD.built = False
+        log(f"[ACTIVITY] Sıralama indeksi güncellenemedi: {repr(e)}")
+
+def _save_activity_state(state: Dict[str, Any], changed: Iterable[int] = ()) -> None:
+    """activity_state'i kaydeder; `changed` = content_joins/voice_minutes'ı değişen kullanıcılar
+    (sıralama indeksinde sadece bunlar yeniden konumlanır)."""
+    pre_sig = None
+    try:
+        db = _state_db_for("activity")
+        if db is not None:
+            db.save("activity", state)
+        else:
+            pre_sig = _write_activity_file(state)
+    except Exception as e:
+        log(f"[ACTIVITY] State kaydetme hatası: {repr(e)}")
+        return
+    _activity_saved(state, changed, pre_sig)
+
+async def _asave_activity_state(state: Dict[str, Any], changed: Iterable[int] = ()) -> None:
+    """_save_activity_state'in event loop sürümü: yazım db thread'inde / disk havuzunda beklenir."""
+    pre_sig = None
+    try:
+        db = _state_db_for("activity")
+        if db is not None:
+            await db.asave("activity", state)
+        else:
+            pre_sig = await run_io(_write_activity_file, state, pool="disk")
+    except Exception as e:
+        log(f"[ACTIVITY] State kaydetme hatası: {repr(e)}")
+        return
+    _activity_saved(state, changed, pre_sig)
+
+def _new_activity_user() -> Dict[str, Any]:
+    return {
+        "content_joins": 0,
+        "voice_minutes": 0,  # Voice tracker tarafından yazılır (harici bot veya VOICE_TRACKER=1)
+        "last_activity": None,
+        "last_activity_type": None
+    }
+
+_ACTIVITY_FILE_LOCK = threading.RLock()  # JSON oku-değiştir-yaz'ı thread'ler arasında sıralar
+_ACTIVITY_PATCHES: set = set()  # uçuştaki kullanıcı güncellemeleri (close() bekler)
+
+def _activity_user_fns(updates: Dict[int, Callable[[Dict[str, Any]], None]]) -> Dict[str, Callable[[Optional[Any]], Any]]:
+    """{user_id: fn(user_data)} -> StateDB.patch anahtarları. Güncellenen kullanıcılar
+    uyarı listesinden çıkarılır (aktif oldular)."""
+    def _user(fn: Callable[[Dict[str, Any]], None]) -> Callable[[Optional[Any]], Any]:
+        def _apply(data: Optional[Any]) -> Dict[str, Any]:
+            data = data if isinstance(data, dict) else _new_activity_user()
+            fn(data)
+            return data
+        return _apply
+
+    ids = {str(uid) for uid in updates}
+    fns: Dict[str, Callable[[Optional[Any]], Any]] = {f"users/{uid}": _user(fn) for uid, fn in updates.items()}
+    fns["warned_users"] = lambda w: [u for u in (w or []) if u not in ids]
+    return fns
+
+def _patch_activity_file(updates: Dict[int, Callable[[Dict[str, Any]], None]]) -> Tuple[Dict[str, Any], Optional[Tuple[int, int]]]:
+    """JSON: verilen kullanıcıları activity_state.json'da günceller (dosya kilidi altında)."""
+    with _ACTIVITY_FILE_LOCK:
+        state = _load_activity_state()
+        users: Dict[str, Any] = {}
+        for key, fn in _activity_user_fns(updates).items():
+            if key.startswith("users/"):
+                uid = key[len("users/"):]
+                users[uid] = state.setdefault("users", {})[uid] = fn(state.get("users", {}).get(uid))
+            else:
+                state[key] = fn(state.get(key))
+        return users, _write_activity_file(state)
+
+def _patch_activity_users(updates: Dict[int, Callable[[Dict[str, Any]], None]]) -> bool:
+    """Sadece verilen kullanıcıları günceller: SQLite'ta ilgili satırlar, JSON'da dosya kilidi altında."""
+    pre_sig = None
+    try:
+        db = _state_db_for("activity")
+        if db is not None:
+            out = db.patch("activity", _activity_user_fns(updates), ACTIVITY_STATE_FILE)
+            users = {k[len("users/"):]: v for k, v in out.items() if k.startswith("users/")}
+        else:
+            users, pre_sig = _patch_activity_file(updates)
+    except Exception as e:
+        log(f"[ACTIVITY] State kaydetme hatası: {repr(e)}")
+        return False
+    _activity_saved({"users": users}, [int(uid) for uid in users], pre_sig)
+    return True
+
+async def _apatch_activity_users(updates: Dict[int, Callable[[Dict[str, Any]], None]]) -> bool:
+    """_patch_activity_users'ın event loop sürümü: SQLite'ta db thread'i, JSON'da disk havuzu beklenir."""
+    if not updates:
+        return True
+    pre_sig = None
+    try:
+        db = _state_db_for("activity")
+        if db is not None:
+            out = await db.apatch("activity", _activity_user_fns(updates), ACTIVITY_STATE_FILE)
+            users = {k[len("users/"):]: v for k, v in out.items() if k.startswith("users/")}
+        else:
+            users, pre_sig = await run_io(_patch_activity_file, updates, pool="disk")
+    except Exception as e:
+        log(f"[ACTIVITY] State kaydetme hatası: {repr(e)}")
+        return False
+    _activity_saved({"users": users}, [int(uid) for uid in users], pre_sig)
+    return True
+
+async def _drain_activity_patches() -> None:
+    while _ACTIVITY_PATCHES:
+        await asyncio.gather(*list(_ACTIVITY_PATCHES), return_exceptions=True)
+
+def _activity_score(data: Dict[str, Any]) -> float:
+    """/aktivite-top skoru: content*10 + voice_minutes/30"""
+    return (data.get("content_joins", 0) or 0) * 10 + (data.get("voice_minutes", 0) or 0) / 30
+
+class ActivityLeaderboard(LeaderboardIndex):
+    """Aktivite skoruna göre sıralama; sadece sunucudaki (bot olmayan) üyeler.
+    Bot activity_state'i kendisi kaydettiğinde saved() ile sadece değişen kullanıcılar
+    yeniden konumlanır. Dosyayı harici tracker yazıyorsa sorgu öncesi ucuz bir stat
+    kontrolüyle (mtime/size) değişiklik yakalanır ve refresh() ile tam yeniden kurulur."""
+
+    def __init__(self):
+        super().__init__()
+        self.client: Optional[discord.Client] = None  # setup_hook bağlar (üye filtresi için)
+        self.sig: Optional[Tuple[int, int]] = None
+        self.built = False
+        self.totals: Dict[int, Tuple[int, int]] = {}  # user_id -> (content_joins, voice_minutes)
+
+    @staticmethod
+    def _file_sig() -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(ACTIVITY_STATE_FILE)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _guild(self) -> Optional[discord.Guild]:
+        return self.client.get_guild(GUILD_ID) if self.client is not None else None
+
+    def _apply(self, guild: Optional[discord.Guild], uid: int, data: Any) -> None:
+        member = guild.get_member(uid) if guild is not None else None
+        if not isinstance(data, dict) or (guild is not None and (member is None or member.bot)):
+            self.remove(uid)
+            self.totals.pop(uid, None)
+            return
+        self.update(uid, _activity_score(data))
+        self.totals[uid] = (data.get("content_joins", 0) or 0, data.get("voice_minutes", 0) or 0)
+
+    def saved(self, state: Dict[str, Any], changed: Iterable[int],
+              pre_sig: Optional[Tuple[int, int]] = None) -> None:
+        """Botun kendi kaydı: sadece değişen kullanıcılar (indeks henüz kurulmadıysa no-op).
+        `pre_sig` = kayıttan hemen önceki dosya imzası. İndeksin bildiği imzayla eşleşmiyorsa
+        arada dosyayı başka biri yazmıştır; o değişiklikler `changed` içinde olmayabilir,
+        bu yüzden imza ilerletilmez ve sonraki sorguda tam yeniden kurulur."""
+        if not self.built:
+            return
+        if _state_db_for("activity") is None and pre_sig != self.sig:
+            self.built = False
+            return
+        guild = self._guild()
+        users = state.get("users") or {}
+        for uid in changed:
+            self._apply(guild, uid, users.get(str(uid)))
+        if _state_db_for("activity") is None:
+            self.sig = self._file_sig()
+
+    def refresh(self, state: Dict[str, Any]) -> None:
+        guild = self._guild()
+        fresh: Dict[int, float] = {}
+        totals: Dict[int, Tuple[int, int]] = {}
+        for uid_str, data in (state.get("users") or {}).items():
+            if not uid_str.isdigit() or not isinstance(data, dict):
+                continue
+            uid = int(uid_str)
+            if guild is not None:
+                member = guild.get_member(uid)
+                if member is None or member.bot:
+                    continue
+            fresh[uid] = _activity_score(data)
+            totals[uid] = (data.get("content_joins", 0) or 0, data.get("voice_minutes", 0) or 0)
+        self.totals = totals
+        for uid in [u for u in self._score if u not in fresh]:
+            self.remove(uid)
+        for uid, score in fresh.items():
+            self.update(uid, score)
+        self.built = True
+        if _state_db_for("activity") is None:
+            self.sig = self._file_sig()
+
+    async def ensure_fresh(self) -> None:
+        if _state_db_for("activity") is None:
+            if self.built and self._file_sig() == self.sig:
+                return
+        elif self.built:
+            return
+        self.refresh(await _aload_activity_state())
+
+ACTIVITY_LEADERBOARD = ActivityLeaderboard()
 
 def _get_user_activity(state: Dict[str, Any], user_id: int) -> Dict[str, Any]:
     """Kullanıcının aktivite verisini döndürür, yoksa oluşturur."""
     user_id_str = str(user_id)
     if user_id_str not in state["users"]:
-        state["users"][user_id_str] = {
-            "content_joins": 0,
-            "voice_minutes": 0,  # Voice bot tarafından yazılır, ana bot sadece okur
-            "last_activity": None,
-            "last_activity_type": None
-        }
+        state["users"][user_id_str] = _new_activity_user()
     return state["users"][user_id_str]
 
 def _update_activity(user_id: int, activity_type: str, **kwargs):
     """Kullanıcının aktivitesini günceller. (Sadece content takibi - voice ayrı bot tarafından yapılır)"""
-    state = _load_activity_state()
-    user_data = _get_user_activity(state, user_id)
-    
     now = datetime.now(UTC_TZ).isoformat()
-    user_data["last_activity"] = now
-    user_data["last_activity_type"] = activity_type
-    
     if activity_type == "content":
-        user_data["content_joins"] = user_data.get("content_joins", 0) + 1
-    
-    # Uyarı listesinden çıkar (aktif oldu)
-    user_id_str = str(user_id)
-    if user_id_str in state.get("warned_users", []):
-        state["warned_users"].remove(user_id_str)
-    
-    _save_activity_state(state)
+        PUAN_HISTORY.add_content(user_id, _get_today_tr())
+
+    def _touch(user_data: Dict[str, Any]) -> None:
+        user_data["last_activity"] = now
+        user_data["last_activity_type"] = activity_type
+        if activity_type == "content":
+            user_data["content_joins"] = user_data.get("content_joins", 0) + 1
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _patch_activity_users({user_id: _touch})
+        return
+    # Sadece bu kullanıcı güncellenir; yazım db thread'inde / disk havuzunda, loop beklemez
+    task = asyncio.ensure_future(_apatch_activity_users({user_id: _touch}))
+    _ACTIVITY_PATCHES.add(task)
+    task.add_done_callback(_ACTIVITY_PATCHES.discard)
+
+class VoiceTracker:
+    """Dahili voice süresi takibi (on_voice_state_update).
+    Sayılan kullanıcılar için oturum başlangıcı bellekte tutulur; birikmiş süre her
+    VOICE_TRACKER_FLUSH_SECONDS'ta tam dakikalara çevrilip puan store'una artımlı işlenir.
+    activity_state'e (voice_minutes) sadece dakika kazanan kullanıcılar yazılır: SQLite'ta her
+    flush'ta ilgili satırlar, JSON'da en fazla VOICE_TRACKER_SAVE_SECONDS'ta bir (loop dışında).
+    Artık saniyeler bir sonraki flush'a devreder. Her ready/resume'da oturumlar yeniden eşitlenir.
+    Sayılmayanlar: botlar, AFK kanalı, hariç tutulan kanallar, sağırlaştırılmış (deaf)
+    kullanıcılar, COUNT_MUTED=0 ise susturulmuşlar ve MIN_MEMBERS altındaki kanallar."""
+
+    def __init__(self):
+        self.sessions: Dict[int, float] = {}  # user_id -> sayılan dönemin başlangıcı (monotonic)
+        self.pending: Dict[int, float] = {}   # user_id -> henüz işlenmemiş saniye
+        self.unsaved: Dict[int, int] = {}     # user_id -> puana işlenmiş, activity_state'e yazılmamış dakika
+        self.last_save = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        # metrics
+        self.updates = 0
+        self.flushes = 0
+        self.minutes_credited = 0
+        self.saves = 0
+        self.bootstraps = 0
+        self.ticks = 0
+        self.last_tick: Optional[float] = None
+
+    def _counts(self, member: discord.Member, vs: Optional[discord.VoiceState]) -> bool:
+        ch = vs.channel if vs else None
+        if ch is None or member.bot or ch.guild.id != GUILD_ID:
+            return False
+        afk = ch.guild.afk_channel
+        if (afk and ch.id == afk.id) or ch.id in VOICE_TRACKER_EXCLUDED_CHANNELS:
+            return False
+        if vs.deaf or vs.self_deaf:
+            return False
+        if not VOICE_TRACKER_COUNT_MUTED and (vs.mute or vs.self_mute):
+            return False
+        if VOICE_TRACKER_MIN_MEMBERS > 1:
+            if sum(1 for m in ch.members if not m.bot) < VOICE_TRACKER_MIN_MEMBERS:
+                return False
+        return True
+
+    def _settle(self, user_id: int, now: float, keep: bool) -> None:
+        start = self.sessions.pop(user_id, None)
+        if start is not None:
+            self.pending[user_id] = self.pending.get(user_id, 0.0) + max(0.0, now - start)
+            if keep:
+                self.sessions[user_id] = now
+
+    def _set(self, member: discord.Member, counting: bool, now: float) -> None:
+        if counting:
+            self.sessions.setdefault(member.id, now)
+        else:
+            self._settle(member.id, now, keep=False)
+
+    def _refresh_channel(self, channel: Optional[discord.abc.GuildChannel], now: float) -> None:
+        # Kanal nüfusu değişince (MIN_MEMBERS kuralı) oradaki herkes yeniden değerlendirilir
+        if channel is None:
+            return
+        for m in getattr(channel, "members", []):
+            self._set(m, self._counts(m, m.voice), now)
+
+    def on_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState) -> None:
+        self.updates += 1
+        now = time.monotonic()
+        self._set(member, self._counts(member, after), now)
+        if VOICE_TRACKER_MIN_MEMBERS > 1:
+            if before.channel is not None and before.channel != after.channel:
+                self._refresh_channel(before.channel, now)
+            self._refresh_channel(after.channel, now)
+
+    def bootstrap(self, guild: discord.Guild) -> None:
+        """Açılış/yeniden bağlanmada seste olanlarla oturumları eşitler."""
+        now = time.monotonic()
+        seen = set()
+        for ch in list(guild.voice_channels) + list(getattr(guild, "stage_channels", [])):
+            for m in ch.members:
+                seen.add(m.id)
+                self._set(m, self._counts(m, m.voice), now)
+        for uid in [u for u in self.sessions if u not in seen]:
+            self._settle(uid, now, keep=False)
+        self.bootstraps += 1
+        log(f"[VOICE] Tracker: {len(self.sessions)} kullanıcı seste sayılıyor")
+
+    def _collect(self) -> Dict[int, int]:
+        """Oturumları keser ve tam dakikaya ulaşan birikimleri döndürür (user_id -> dakika)."""
+        now = time.monotonic()
+        for uid in list(self.sessions):
+            self._settle(uid, now, keep=True)
+        credit: Dict[int, int] = {}
+        for uid, sec in list(self.pending.items()):
+            minutes = int(sec // 60)
+            if minutes > 0:
+                credit[uid] = minutes
+                self.pending[uid] = sec - minutes * 60
+            if uid not in self.sessions and self.pending[uid] < 1:
+                del self.pending[uid]
+        return credit
+
+    async def flush(self, force: bool = False) -> int:
+        """Birikmiş süreyi dakikaya çevirip puan store'una işler; activity_state'e sadece
+        dakika kazananlar yazılır (JSON'da debounce'lu, `force` ile hemen)."""
+        credit = self._collect()
+        if credit:
+            PUAN_STORE.reset_daily_if_needed()
+            for uid, minutes in credit.items():
+                # puan artımlı: store'un son gördüğü dakika + yeni dakika (activity_state okunmaz)
+                _update_user_points_from_voice(uid, PUAN_STORE.user(uid).last_voice_minutes + minutes)
+                self.unsaved[uid] = self.unsaved.get(uid, 0) + minutes
+            self.flushes += 1
+            self.minutes_credited += sum(credit.values())
+        if self.unsaved and (force or _state_db_for("activity") is not None
+                             or time.monotonic() - self.last_save >= VOICE_TRACKER_SAVE_SECONDS):
+            await self._save()
+        return len(credit)
+
+    async def _save(self) -> None:
+        batch, self.unsaved = self.unsaved, {}
+        self.last_save = time.monotonic()
+        now_iso = datetime.now(UTC_TZ).isoformat()
+
+        def _add(minutes: int) -> Callable[[Dict[str, Any]], None]:
+            def _apply(user_data: Dict[str, Any]) -> None:
+                user_data["voice_minutes"] = (user_data.get("voice_minutes", 0) or 0) + minutes
+                user_data["last_activity"] = now_iso
+                user_data["last_activity_type"] = "voice"
+            return _apply
+
+        if await _apatch_activity_users({uid: _add(m) for uid, m in batch.items()}):
+            self.saves += 1
+        else:
+            for uid, m in batch.items():  # yazılamadı -> sonraki denemede tekrar
+                self.unsaved[uid] = self.unsaved.get(uid, 0) + m
+
+    def resync(self, bot_client) -> None:
+        """on_ready/on_resumed: kopukluk sırasında kaçan ses olayları için oturumları eşitler."""
+        guild = bot_client.get_guild(GUILD_ID)
+        if guild:
+            self.bootstrap(guild)
+
+    async def run(self, bot_client) -> None:
+        """setup_hook'tan başlatılır; hazır olunca periyodik flush yapar (bootstrap ready listener'ında)."""
+        await bot_client.wait_until_ready()
+        log(f"[VOICE] Flush döngüsü başladı (her {VOICE_TRACKER_FLUSH_SECONDS}s)")
+        while not bot_client.is_closed():
+            await asyncio.sleep(VOICE_TRACKER_FLUSH_SECONDS)
+            self.ticks += 1
+            self.last_tick = time.monotonic()
+            try:
+                await self.flush()
+            except Exception as e:
+                log(f"[VOICE] Flush hatası: {repr(e)}")
+
+    def running(self) -> bool:
+        """Flush döngüsü çalışıyor mu (task canlı ve son tur gecikmemiş)."""
+        if self.task is None or self.task.done():
+            return False
+        if self.last_tick is None:
+            return True  # henüz ilk tur gelmedi
+        return time.monotonic() - self.last_tick <= VOICE_TRACKER_FLUSH_SECONDS * 3
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": len(self.sessions), "updates": self.updates,
+                "flushes": self.flushes, "minutes": self.minutes_credited,
+                "saves": self.saves, "unsaved": sum(self.unsaved.values()), "bootstraps": self.bootstraps,
+                "ticks": self.ticks, "running": self.running()}
+
+VOICE_TRACKER = VoiceTracker()
 
 # Ticket sayacı için dosya
 TICKET_STATE_FILE = os.path.join(BASE_DIR, "ticket_state.json")
 
 def _load_ticket_state() -> Dict[str, Any]:
     try:
+        db = _state_db_for("tickets")
+        if db is not None:
+            return db.load("tickets", TICKET_STATE_FILE) or {"counter": 0}
         if os.path.exists(TICKET_STATE_FILE):
             with open(TICKET_STATE_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
@@ -1513,25 +2389,380 @@ def _load_ticket_state() -> Dict[str, Any]:
         pass
     return {"counter": 0}
 
-def _save_ticket_state(state: Dict[str, Any]) -> None:
-    try:
-        with open(TICKET_STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+def _save_ticket_state(state: Dict[str, Any]) -> None:
+    try:
+        db = _state_db_for("tickets")
+        if db is not None:
+            db.save("tickets", state)
+            return
+        with open(TICKET_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    except Exception:
+        pass
+
+SHEET_URL = os.getenv(
+    "SHEET_URL",
+    "https://docs.google.com/spreadsheets/d/182lp2yRDlTNAq9QOwxvwir_jY5ELjFiRBKJcDLOUBYY/edit?usp=sharing",
+)
+
+def log(*args):
+    print("[BOT]", *args)
+
+# =========================================================
+#          BLOCKING I/O THREAD POOLS (render / disk / media)
+# =========================================================
+# Her iş sınıfı kendi havuzunda: yavaş bir yt-dlp çıkarımı kill kartı render'ını
+# (ya da render disk yazılarını) aç bırakmaz. Sheets I/O thread kullanmaz (AsyncSheetsClient).
+# Boyutlar env ile ayarlanır.
+IO_POOL_SIZES = {
+    "render": int(os.getenv("IO_POOL_RENDER", "2")),
+    "disk": int(os.getenv("IO_POOL_DISK", "2")),
+    "media": int(os.getenv("IO_POOL_MEDIA", "2")),
+}
+
+class IOPool:
+    """Adlı ThreadPoolExecutor + metrikler: kuyruk bekleme, çalışma süresi, doluluk."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self._ex = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"io-{name}")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.queued = 0
+        self.active = 0
+        self.peak_queued = 0
+        self.submitted = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+        self._sat_since: Optional[float] = None  # tüm worker'lar meşgulse başlangıç zamanı
+        self.saturated_s = 0.0
+
+    def _set_active(self, delta: int) -> None:
+        # lock altında çağrılır
+        now = time.monotonic()
+        was_full = self.active >= self.workers
+        self.active += delta
+        full = self.active >= self.workers
+        if full and not was_full:
+            self._sat_since = now
+        elif was_full and not full and self._sat_since is not None:
+            self.saturated_s += now - self._sat_since
+            self._sat_since = None
+
+    async def run(self, fn, *args, **kwargs):
+        t_sub = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+
+        def _call():
+            t0 = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self._set_active(+1)
+                wait = t0 - t_sub
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                took = time.monotonic() - t0
+                with self._lock:
+                    self._set_active(-1)
+                    self.run_total += took
+                    self.run_max = max(self.run_max, took)
+
+        return await asyncio.get_running_loop().run_in_executor(self._ex, _call)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            done = max(1, self.submitted - self.queued - self.active)
+            sat = self.saturated_s + ((now - self._sat_since) if self._sat_since is not None else 0.0)
+            return {
+                "workers": self.workers, "active": self.active, "queued": self.queued, "peak_queued": self.peak_queued,
+                "submitted": self.submitted, "failed": self.failed,
+                "wait_avg_ms": self.wait_total / done * 1000.0, "wait_max_ms": self.wait_max * 1000.0,
+                "run_avg_ms": self.run_total / done * 1000.0, "run_max_ms": self.run_max * 1000.0,
+                "saturated_pct": 100.0 * sat / max(1e-6, now - self._started),
+            }
+
+    def shutdown(self) -> None:
+        self._ex.shutdown(wait=False, cancel_futures=True)
+
+IO_POOLS: Dict[str, IOPool] = {name: IOPool(name, n) for name, n in IO_POOL_SIZES.items()}
+
+# Run blocking I/O in thread - heartbeat bloklamasın. pool: sheets | render | disk | media
+async def run_io(fn, *args, pool: str = "disk", **kwargs):
+    return await IO_POOLS[pool].run(fn, *args, **kwargs)
+
+# =========================================================
+#              DISCORD OUTBOUND QUEUE (send/edit)
+# =========================================================
+# Killboard/deathboard, battleboard, hatırlatma DM'leri ve puan uyarıları
+# Discord'a tek bir dispatcher üzerinden gider:
+#   - aynı hedef (kanal / DM) içinde FIFO sıra korunur
+#   - hedefler arası öncelik: interaction edit > canlı feed > DM > backfill
+#   - 429 / RateLimited gelirse sadece o hedef retry_after kadar park edilir,
+#     diğer hedefler çalışmaya devam eder
+#   - discord.File'lar kuyruğa alınırken bayta çevrilir, her denemede yeniden oluşturulur
+OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "4"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+OUT_PRIO_INTERACTION = 0
+OUT_PRIO_LIVE = 1
+OUT_PRIO_DM = 2
+OUT_PRIO_BACKFILL = 3
+_OUT_PRIO_NAMES = {
+    OUT_PRIO_INTERACTION: "interaction",
+    OUT_PRIO_LIVE: "live",
+    OUT_PRIO_DM: "dm",
+    OUT_PRIO_BACKFILL: "backfill",
+}
+
+@dataclass
+class _OutboundJob:
+    key: str
+    prio: int
+    factory: Callable[[], Awaitable[Any]]
+    fut: "asyncio.Future"
+    enq_at: float
+    attempts: int = 0
+
+class OutboundDispatcher:
+    """Per-target FIFO, priority-scheduled Discord outbound queue."""
+
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = max(1, int(concurrency))
+        self._queues: Dict[str, deque] = {}
+        self._heap: List[Tuple[int, int, str]] = []  # (prio, seq, key)
+        self._heap_seq: Dict[str, int] = {}  # key -> geçerli heap girdisi (lazy delete)
+        self._inflight: set = set()
+        self._parked: Dict[str, float] = {}  # key -> loop.time() until
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        # metrics
+        self.sent = 0
+        self.failed = 0
+        self.ratelimited = 0
+        self.wait_count: Dict[int, int] = {p: 0 for p in _OUT_PRIO_NAMES}
+        self.wait_total: Dict[int, float] = {p: 0.0 for p in _OUT_PRIO_NAMES}
+        self.wait_max: Dict[int, float] = {p: 0.0 for p in _OUT_PRIO_NAMES}
+
+    def _ensure_started(self) -> None:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def _schedule(self, key: str) -> None:
+        # caller holds the condition lock
+        q = self._queues.get(key)
+        if not q or key in self._inflight or key in self._parked:
+            return
+        prio = min(j.prio for j in q)  # priority inheritance: FIFO ama en acil iş kadar öne çık
+        seq = next(self._seq)
+        self._heap_seq[key] = seq
+        heapq.heappush(self._heap, (prio, seq, key))
+
+    async def submit(self, key: str, factory: Callable[[], Awaitable[Any]], *, prio: int = OUT_PRIO_LIVE) -> Any:
+        """Queue `factory()` for target `key` and wait for its result.
+
+        `factory` her denemede yeni bir coroutine üretmeli (retry için).
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        job = _OutboundJob(key=str(key), prio=int(prio), factory=factory, fut=loop.create_future(), enq_at=loop.time())
+        async with self._cond:
+            self._queues.setdefault(job.key, deque()).append(job)
+            self._schedule(job.key)
+            self._cond.notify()
+        return await job.fut
+
+    async def _next_key(self) -> str:
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            while True:
+                now = loop.time()
+                for k, until in list(self._parked.items()):
+                    if until <= now:
+                        del self._parked[k]
+                        self._schedule(k)
+                while self._heap:
+                    _prio, seq, key = heapq.heappop(self._heap)
+                    if self._heap_seq.get(key) != seq:
+                        continue
+                    del self._heap_seq[key]
+                    self._inflight.add(key)
+                    return key
+                timeout = None
+                if self._parked:
+                    timeout = max(0.05, min(self._parked.values()) - now)
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    @staticmethod
+    def _retry_after(e: BaseException) -> Optional[float]:
+        if isinstance(e, discord.RateLimited):
+            return float(e.retry_after or 1.0)
+        if isinstance(e, discord.HTTPException) and getattr(e, "status", 0) == 429:
+            try:
+                return float(e.response.headers.get("Retry-After") or 1.0)
+            except Exception:
+                return 1.0
+        return None
 
-SHEET_URL = os.getenv(
-    "SHEET_URL",
-    "https://docs.google.com/spreadsheets/d/182lp2yRDlTNAq9QOwxvwir_jY5ELjFiRBKJcDLOUBYY/edit?usp=sharing",
-)
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            key = await self._next_key()
+            q = self._queues.get(key)
+            job = q[0] if q else None
+            park_for: Optional[float] = None
+            done = True
+            if job is not None and not job.fut.done():
+                if job.attempts == 0:
+                    w = loop.time() - job.enq_at
+                    self.wait_count[job.prio] = self.wait_count.get(job.prio, 0) + 1
+                    self.wait_total[job.prio] = self.wait_total.get(job.prio, 0.0) + w
+                    self.wait_max[job.prio] = max(self.wait_max.get(job.prio, 0.0), w)
+                job.attempts += 1
+                try:
+                    res = await job.factory()
+                    if not job.fut.done():
+                        job.fut.set_result(res)
+                    self.sent += 1
+                except asyncio.CancelledError:
+                    if not job.fut.done():
+                        job.fut.cancel()
+                    raise
+                except Exception as e:
+                    park_for = self._retry_after(e)
+                    if park_for is not None:
+                        self.ratelimited += 1
+                    if park_for is not None and job.attempts <= OUTBOUND_MAX_RETRIES:
+                        done = False  # head'de kalır, hedef park edilir
+                    else:
+                        self.failed += 1
+                        if not job.fut.done():
+                            job.fut.set_exception(e)
+            async with self._cond:
+                if done and q and q[0] is job:
+                    q.popleft()
+                if q is not None and not q:
+                    self._queues.pop(key, None)
+                self._inflight.discard(key)
+                if park_for is not None and not done:
+                    self._parked[key] = loop.time() + park_for
+                else:
+                    self._schedule(key)
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        depth = {name: 0 for name in _OUT_PRIO_NAMES.values()}
+        for q in self._queues.values():
+            for j in q:
+                depth[_OUT_PRIO_NAMES.get(j.prio, str(j.prio))] = depth.get(_OUT_PRIO_NAMES.get(j.prio, str(j.prio)), 0) + 1
+        wait = {}
+        for p, name in _OUT_PRIO_NAMES.items():
+            c = self.wait_count.get(p, 0)
+            wait[name] = {
+                "count": c,
+                "avg_ms": (self.wait_total.get(p, 0.0) / c * 1000.0) if c else 0.0,
+                "max_ms": self.wait_max.get(p, 0.0) * 1000.0,
+            }
+        return {
+            "depth": depth,
+            "depth_total": sum(depth.values()),
+            "targets": len(self._queues),
+            "inflight": len(self._inflight),
+            "parked": len(self._parked),
+            "sent": self.sent,
+            "failed": self.failed,
+            "ratelimited": self.ratelimited,
+            "wait": wait,
+        }
 
-def log(*args):
-    print("[BOT]", *args)
+    async def stop(self) -> None:
+        for w in self._workers:
+            w.cancel()
+        self._workers = []
+        for q in self._queues.values():
+            for j in q:
+                if not j.fut.done():
+                    j.fut.cancel()
+        self._queues.clear()
+
+OUTBOUND = OutboundDispatcher(OUTBOUND_CONCURRENCY)
+
+def _out_key(target: Any) -> str:
+    """Queue key for a send/edit target (channel/thread/DM)."""
+    if isinstance(target, discord.Message):
+        return "ch:%s" % target.channel.id
+    if isinstance(target, (discord.User, discord.Member)):
+        return "dm:%s" % target.id
+    return "ch:%s" % getattr(target, "id", id(target))
+
+@dataclass
+class _OutFileBytes:
+    data: bytes
+    filename: str
+    spoiler: bool
+    description: Optional[str]
 
-# Run blocking I/O in thread (py3.8 uyumlu) - heartbeat bloklamasın
-async def run_io(fn, *args, **kwargs):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+    @classmethod
+    def snapshot(cls, f: discord.File) -> "_OutFileBytes":
+        # discord.File tek kullanımlık: gönderimden sonra kapanır / EOF'ta kalır
+        f.reset()
+        data = f.fp.read()
+        f.close()
+        return cls(data, f.filename, f.spoiler, f.description)
+
+    def build(self) -> discord.File:
+        return discord.File(io.BytesIO(self.data), filename=self.filename, spoiler=self.spoiler, description=self.description)
+
+def _out_kwargs_factory(kwargs: Dict[str, Any]) -> Callable[[], Dict[str, Any]]:
+    """kwargs'taki discord.File'ları (file / files / attachments) bayt olarak saklar;
+    dönen fonksiyon her denemede taze File nesneleriyle kwargs üretir."""
+    frozen = dict(kwargs)
+    if isinstance(frozen.get("file"), discord.File):
+        frozen["file"] = _OutFileBytes.snapshot(frozen["file"])
+    for name in ("files", "attachments"):
+        if isinstance(frozen.get(name), (list, tuple)):
+            frozen[name] = [_OutFileBytes.snapshot(x) if isinstance(x, discord.File) else x for x in frozen[name]]
+
+    def build() -> Dict[str, Any]:
+        kw = dict(frozen)
+        if isinstance(kw.get("file"), _OutFileBytes):
+            kw["file"] = kw["file"].build()
+        for name in ("files", "attachments"):
+            if isinstance(kw.get(name), list):
+                kw[name] = [x.build() if isinstance(x, _OutFileBytes) else x for x in kw[name]]
+        return kw
+    return build
+
+async def out_send(target: Any, *, prio: int = OUT_PRIO_LIVE, **kwargs) -> Any:
+    """`target.send(**kwargs)` through the outbound queue."""
+    build = _out_kwargs_factory(kwargs)
+    return await OUTBOUND.submit(_out_key(target), lambda: target.send(**build()), prio=prio)
+
+async def out_edit(message: discord.Message, *, prio: int = OUT_PRIO_INTERACTION, **kwargs) -> Any:
+    """`message.edit(**kwargs)` through the outbound queue (same FIFO as the channel)."""
+    build = _out_kwargs_factory(kwargs)
+    return await OUTBOUND.submit(_out_key(message), lambda: message.edit(**build()), prio=prio)
 
 # =========================================================
 #                   ALBION KILLBOT CONFIG
@@ -1585,6 +2816,8 @@ KILLBOT_MEMBER_IDS = os.getenv("KILLBOT_MEMBER_IDS", "").strip()  # opsiyonel: v
 
 # Eski event filtresi - bu süreden eski eventler ATILMAZ (saat cinsinden)
 KILLBOT_MAX_EVENT_AGE_HOURS = int(os.getenv("KILLBOT_MAX_EVENT_AGE_HOURS", "24"))  # 24 saat
+# Bu süreden eski eventler outbound kuyrukta "backfill" önceliğiyle gider (dakika)
+KILLBOT_BACKFILL_AGE_MINUTES = int(os.getenv("KILLBOT_BACKFILL_AGE_MINUTES", "60"))
 # State dosyası bozulma koruması
 KILLBOT_STATE_BACKUP_FILE = os.getenv("KILLBOT_STATE_BACKUP_FILE", "killbot_state.backup.json")
 
@@ -1606,9 +2839,21 @@ KILLBOT_MAX_LOST_LINES = int(os.getenv("KILLBOT_MAX_LOST_LINES", "28"))
 BATTLEBOARD_CHANNEL_ID = int(os.getenv("BATTLEBOARD_CHANNEL_ID", "1456372978995433706"))
 BATTLEBOARD_POLL_SECONDS = int(os.getenv("BATTLEBOARD_POLL_SECONDS", "60"))
 BATTLEBOARD_STATE_FILE = os.getenv("BATTLEBOARD_STATE_FILE", "battleboard_state.json")
-BATTLEBOARD_MIN_GUILD_PLAYERS = int(os.getenv("BATTLEBOARD_MIN_GUILD_PLAYERS", "5"))
+# Eski MIN_CALLIDUS_PLAYERS env'i hâlâ geçerli (tek eşik)
+BATTLEBOARD_MIN_GUILD_PLAYERS = int(os.getenv("BATTLEBOARD_MIN_GUILD_PLAYERS", os.getenv("MIN_CALLIDUS_PLAYERS", "6")))
+MIN_CALLIDUS_PLAYERS = BATTLEBOARD_MIN_GUILD_PLAYERS
 BATTLEBOARD_MIN_TOTAL_FAME = int(os.getenv("BATTLEBOARD_MIN_TOTAL_FAME", "0"))
 ALBIONBB_BASE = os.getenv("ALBIONBB_BASE", "https://europe.albionbb.com").rstrip("/")
+ALBIONBB_GUILD_BATTLES_URL = os.getenv(
+    "ALBIONBB_GUILD_BATTLES_URL",
+    "%s/guilds/%s/battles?minPlayers=5" % (ALBIONBB_BASE, AO_GUILD_ID)
+)
+# Aday battle listesi kaynağı: "albionbb" (guild battles sayfası) | "ao" (gameinfo /battles)
+BATTLEBOARD_SOURCE = (os.getenv("BATTLEBOARD_SOURCE", "albionbb") or "albionbb").strip().lower()
+BATTLEBOARD_DETAIL_TTL = int(os.getenv("BATTLEBOARD_DETAIL_TTL", "900"))  # battle detail cache (sn)
+BATTLEBOARD_DETAIL_CACHE_MAX = int(os.getenv("BATTLEBOARD_DETAIL_CACHE_MAX", "64"))
+# Geçici hata veren battle detail'i bu kadar poll denendikten sonra atlanır (cursor ilerler)
+BATTLEBOARD_DETAIL_MAX_RETRIES = int(os.getenv("BATTLEBOARD_DETAIL_MAX_RETRIES", "5"))
 
 
 KILLBOT_IMAGE_ENABLED = os.getenv("KILLBOT_IMAGE_ENABLED", "1").strip() not in ("0", "false", "False", "no")
@@ -2506,19 +3751,9 @@ class ContentOylamaModal(discord.ui.Modal):
 # =========================================================
 #                   GOOGLE SHEETS (ASYNC WRAP)
 # =========================================================
-_gspread_mod = None
-_gspread_client = None
-_gspread_sheets: Dict[str, Any] = {}
-
-def _get_gspread_module():
-    global _gspread_mod
-    if _gspread_mod is None:
-        import gspread
-        _gspread_mod = gspread
-    return _gspread_mod
-
-
-
+# service account scope'ları (Drive: modifiedTime kontrolü)
+_GS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+GS_TOKEN_REFRESH_MARGIN = int(os.getenv("GS_TOKEN_REFRESH_MARGIN", "300"))  # sn, expiry'den bu kadar önce yenile
 
 def _resolve_sheet_id_for_tab(tab_name: str) -> str:
     """Resolve which Spreadsheet ID should be used for a given tab name (or tab-ref)."""
@@ -2546,120 +3781,516 @@ def _resolve_sheet_id_for_tab(tab_name: str) -> str:
 
 
 
-def _gs_authorize_sync():
-    """
-    GOOGLE_CREDS_JSON:
-      - Eğer "{...}" ile başlıyorsa => JSON content (env'e yapıştırılmış)
-      - Yoksa => dosya yolu (/root/infinity-bot/creds.json gibi)
-    """
-    global _gspread_client
-    if _gspread_client is not None:
-        return _gspread_client
-
-    if not GOOGLE_CREDS_JSON:
-        raise RuntimeError("GOOGLE_CREDS_JSON ayarlı değil.")
-
-    gs = _get_gspread_module()
-    src = (GOOGLE_CREDS_JSON or "").strip()
-
-    if src.startswith("{"):
-        creds_info = json.loads(src)
-        from google.oauth2.service_account import Credentials
-        creds = Credentials.from_service_account_info(
-            creds_info,
-            scopes=["https://www.googleapis.com/auth/spreadsheets"],
-        )
-        gc = gs.authorize(creds)
-    else:
-        gc = gs.service_account(filename=src)
+async def _gs_token_refresh_loop() -> None:
+    """Token'ı süresi dolmadan arka planda yeniler; boşta kalma sonrası ilk istek auth beklemez."""
+    while True:
+        try:
+            if GOOGLE_CREDS_JSON:
+                if await SHEETS_API.ensure_token(GS_TOKEN_REFRESH_MARGIN):
+                    log("[SHEETS] OAuth token yenilendi (async client).")
+        except Exception as e:
+            log(f"[SHEETS] token yenileme hatası: {e!r}")
+        await asyncio.sleep(60)
 
-    _gspread_client = gc
-    return gc
 
+# =========================================================
+#            GOOGLE SHEETS QUOTA (read / write per minute)
+# =========================================================
+# Sheets API kotası: kullanıcı başına dakikada N okuma + N yazma. Her gerçek API isteği
+# (async client) buradan slot alır;
+# sadece son 60 sn'deki kullanım limite dayanınca bekler. 429 gelirse o tür bloke edilir.
+SHEETS_READ_PER_MIN = int(os.getenv("SHEETS_READ_PER_MIN", "60"))
+SHEETS_WRITE_PER_MIN = int(os.getenv("SHEETS_WRITE_PER_MIN", "60"))
+
+class SheetsQuota:
+    """Per-minute read/write budget shared by all async Sheets callers."""
+
+    WINDOW = 60.0
+
+    def __init__(self, read_per_min: int = 60, write_per_min: int = 60):
+        self.limits = {"read": max(1, int(read_per_min)), "write": max(1, int(write_per_min))}
+        self._log: Dict[str, deque] = {"read": deque(), "write": deque()}  # monotonic zamanlar
+        self._blocked_until = {"read": 0.0, "write": 0.0}
+        self._lock = threading.Lock()
+        # metrics
+        self.used = {"read": 0, "write": 0}
+        self.waited = {"read": 0.0, "write": 0.0}
+        self.throttled = 0
+
+    def _reserve(self, kind: str) -> float:
+        """Take a slot now (0.0) or return how long to wait before trying again."""
+        now = time.monotonic()
+        with self._lock:
+            q = self._log[kind]
+            while q and now - q[0] >= self.WINDOW:
+                q.popleft()
+            wait = self._blocked_until[kind] - now
+            if wait <= 0:
+                if len(q) < self.limits[kind]:
+                    q.append(now)
+                    self.used[kind] += 1
+                    return 0.0
+                wait = q[0] + self.WINDOW - now
+            return max(0.05, wait)
+
+    async def acquire(self, kind: str) -> None:
+        while True:
+            wait = self._reserve(kind)
+            if wait <= 0:
+                return
+            self.waited[kind] += wait
+            await asyncio.sleep(wait)
 
-def _gs_open_sheet_sync(sheet_id: str):
-    global _gspread_sheets
-    sid = (sheet_id or "").strip()
-    if not sid:
-        raise RuntimeError("Sheet ID boş. (.env / vars kontrol et)")
+    def note_exhausted(self, kind: str, retry_after: Optional[float] = None) -> None:
+        """API 429 verdi: kotayı başka bir istemci de yiyor olabilir, bu türü beklet."""
+        with self._lock:
+            until = time.monotonic() + (float(retry_after) if retry_after else self.WINDOW / 2)
+            self._blocked_until[kind] = max(self._blocked_until[kind], until)
+            self.throttled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            last = {k: sum(1 for t in q if now - t < self.WINDOW) for k, q in self._log.items()}
+        return {"limits": dict(self.limits), "last_min": last, "used": dict(self.used),
+                "waited_s": {k: round(v, 1) for k, v in self.waited.items()}, "throttled": self.throttled}
+
+SHEETS_QUOTA = SheetsQuota(SHEETS_READ_PER_MIN, SHEETS_WRITE_PER_MIN)
+
+# =========================================================
+#               GOOGLE SHEETS (ASYNC REST CLIENT)
+# =========================================================
+# gs_* helper'ları ve write-behind buffer Sheets v4 REST API'sine doğrudan aiohttp
+# ile gider (executor thread'i tutmaz, bağlantılar tek session'da yeniden kullanılır).
+# Auth: service account JWT (RS256) -> oauth2 token; token süresi dolmadan yenilenir.
+SHEETS_API_BASE = os.getenv("SHEETS_API_BASE", "https://sheets.googleapis.com/v4").rstrip("/")
+DRIVE_API_BASE = os.getenv("DRIVE_API_BASE", "https://www.googleapis.com/drive/v3").rstrip("/")
+SHEETS_API_TIMEOUT = float(os.getenv("SHEETS_API_TIMEOUT", "30"))
+SHEETS_API_RETRIES = int(os.getenv("SHEETS_API_RETRIES", "4"))
+SHEETS_API_CONNECTIONS = int(os.getenv("SHEETS_API_CONNECTIONS", "8"))
+
+class SheetsAPIError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Sheets API {status}: {message}")
+        self.status = int(status)
+
+def _gs_a1_tab(title: str) -> str:
+    return "'" + (title or "").replace("'", "''") + "'"
+
+class AsyncSheetsClient:
+    """Minimal async Sheets v4 client (values.get/batchGet/batchUpdate/append, spreadsheets.batchUpdate)."""
+
+    def __init__(self):
+        self.client: Optional[discord.Client] = None  # setup_hook bağlar (bot'un HTTP session'ı)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._signer = None
+        self._email = ""
+        self._token_uri = ""
+        self._token = ""
+        self._token_exp = 0.0  # loop time
+        self._token_lock: Optional[asyncio.Lock] = None
+        # sheet_id -> {"titles": [..], "ids": {title: sheetId}}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        # metrics
+        self.requests = 0
+        self.retries = 0
+        self.token_refreshes = 0
+
+    # ---- plumbing ----
+    def _http(self) -> aiohttp.ClientSession:
+        # killbot/battleboard ile aynı session (bağlantı havuzu paylaşılıyor); bot yoksa kendi session'ı
+        s = getattr(self.client, "_kb_http", None) if self.client is not None else None
+        if s is not None and not s.closed:
+            return s
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max(1, SHEETS_API_CONNECTIONS), keepalive_timeout=60),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _load_key(self) -> None:
+        if self._signer is not None:
+            return
+        if not GOOGLE_CREDS_JSON:
+            raise RuntimeError("GOOGLE_CREDS_JSON ayarlı değil.")
+        src = (GOOGLE_CREDS_JSON or "").strip()
+        if src.startswith("{"):
+            info = json.loads(src)
+        else:
+            with open(src, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        from google.auth import crypt
+        self._signer = crypt.RSASigner.from_service_account_info(info)
+        self._email = info.get("client_email") or ""
+        self._token_uri = os.getenv("GOOGLE_TOKEN_URI") or info.get("token_uri") or "https://oauth2.googleapis.com/token"
+
+    async def ensure_token(self, margin: float = 300.0) -> bool:
+        """Fetch a new access token if the current one expires within `margin` sec. True = refreshed."""
+        if self._token and _loop_time() < self._token_exp - margin:
+            return False
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token and _loop_time() < self._token_exp - margin:
+                return False
+            self._load_key()
+            from google.auth import jwt as _gjwt
+            now = int(datetime.now(timezone.utc).timestamp())
+            assertion = _gjwt.encode(self._signer, {
+                "iss": self._email,
+                "scope": " ".join(_GS_SCOPES),
+                "aud": self._token_uri,
+                "iat": now,
+                "exp": now + 3600,
+            })
+            if isinstance(assertion, bytes):
+                assertion = assertion.decode("ascii")
+            async with self._http().post(self._token_uri, data={
+                "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+                "assertion": assertion,
+            }, timeout=aiohttp.ClientTimeout(total=SHEETS_API_TIMEOUT)) as resp:
+                js = await resp.json(content_type=None)
+                if resp.status != 200 or not isinstance(js, dict) or not js.get("access_token"):
+                    raise SheetsAPIError(resp.status, f"token: {js!r}")
+            self._token = js["access_token"]
+            self._token_exp = _loop_time() + float(js.get("expires_in") or 3600)
+            self.token_refreshes += 1
+            return True
 
-    gc = _gs_authorize_sync()
-    sh = _gspread_sheets.get(sid)
-    if sh is None:
-        sh = gc.open_by_key(sid)
-        _gspread_sheets[sid] = sh
-    return sh
+    async def _request(self, method: str, url: str, *, params: Any = None, body: Any = None, idempotent: bool = True) -> Any:
+        # idempotent=False (values:append): bağlantı hatası/5xx'te istek sunucuda işlenmiş olabilir,
+        # tekrar denemek satırı çift ekler -> sadece 401/429 (işlenmediği kesin) tekrar denenir
+        attempt = 0
+        kind = "read" if method == "GET" else "write"
+        counted = not url.startswith(DRIVE_API_BASE)
+        while True:
+            await self.ensure_token(margin=60.0)
+            if counted:
+                await SHEETS_QUOTA.acquire(kind)
+            self.requests += 1
+            try:
+                async with self._http().request(method, url, params=params, json=body, headers={"Authorization": f"Bearer {self._token}"},
+                                                timeout=aiohttp.ClientTimeout(total=SHEETS_API_TIMEOUT)) as resp:
+                    if resp.status == 200:
+                        return await resp.json(content_type=None)
+                    text = await resp.text()
+                    status = resp.status
+                    retry_after = resp.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, text, retry_after = 0, repr(e), None
+
+            if status == 401 and attempt == 0:
+                self._token = ""  # token iptal/expire -> yeniden al
+            elif status not in ((0, 429, 500, 502, 503, 504) if idempotent else (429,)) or attempt >= SHEETS_API_RETRIES:
+                raise SheetsAPIError(status, text[:500])
+            attempt += 1
+            self.retries += 1
+            try:
+                delay = float(retry_after) if retry_after else min(32.0, 2.0 ** attempt)
+            except ValueError:
+                delay = min(32.0, 2.0 ** attempt)
+            if status == 429 and counted:
+                # bekleme kota üzerinden (diğer Sheets istekleri de aynı süre bekler)
+                SHEETS_QUOTA.note_exhausted(kind, delay)
+                continue
+            await asyncio.sleep(delay)
+
+    # ---- spreadsheets ----
+    async def metadata(self, sheet_id: str, *, refresh: bool = False) -> Dict[str, Any]:
+        sid = (sheet_id or "").strip()
+        meta = self._meta.get(sid)
+        if meta is None or refresh:
+            js = await self._request("GET", f"{SHEETS_API_BASE}/spreadsheets/{sid}", params={"fields": "sheets.properties(sheetId,title,index)"})
+            props = sorted((s.get("properties") or {} for s in (js or {}).get("sheets") or []), key=lambda p: int(p.get("index") or 0))
+            meta = {"titles": [p.get("title") or "" for p in props], "ids": {p.get("title") or "": int(p.get("sheetId") or 0) for p in props}}
+            self._meta[sid] = meta
+        return meta
+
+    def invalidate(self, sheet_id: str) -> None:
+        self._meta.pop((sheet_id or "").strip(), None)
+
+    async def tab_title(self, sheet_id: str, tab: str, *, fallback_first: bool = True) -> Optional[str]:
+        """Actual tab title (gspread worksheet() gibi); yoksa metadata bir kez tazelenir, yine yoksa ilk tab."""
+        meta = await self.metadata(sheet_id)
+        if tab in meta["ids"]:
+            return tab
+        meta = await self.metadata(sheet_id, refresh=True)
+        if tab in meta["ids"]:
+            return tab
+        if fallback_first and meta["titles"]:
+            return meta["titles"][0]
+        return None
+
+    async def sheet_gid(self, sheet_id: str, title: str) -> Optional[int]:
+        meta = await self.metadata(sheet_id)
+        if title not in meta["ids"]:
+            meta = await self.metadata(sheet_id, refresh=True)
+        return meta["ids"].get(title)
+
+    async def values_get(self, sheet_id: str, range_name: str, *, major_dimension: str = "ROWS") -> List[List[str]]:
+        js = await self._request("GET", f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}/values/{urllib.parse.quote(range_name, safe='')}",
+                                 params={"majorDimension": major_dimension})
+        return (js or {}).get("values") or []
+
+    async def values_batch_get(self, sheet_id: str, ranges: List[str], *, major_dimension: str = "ROWS") -> List[List[List[str]]]:
+        params = [("ranges", r) for r in ranges] + [("majorDimension", major_dimension)]
+        js = await self._request("GET", f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}/values:batchGet", params=params)
+        return [(vr or {}).get("values") or [] for vr in (js or {}).get("valueRanges") or []]
+
+    async def values_batch_update(self, sheet_id: str, data: List[Dict[str, Any]], *, value_input_option: str = "USER_ENTERED") -> Any:
+        return await self._request("POST", f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}/values:batchUpdate",
+                                   body={"valueInputOption": value_input_option, "data": data})
+
+    async def values_batch_clear(self, sheet_id: str, ranges: List[str]) -> Any:
+        return await self._request("POST", f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}/values:batchClear", body={"ranges": ranges})
+
+    async def values_append(self, sheet_id: str, range_name: str, values: List[List[Any]], *, value_input_option: str = "USER_ENTERED") -> Any:
+        return await self._request("POST", f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}/values/{urllib.parse.quote(range_name, safe='')}:append",
+                                   params={"valueInputOption": value_input_option}, body={"values": values}, idempotent=False)
+
+    async def batch_update(self, sheet_id: str, requests: List[Dict[str, Any]]) -> Any:
+        res = await self._request("POST", f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}:batchUpdate", body={"requests": requests})
+        if any(("addSheet" in r) or ("deleteSheet" in r) or ("updateSheetProperties" in r) for r in requests):
+            self.invalidate(sheet_id)
+        return res
+
+    async def modified_time(self, sheet_id: str) -> Optional[str]:
+        js = await self._request("GET", f"{DRIVE_API_BASE}/files/{sheet_id}", params={"fields": "modifiedTime", "supportsAllDrives": "true"})
+        return (js or {}).get("modifiedTime")
+
+SHEETS_API = AsyncSheetsClient()
+
+class SheetTab:
+    """Tek worksheet için async handle (SHEETS_API üzerinde; gspread Worksheet'in kullanılan alt kümesi).
+    Aralıklar tab'a göre (A1); yazılar varsayılan RAW (gspread batch_update/update ile aynı)."""
+
+    def __init__(self, spreadsheet_id: str, title: str, gid: int):
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        self.id = int(gid)
+
+    def _a1(self, rng: str) -> str:
+        return f"{_gs_a1_tab(self.title)}!{rng}"
 
+    async def row_values(self, row: int) -> List[str]:
+        vals = await SHEETS_API.values_get(self.spreadsheet_id, self._a1(f"{int(row)}:{int(row)}"))
+        return [str(v) for v in vals[0]] if vals else []
 
+    async def acell(self, cell: str) -> str:
+        vals = await SHEETS_API.values_get(self.spreadsheet_id, self._a1(cell))
+        return str(vals[0][0]) if vals and vals[0] else ""
 
-def _gs_worksheet_sync(tab_name: str):
+    async def batch_get(self, ranges: List[str], *, major_dimension: str = "ROWS") -> List[List[List[str]]]:
+        return await SHEETS_API.values_batch_get(self.spreadsheet_id, [self._a1(r) for r in ranges], major_dimension=major_dimension)
+
+    async def batch_update(self, data: List[Dict[str, Any]], *, value_input_option: str = "RAW") -> Any:
+        return await SHEETS_API.values_batch_update(self.spreadsheet_id, [dict(d, range=self._a1(d["range"])) for d in data],
+                                                    value_input_option=value_input_option)
+
+    async def batch_clear(self, ranges: List[str]) -> Any:
+        return await SHEETS_API.values_batch_clear(self.spreadsheet_id, [self._a1(r) for r in ranges])
+
+async def _gs_tab(sheet_id: str, tab: str, *, create_rows: int = 0, create_cols: int = 0) -> Tuple[SheetTab, bool]:
+    """(sheet id, tab) -> (SheetTab, yeni_mi). Tab yoksa create_rows verilmişse oluşturulur, yoksa RuntimeError."""
+    sid = (sheet_id or "").strip()
+    if not sid:
+        raise RuntimeError("Sheet ID boş. (.env / vars kontrol et)")
+    gid = await SHEETS_API.sheet_gid(sid, tab)
+    if gid is not None:
+        return SheetTab(sid, tab, gid), False
+    if not create_rows:
+        raise RuntimeError(f"Sheet'te tab yok: {tab}")
+    res = await SHEETS_API.batch_update(sid, [{"addSheet": {"properties": {
+        "title": tab, "gridProperties": {"rowCount": int(create_rows), "columnCount": int(create_cols or 26)}}}}])
+    props = (((res or {}).get("replies") or [{}])[0].get("addSheet") or {}).get("properties") or {}
+    gid = props.get("sheetId")
+    if gid is None:
+        gid = await SHEETS_API.sheet_gid(sid, tab)
+    return SheetTab(sid, tab, int(gid or 0)), True
+
+async def _gs_resolve(tab_name: str) -> Tuple[str, str]:
+    """tab / tab-ref -> (sheet_id, gerçek tab başlığı)."""
     sid, tab = _split_sheet_ref(tab_name)
-    sheet_id = sid or _resolve_sheet_id_for_tab(tab)
+    sheet_id = (sid or _resolve_sheet_id_for_tab(tab) or "").strip()
     if not sheet_id:
-        raise RuntimeError("Sheet ID bulunamadı.")
-    sh = _gs_open_sheet_sync(sheet_id)
-    try:
-        return sh.worksheet(tab)
-    except Exception:
-        return sh.get_worksheet(0)
-
+        raise RuntimeError("Sheet ID bulunamadı. (.env / vars kontrol et)")
+    title = await SHEETS_API.tab_title(sheet_id, tab)
+    if title is None:
+        raise RuntimeError(f"Sheet'te tab yok: {tab}")
+    return sheet_id, title
 
 async def gs_get_all_values(tab_name: str) -> List[List[str]]:
-    def _do():
-        ws = _gs_worksheet_sync(tab_name)
-        return ws.get_all_values()
-    return await run_io(_do)
+    sheet_id, title = await _gs_resolve(tab_name)
+    try:
+        values = await SHEETS_API.values_get(sheet_id, _gs_a1_tab(title))
+    except SheetsAPIError:
+        SHEETS_API.invalidate(sheet_id)
+        raise
+    # gspread get_all_values gibi dikdörtgen (API sondaki boş hücreleri kırpar)
+    width = max((len(r) for r in values), default=0)
+    return [list(r) + [""] * (width - len(r)) for r in values]
 
 async def gs_update_cell(tab_name: str, row: int, col: int, value: str) -> None:
-    def _do():
-        ws = _gs_worksheet_sync(tab_name)
-        ws.update_cell(row, col, value)
-    await run_io(_do)
+    # cache kilidi: süren tam okuma bitsin, yazı yeni grid'e uygulansın (eski girdiyle kaybolmasın)
+    async with _sheet_cache_lock(tab_name):
+        fut = SHEET_WRITES.submit(tab_name, f"{_col_to_letter(col)}{int(row)}", [[value]])
+        _sheet_cache_apply(tab_name, int(row), int(col), [[value]])
+    await fut
 
 async def gs_update_range(tab_name: str, range_name: str, values: List[List[str]]) -> None:
-    def _do():
-        ws = _gs_worksheet_sync(tab_name)
-        ws.update(range_name=range_name, values=values)
-    await run_io(_do)
+    async with _sheet_cache_lock(tab_name):
+        fut = SHEET_WRITES.submit(tab_name, range_name, values)
+        _sheet_cache_apply_range(tab_name, range_name, values)
+    await fut
 
 async def gs_col_values(tab_name: str, col: int) -> List[str]:
-    def _do():
-        ws = _gs_worksheet_sync(tab_name)
-        return ws.col_values(col)
-    return await run_io(_do)
+    sheet_id, title = await _gs_resolve(tab_name)
+    letter = _col_to_letter(col)
+    cols = await SHEETS_API.values_get(sheet_id, f"{_gs_a1_tab(title)}!{letter}:{letter}", major_dimension="COLUMNS")
+    return list(cols[0]) if cols else []
 
 
 
 async def gs_append_row(tab_name: str, values: List[str]) -> None:
     """Append a single row to a worksheet. Creates the worksheet if missing (best-effort)."""
-    def _do():
-        sid, tab = _split_sheet_ref(tab_name)
-        sheet_id = sid or _resolve_sheet_id_for_tab(tab)
-        if not sheet_id:
-            raise RuntimeError("Sheet ID bulunamadı.")
-        sh = _gs_open_sheet_sync(sheet_id)
+    sid, tab = _split_sheet_ref(tab_name)
+    sheet_id = (sid or _resolve_sheet_id_for_tab(tab) or "").strip()
+    if not sheet_id:
+        raise RuntimeError("Sheet ID bulunamadı.")
+    title = await SHEETS_API.tab_title(sheet_id, tab, fallback_first=False)
+    if title is None:
+        # Create tab if it doesn't exist
         try:
-            ws = sh.worksheet(tab)
+            await SHEETS_API.batch_update(sheet_id, [{"addSheet": {"properties": {"title": tab, "gridProperties": {"rowCount": 2000, "columnCount": 20}}}}])
+            title = tab
         except Exception:
-            # Create tab if it doesn't exist
-            try:
-                ws = sh.add_worksheet(title=tab, rows=2000, cols=20)
-            except Exception:
-                # fallback: first worksheet
-                ws = sh.get_worksheet(0)
+            # fallback: first worksheet
+            title = await SHEETS_API.tab_title(sheet_id, tab)
+    await SHEETS_API.values_append(sheet_id, _gs_a1_tab(title or tab), [list(values)])
 
-        # Determine next row index (best-effort) BEFORE append
+# =========================================================
+#            GOOGLE SHEETS WRITE-BEHIND (batchUpdate)
+# =========================================================
+# gs_update_cell / gs_update_range yazıları spreadsheet başına kısa bir pencere
+# boyunca biriktirilir ve tek values.batchUpdate ile gider:
+#   - aynı hücreye/aralığa sonradan gelen yazı öncekini ezer (son yazı en sona taşınır,
+#     çakışan farklı aralıklarda da yazı sırası korunur)
+#   - submit() future döner; await eden çağıran yazı sheet'e gidince devam eder
+#   - kapanışta bekleyen yazılar flush edilir (CallidusBot.close)
+SHEETS_WRITE_WINDOW_MS = int(os.getenv("SHEETS_WRITE_WINDOW_MS", "400"))
+SHEETS_WRITE_MAX_BATCH = int(os.getenv("SHEETS_WRITE_MAX_BATCH", "500"))
+
+class SheetWriteBuffer:
+    """Per-spreadsheet write-behind buffer -> one values.batchUpdate per window."""
+
+    def __init__(self, window_ms: int = 400, max_batch: int = 500):
+        self.window = max(0, int(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        # sheet_id -> {(tab, range): (values, [futures])}; dict sırası = yazı sırası
+        self._pending: Dict[str, Dict[Tuple[str, str], Tuple[List[List[Any]], List["asyncio.Future"]]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # metrics
+        self.writes = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.failed = 0
+
+    def submit(self, tab_name: str, range_name: str, values: List[List[Any]]) -> "asyncio.Future":
+        """Queue a write; the returned future resolves once it is in the sheet."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        sid, tab = _split_sheet_ref(tab_name)
+        sheet_id = (sid or _resolve_sheet_id_for_tab(tab) or "").strip()
+        if not sheet_id:
+            fut.set_exception(RuntimeError("Sheet ID bulunamadı."))
+            return fut
+
+        pend = self._pending.setdefault(sheet_id, {})
+        key = (tab, (range_name or "").replace("$", "").strip().upper())
+        waiters: List["asyncio.Future"] = []
+        old = pend.pop(key, None)
+        if old is not None:
+            waiters = old[1]
+            self.coalesced += 1
+        waiters.append(fut)
+        pend[key] = (values, waiters)
+        self.writes += 1
+
+        if len(pend) >= self.max_batch:
+            asyncio.create_task(self.flush(sheet_id))
+        elif sheet_id not in self._timers:
+            self._timers[sheet_id] = asyncio.create_task(self._flush_later(sheet_id))
+        return fut
+
+    async def _flush_later(self, sheet_id: str) -> None:
         try:
-            next_row = len(ws.get_all_values()) + 1
-        except Exception:
-            next_row = None
-
-        ws.append_row(values, value_input_option="USER_ENTERED")
-
-        # Optional: grey background for Content Log rows (artık kullanılmıyor)
-        # Eski tek satırlık log sistemi kaldırıldı
+            await asyncio.sleep(self.window)
+        finally:
+            self._timers.pop(sheet_id, None)
+        await self.flush(sheet_id)
+
+    @staticmethod
+    async def _write(sheet_id: str, writes: List[Tuple[str, str, List[List[Any]]]]) -> None:
+        titles: Dict[str, str] = {}
+        data = []
+        for tab, rng, values in writes:
+            if tab not in titles:
+                # gs_get_all_values ile aynı çözümleme (tab yoksa ilk worksheet)
+                titles[tab] = await SHEETS_API.tab_title(sheet_id, tab) or tab
+            data.append({"range": f"{_gs_a1_tab(titles[tab])}!{rng}", "values": values})
+        await SHEETS_API.values_batch_update(sheet_id, data)
+
+    async def flush(self, sheet_id: str) -> None:
+        lock = self._locks.setdefault(sheet_id, asyncio.Lock())
+        async with lock:
+            pend = self._pending.pop(sheet_id, None)
+            if not pend:
+                return
+            items = list(pend.items())
+            writes = [(tab, rng, vals) for (tab, rng), (vals, _w) in items]
+            try:
+                # kendi yazımız cache'teki modifiedTime'ı eskitmesin (tab'lara local uygulanmıştı)
+                async with _SheetOwnWrite(sheet_id, {tab for tab, _rng, _v in writes}):
+                    await self._write(sheet_id, writes)
+            except Exception as e:
+                self.failed += 1
+                log(f"[SHEETS] batchUpdate hatası ({len(items)} yazı): {e!r}")
+                # cache'e uygulanmış local mutation'lar ve tab metadata'sı artık geçersiz
+                _sheet_cache_invalidate_sheet(sheet_id)
+                SHEETS_API.invalidate(sheet_id)
+                for _k, (_v, waiters) in items:
+                    for f in waiters:
+                        if not f.done():
+                            f.set_exception(e)
+                return
+            self.batches += 1
+            for _k, (_v, waiters) in items:
+                for f in waiters:
+                    if not f.done():
+                        f.set_result(None)
+
+    async def flush_all(self) -> None:
+        for t in list(self._timers.values()):
+            t.cancel()
+        self._timers.clear()
+        for sheet_id in list(self._pending.keys()):
+            await self.flush(sheet_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": sum(len(p) for p in self._pending.values()),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
 
-    await run_io(_do)
+SHEET_WRITES = SheetWriteBuffer(SHEETS_WRITE_WINDOW_MS, SHEETS_WRITE_MAX_BATCH)
 
 # =========================================================
 #                    SHEET HELPERS (GENERIC)
@@ -2712,8 +4343,15 @@ class SheetRoleRow:
     row_idx: int
     values: Dict[str, str]
 
+# Sheet tab cache (read-through, versioned):
+#   - grid (get_all_values) bellekte tutulur; botun kendi yazıları (gs_update_cell /
+#     gs_update_range) cache'e local mutation olarak uygulanır -> cache yazılardan sonra da doğru
+#   - SHEET_TTL sn'den eski cache'te önce spreadsheet modifiedTime kontrol edilir (Drive
+#     metadata, ucuz); değişmemişse tam okuma yapılmaz
+#   - modifiedTime alınamazsa (scope vb.) TTL dolunca tam okuma (eski davranış)
 SHEET_CACHE: Dict[str, Dict[str, Any]] = {}
-SHEET_TTL = 10.0
+SHEET_TTL = float(os.getenv("SHEET_TTL", "30"))
+_SHEET_CACHE_LOCKS: Dict[str, asyncio.Lock] = {}
 
 def _loop_time() -> float:
     try:
@@ -2721,20 +4359,139 @@ def _loop_time() -> float:
     except Exception:
         return 0.0
 
-async def load_sheet_rows(tab_name: str, force: bool = False) -> Tuple[List[str], List[SheetRoleRow]]:
-    tab_key = f"{_resolve_sheet_id_for_tab(tab_name)}::{tab_name or ''}"
-    if tab_key not in SHEET_CACHE:
-        SHEET_CACHE[tab_key] = {"ts": 0.0, "headers": [], "rows": []}
+def _sheet_cache_key(tab_name: str) -> str:
+    sid, tab = _split_sheet_ref(tab_name)
+    return f"{(sid or _resolve_sheet_id_for_tab(tab) or '').strip()}::{tab or ''}"
+
+def _sheet_cache_lock(tab_name: str) -> asyncio.Lock:
+    return _SHEET_CACHE_LOCKS.setdefault(_sheet_cache_key(tab_name), asyncio.Lock())
+
+def _a1_to_rc(cell: str) -> Tuple[int, int]:
+    m = re.fullmatch(r"([A-Za-z]+)(\d+)", (cell or "").replace("$", "").strip())
+    if not m:
+        raise ValueError(f"A1 hücre değil: {cell!r}")
+    col = 0
+    for ch in m.group(1).upper():
+        col = col * 26 + (ord(ch) - 64)
+    return int(m.group(2)), col
+
+def _sheet_cache_apply(tab_name: str, row: int, col: int, values: List[List[Any]]) -> None:
+    """Apply a local write (top-left row/col, 1-based) to the cached grid."""
+    cache = SHEET_CACHE.get(_sheet_cache_key(tab_name))
+    if not cache or cache.get("values") is None:
+        return
+    grid: List[List[str]] = cache["values"]
+    for ri, vals in enumerate(values or []):
+        r = row - 1 + ri
+        while len(grid) <= r:
+            grid.append([])
+        line = grid[r]
+        for ci, v in enumerate(vals or []):
+            c = col - 1 + ci
+            while len(line) <= c:
+                line.append("")
+            line[c] = "" if v is None else str(v)
+    cache["rows"] = None  # satırlar grid'den yeniden türetilir
+    cache["version"] = int(cache.get("version") or 0) + 1
+
+def _sheet_cache_apply_range(tab_name: str, range_name: str, values: List[List[Any]]) -> None:
+    try:
+        row, col = _a1_to_rc((range_name or "").split("!")[-1].split(":")[0])
+    except ValueError:
+        _sheet_cache_invalidate(tab_name)
+        return
+    _sheet_cache_apply(tab_name, row, col, values)
+
+def _sheet_cache_invalidate(tab_name: str) -> None:
+    SHEET_CACHE.pop(_sheet_cache_key(tab_name), None)
+
+def _sheet_cache_invalidate_sheet(sheet_id: str) -> None:
+    prefix = f"{(sheet_id or '').strip()}::"
+    for k in [k for k in SHEET_CACHE if k.startswith(prefix)]:
+        SHEET_CACHE.pop(k, None)
+
+class _SheetOwnWrite:
+    """SheetWriteBuffer flush'ı etrafında modifiedTime takibi (async context manager).
+    Yazıları cache'e local olarak uygulanmış `tabs` için: yazıdan önce cache güncelse
+    (modified == önceki modifiedTime) ve girdi bu sürede değişmediyse (aynı nesne, aynı
+    version; araya tam okuma/yeni local yazı girmedi) yazı sonrası modifiedTime benimsenir.
+    Böylece kendi yazılarımız bir sonraki revalidation'da tam okumaya yol açmaz.
+    Diğer tab'lar ve başka yazma yolları (Content/Puan Log, Activity Balance) dokunulmaz -> normal revalidation."""
+
+    def __init__(self, sheet_id: str, tabs: set):
+        self.sheet_id = (sheet_id or "").strip()
+        self.tabs = set(tabs or ())
+        self.before: Optional[str] = None
+        self._snap: Dict[str, Tuple[Dict[str, Any], int]] = {}
+
+    async def __aenter__(self) -> "_SheetOwnWrite":
+        for tab in self.tabs:
+            key = f"{self.sheet_id}::{tab}"
+            entry = SHEET_CACHE.get(key)
+            if entry and entry.get("values") is not None and entry.get("modified"):
+                self._snap[key] = (entry, int(entry.get("version") or 0))
+        if self.sheet_id and self._snap:
+            try:
+                self.before = await SHEETS_API.modified_time(self.sheet_id)
+            except Exception:
+                self.before = None
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None or not self.before:
+            return False
+        try:
+            after = await SHEETS_API.modified_time(self.sheet_id)
+        except Exception:
+            after = None
+        if after:
+            for key, (entry, version) in self._snap.items():
+                if (SHEET_CACHE.get(key) is entry and int(entry.get("version") or 0) == version
+                        and entry.get("modified") == self.before):
+                    entry["modified"] = after
+        return False
 
-    ts = _loop_time()
-    cache = SHEET_CACHE[tab_key]
-    if (not force) and cache["rows"] and (ts - float(cache["ts"]) < SHEET_TTL):
-        return cache["headers"], cache["rows"]
+async def _sheet_modified_time(tab_name: str) -> Optional[str]:
+    sid, tab = _split_sheet_ref(tab_name)
+    try:
+        return await SHEETS_API.modified_time(sid or _resolve_sheet_id_for_tab(tab))
+    except Exception:
+        return None
 
-    values = await gs_get_all_values(tab_name)
-    if not values or len(values) < 2:
-        raise RuntimeError(f"Sheet ({tab_name}) boş (başlık + en az 1 satır olmalı).")
+async def sheet_values(tab_name: str, force: bool = False, revalidate: bool = False) -> List[List[str]]:
+    """Cached get_all_values for a tab (see SHEET_CACHE notes).
 
+    force: always full read. revalidate: check modifiedTime now even if the cache is young.
+    """
+    key = _sheet_cache_key(tab_name)
+    async with _sheet_cache_lock(tab_name):
+        cache = SHEET_CACHE.get(key)
+        ts = _loop_time()
+        if (not force) and cache and cache.get("values") is not None:
+            if (not revalidate) and (ts - float(cache["ts"]) < SHEET_TTL):
+                return cache["values"]
+            if cache.get("modified"):
+                mod = await _sheet_modified_time(tab_name)
+                if mod and mod == cache["modified"]:
+                    cache["ts"] = ts
+                    return cache["values"]
+
+        # bekleyen kendi yazılarımız önce sheet'e gitsin, yoksa okuma onları ezer
+        # (gs_update_* aynı kilidi tuttuğu için okuma sürerken bu tab'a yeni yazı girmez)
+        await SHEET_WRITES.flush(key.split("::", 1)[0])
+        mod = await _sheet_modified_time(tab_name)
+        values = await gs_get_all_values(tab_name)
+        SHEET_CACHE[key] = {
+            "ts": ts,
+            "values": values,
+            "modified": mod,
+            "version": int((cache or {}).get("version") or 0) + 1,
+            "headers": [],
+            "rows": None,
+        }
+        return values
+
+def _sheet_rows_from_values(values: List[List[str]]) -> Tuple[List[str], List[SheetRoleRow]]:
     headers = values[0]
     role_col = _resolve_col(headers, "role")
 
@@ -2755,10 +4512,21 @@ async def load_sheet_rows(tab_name: str, force: bool = False) -> Tuple[List[str]
             continue
 
         rows.append(SheetRoleRow(role=role_name, row_idx=i + 1, values=d))
+    return headers, rows
+
+async def load_sheet_rows(tab_name: str, force: bool = False, revalidate: bool = False) -> Tuple[List[str], List[SheetRoleRow]]:
+    values = await sheet_values(tab_name, force=force, revalidate=revalidate)
+    if not values or len(values) < 2:
+        raise RuntimeError(f"Sheet ({tab_name}) boş (başlık + en az 1 satır olmalı).")
+
+    cache = SHEET_CACHE.get(_sheet_cache_key(tab_name))
+    if cache is not None and cache.get("values") is values and cache.get("rows") is not None:
+        return cache["headers"], cache["rows"]
 
-    cache["ts"] = ts
-    cache["headers"] = headers
-    cache["rows"] = rows
+    headers, rows = _sheet_rows_from_values(values)
+    if cache is not None and cache.get("values") is values:
+        cache["headers"] = headers
+        cache["rows"] = rows
     return headers, rows
 
 def sheet_user_string(user: discord.abc.User) -> str:
@@ -2770,12 +4538,16 @@ async def clear_user_from_sheet(tab: str, headers: List[str], user_id: int) -> N
         raise RuntimeError("Sheet'te Nick sütunu yok.")
     nick_idx = headers.index(nick_col) + 1
 
-    col_values = await gs_col_values(tab, nick_idx)
+    # nick kolonu cache'teki grid'den (ayrı col_values okuması yok)
+    col_values = [(r[nick_idx - 1] if len(r) >= nick_idx else "") for r in await sheet_values(tab)]
     needle = str(user_id)
+    writes = []
     for r in range(2, len(col_values) + 1):
         v = (col_values[r - 1] or "").strip()
         if v and needle in v:
-            await gs_update_cell(tab, r, nick_idx, "")
+            writes.append(gs_update_cell(tab, r, nick_idx, ""))
+    if writes:
+        await asyncio.gather(*writes)
 
 async def clear_all_nicks_from_sheet(tab: str, headers: List[str], last_row: int) -> None:
     nick_col = _resolve_col(headers, "Nick")
@@ -3079,8 +4851,12 @@ def _save_sheet_events():
     """Content event'lerini dosyaya kaydeder."""
     try:
         data = {str(k): v.to_dict() for k, v in SHEET_EVENTS.items()}
-        with open(SHEET_EVENTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        db = _state_db_for("sheet_events")
+        if db is not None:
+            db.save("sheet_events", data)
+        else:
+            with open(SHEET_EVENTS_FILE, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
         log(f"[CONTENT] {len(SHEET_EVENTS)} event kaydedildi")
     except Exception as e:
         log(f"[CONTENT] Event kaydetme hatası: {e}")
@@ -3089,9 +4865,13 @@ def _load_sheet_events():
     """Content event'lerini dosyadan yükler."""
     global SHEET_EVENTS, SHEET_THREAD_TO_MAIN
     try:
-        if os.path.exists(SHEET_EVENTS_FILE):
-            with open(SHEET_EVENTS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
+        db = _state_db_for("sheet_events")
+        if db is not None or os.path.exists(SHEET_EVENTS_FILE):
+            if db is not None:
+                data = db.load("sheet_events", SHEET_EVENTS_FILE) or {}
+            else:
+                with open(SHEET_EVENTS_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
             SHEET_EVENTS = {int(k): SheetEventState.from_dict(v) for k, v in data.items()}
             # Thread mapping'i de kur
             for msg_id, st in SHEET_EVENTS.items():
@@ -3289,7 +5069,7 @@ async def _rebuild_sheet_state_from_discord(
     if not sheet_tab:
         raise RuntimeError("Ana mesajdan sheet tab bulunamadı. (Tab: **...** yok)")
 
-    headers, rows = await load_sheet_rows(sheet_tab, force=True)
+    headers, rows = await load_sheet_rows(sheet_tab, revalidate=True)
     if not rows:
         raise RuntimeError(f"Sheet ({sheet_tab})'te rol bulunamadı.")
 
@@ -3345,7 +5125,7 @@ async def build_sheet_main_embed_async(st: SheetEventState, guild: discord.Guild
     )
 
     try:
-        headers, rows = await load_sheet_rows(st.sheet_tab, force=True)
+        headers, rows = await load_sheet_rows(st.sheet_tab)
         entries = build_role_entries(st.sheet_tab, st.slots, headers, rows)
         
         # Tüm rolleri göster, 1024 karakteri geçince yeni field aç
@@ -3386,7 +5166,7 @@ async def build_sheet_main_embed_async(st: SheetEventState, guild: discord.Guild
     return e
 
 async def build_sheet_thread_embed(st: SheetEventState) -> Tuple[discord.Embed, List[SheetRoleEntry], int]:
-    headers, rows = await load_sheet_rows(st.sheet_tab, force=True)
+    headers, rows = await load_sheet_rows(st.sheet_tab)
     entries = build_role_entries(st.sheet_tab, st.slots, headers, rows)
 
     total_pages = max(1, (len(entries) + SHEET_PAGE_SIZE - 1) // SHEET_PAGE_SIZE)
@@ -3556,7 +5336,7 @@ async def _edit_sheet_messages(bot_client: discord.Client, st: SheetEventState):
             msg = await ch.fetch_message(st.message_id)
             guild = msg.guild
             emb = await build_sheet_main_embed_async(st, guild)
-            await msg.edit(embed=emb, view=SheetMainView(st))
+            await out_edit(msg, prio=OUT_PRIO_INTERACTION, embed=emb, view=SheetMainView(st))
     except Exception as e:
         log("edit main sheet error:", repr(e))
 
@@ -3570,13 +5350,13 @@ async def _edit_sheet_messages(bot_client: discord.Client, st: SheetEventState):
         if isinstance(th, discord.Thread):
             tmsg = await th.fetch_message(st.thread_msg_id)
             emb, page_entries, total_pages = await build_sheet_thread_embed(st)
-            await tmsg.edit(embed=emb, view=SheetThreadView(st, page_entries, total_pages))
+            await out_edit(tmsg, prio=OUT_PRIO_INTERACTION, embed=emb, view=SheetThreadView(st, page_entries, total_pages))
     except Exception as e:
         log("edit thread sheet error:", repr(e))
 
 async def sheet_leave_user(bot_client: discord.Client, st: SheetEventState, user_id: int) -> Tuple[bool, str]:
     try:
-        headers, _rows = await load_sheet_rows(st.sheet_tab, force=True)
+        headers, _rows = await load_sheet_rows(st.sheet_tab)
         await clear_user_from_sheet(st.sheet_tab, headers, user_id)
     except Exception as e:
         return (False, f"Sheet hatası: {e}")
@@ -3690,7 +5470,7 @@ async def sheet_assign_role(interaction: discord.Interaction, st: SheetEventStat
     chosen_sig8 = chosen_sig8.strip()
 
     try:
-        headers, rows = await load_sheet_rows(st.sheet_tab, force=True)
+        headers, rows = await load_sheet_rows(st.sheet_tab)
         role_rows = _find_rows_for_variant(headers, rows, chosen_role_key, chosen_sig8)
         if not role_rows:
             return await safe_send(interaction, "❌ Bu rol/varyant sheet'te bulunamadı.", ephemeral=True)
@@ -3719,7 +5499,7 @@ async def sheet_assign_role(interaction: discord.Interaction, st: SheetEventStat
         return await safe_send(interaction, f"❌ Slot dolu. ({filled}/{total})", ephemeral=True)
 
     try:
-        headers2, _rows2 = await load_sheet_rows(st.sheet_tab, force=True)
+        headers2, _rows2 = await load_sheet_rows(st.sheet_tab)
         await clear_user_from_sheet(st.sheet_tab, headers2, interaction.user.id)
         await set_role_nick(st.sheet_tab, headers2, chosen_row, sheet_user_string(interaction.user))
     except Exception as e:
@@ -4412,6 +6192,18 @@ def _kb_load_state() -> Dict[str, Any]:
             "last_saved_at": j.get("last_saved_at", ""),
         }
     
+    # SQLite backend
+    db = _state_db_for("killbot")
+    if db is not None:
+        try:
+            j = db.load("killbot", KILLBOT_STATE_FILE)
+            if isinstance(j, dict):
+                result = _parse_state(j)
+                log(f"[KB] State yüklendi (sqlite): guild_eid={result['guild_last_event_id']}, kills={len(result['member_seen_kill_ids'])}, deaths={len(result['member_seen_death_ids'])}")
+                return result
+        except Exception as e:
+            log(f"[KB] SQLite state okunamadı: {e}")
+    
     # Ana dosyayı dene
     try:
         with open(KILLBOT_STATE_FILE, "r", encoding="utf-8") as f:
@@ -4447,6 +6239,11 @@ def _kb_save_state(state: Dict[str, Any]) -> None:
     try:
         state["last_saved_at"] = datetime.now(UTC_TZ).isoformat()
         
+        db = _state_db_for("killbot")
+        if db is not None:
+            db.save("killbot", state)
+            return
+        
         # Önce backup al (eski ana dosyayı)
         try:
             if os.path.exists(KILLBOT_STATE_FILE):
@@ -4883,40 +6680,46 @@ def _kb_save_icon_to_disk(url: str, data: bytes) -> None:
         pass
 
 async def _kb_prefetch_icons(bot: "CallidusBot", icon_urls) -> Dict[str, bytes]:
-    """Prefetch icons with memory + optional disk cache and concurrency."""
+    """Prefetch icons with memory + optional disk cache and concurrency.
+
+    Each entry is a URL or a tuple of candidate URLs in preference order; for a
+    tuple the next candidate is only fetched if the previous one failed.
+    """
     blobs: Dict[str, bytes] = {}
     if not icon_urls:
         return blobs
     if not getattr(bot, '_kb_http', None):
         return blobs
 
-    urls = list(icon_urls)
-    to_fetch: List[str] = []
-
-    # warm from memory/disk
-    for u in urls:
-        if not u:
-            continue
+    def cached(u: str) -> Optional[bytes]:
+        # warm from memory/disk
+        if u in blobs:
+            return blobs[u]
         b = bot._kb_icon_cache.get(u) if isinstance(getattr(bot, '_kb_icon_cache', None), dict) else None
+        if not b:
+            b = _kb_try_load_icon_from_disk(u)
+            if b:
+                try:
+                    bot._kb_icon_cache[u] = b
+                except Exception:
+                    pass
         if b:
             blobs[u] = b
-            continue
-        b2 = _kb_try_load_icon_from_disk(u)
-        if b2:
-            blobs[u] = b2
-            try:
-                bot._kb_icon_cache[u] = b2
-            except Exception:
-                pass
-            continue
-        to_fetch.append(u)
+        return b
+
+    groups: List[Tuple[str, ...]] = []
+    for entry in icon_urls:
+        cand = tuple(c for c in ((entry,) if isinstance(entry, str) else entry) if c)
+        if cand and not cached(cand[0]):
+            groups.append(cand)
 
-    if not to_fetch:
+    if not groups:
         return blobs
 
     sem = asyncio.Semaphore(max(1, int(KILLBOT_ICON_CONCURRENCY)))
+    inflight: Dict[str, "asyncio.Future"] = {}
 
-    async def fetch_one(u: str):
+    async def fetch_one(u: str) -> Optional[bytes]:
         async with sem:
             b3 = await _kb_fetch_icon(bot._kb_http, u)
         if b3:
@@ -4926,8 +6729,22 @@ async def _kb_prefetch_icons(bot: "CallidusBot", icon_urls) -> Dict[str, bytes]:
             except Exception:
                 pass
             _kb_save_icon_to_disk(u, b3)
+        return b3
 
-    await asyncio.gather(*[fetch_one(u) for u in to_fetch], return_exceptions=True)
+    async def fetch_group(cand: Tuple[str, ...]) -> None:
+        for u in cand:
+            if cached(u):
+                return
+            fut = inflight.get(u)
+            if fut is None:
+                fut = inflight[u] = asyncio.ensure_future(fetch_one(u))
+            try:
+                if await asyncio.shield(fut):
+                    return
+            except Exception:
+                continue
+
+    await asyncio.gather(*[fetch_group(g) for g in groups], return_exceptions=True)
 
     # trim memory cache (simple FIFO)
     try:
@@ -5174,11 +6991,156 @@ def _kb_draw_stat_item(base: "Image.Image", draw: "ImageDraw.ImageDraw", x: int,
     _kb_draw_text(draw, (tx, y), txt, font=font)
     return tx + _kb_text_width(draw, txt, font=font) + gap
 
-def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional[bytes]:
+
+# ===== Killbot image: template layer cache =====
+# Her render'da font yükleme + statik kart/slot çizimi tekrar yapılmasın diye
+# sabit katmanlar bir kez hazırlanıp kopyalanıyor. Sadece dinamik kısımlar
+# (yazılar, ikonlar, bar) render sırasında çiziliyor.
+_KB_W = 900
+_KB_BG = (35, 37, 41, 255)  # discord dark
+_KB_CARD = (44, 47, 51, 255)
+_KB_SLOT_OUTLINE = (90, 90, 90, 255)
+
+# main card layout
+_KB_TOP_Y = 110
+_KB_BOX_H = 290
+_KB_LEFT_X = 20
+_KB_RIGHT_X = _KB_W // 2 + 10
+_KB_BOX_W = _KB_W // 2 - 30
+_KB_GRID_TOP = _KB_TOP_Y + 70
+_KB_GRID_COLS = 4
+_KB_GRID_PAD = 10
+_KB_STATS_TOP = _KB_TOP_Y + _KB_BOX_H + 20
+_KB_STATS_H = 260
+
+_KB_FONT_CACHE: Dict[Tuple[str, int], Any] = {}
+_KB_LAYER_CACHE: Dict[Tuple[bool, int], "Image.Image"] = {}
+_KB_SLOT_SPRITE_CACHE: Dict[int, "Image.Image"] = {}
+
+def _kb_font(size: int, path: str = "DejaVuSans.ttf"):
+    """Cached truetype font. None döner (ve cache'ler) font bulunamazsa."""
+    key = (path, int(size))
+    if key in _KB_FONT_CACHE:
+        return _KB_FONT_CACHE[key]
+    try:
+        f = ImageFont.truetype(path, int(size))
+    except Exception:
+        f = None
+    _KB_FONT_CACHE[key] = f
+    return f
+
+def _kb_fonts() -> Tuple[Any, Any, Any]:
+    """(big, med, small) - kill kartlarında kullanılan üç boyut."""
+    return _kb_font(22), _kb_font(16), _kb_font(13)
+
+def _kb_slot_sprite(size: int) -> "Image.Image":
+    """Pre-rendered boş slot çerçevesi (rounded outline, şeffaf içi)."""
+    size = int(size)
+    sp = _KB_SLOT_SPRITE_CACHE.get(size)
+    if sp is not None:
+        return sp
+    sp = Image.new("RGBA", (size + 1, size + 1), (0, 0, 0, 0))
+    ImageDraw.Draw(sp).rounded_rectangle([0, 0, size, size], radius=10, outline=_KB_SLOT_OUTLINE, width=2)
+    _KB_SLOT_SPRITE_CACHE[size] = sp
+    return sp
+
+def _kb_slot_grid_origin(idx: int, base_x: int, base_y: int, size: int) -> Tuple[int, int]:
+    r = idx // _KB_GRID_COLS
+    c = idx % _KB_GRID_COLS
+    return base_x + c * (size + _KB_GRID_PAD), base_y + r * (size + _KB_GRID_PAD)
+
+def _kb_main_base_layer(has_inventory: bool) -> "Image.Image":
+    """Statik ana kart katmanı: arka plan, header, iki oyuncu kartı, boş slot grid'i
+    ve istatistik paneli. (has_inventory, render size) başına bir kez çizilir.
+
+    Dönen görsel paylaşılıyor; çağıran taraf mutlaka .copy() almalı.
+    """
+    size = int(KILLBOT_RENDER_SIZE)
+    key = (bool(has_inventory), size)
+    base = _KB_LAYER_CACHE.get(key)
+    if base is not None:
+        return base
+
+    W = _KB_W
+    H = 1020 if has_inventory else 720
+    base = Image.new("RGBA", (W, H), _KB_BG)
+    draw = ImageDraw.Draw(base)
+    _font_big, font_med, _font_small = _kb_fonts()
+
+    # Header card
+    draw.rounded_rectangle([20, 20, W-20, 90], radius=14, fill=_KB_CARD)
+
+    # Two player cards
+    draw.rounded_rectangle([_KB_LEFT_X, _KB_TOP_Y, _KB_LEFT_X + _KB_BOX_W, _KB_TOP_Y + _KB_BOX_H], radius=14, fill=_KB_CARD)
+    draw.rounded_rectangle([_KB_RIGHT_X, _KB_TOP_Y, _KB_RIGHT_X + _KB_BOX_W, _KB_TOP_Y + _KB_BOX_H], radius=14, fill=_KB_CARD)
+
+    # Empty slot placeholders (both grids)
+    sprite = _kb_slot_sprite(size)
+    for base_x in (_KB_LEFT_X + 18, _KB_RIGHT_X + 18):
+        for idx in range(len(_SLOT_ORDER)):
+            base.alpha_composite(sprite, _kb_slot_grid_origin(idx, base_x, _KB_GRID_TOP, size))
+
+    # Combat stats panel
+    draw.rounded_rectangle([20, _KB_STATS_TOP, W-20, _KB_STATS_TOP + _KB_STATS_H], radius=14, fill=_KB_CARD)
+    _kb_draw_text(draw, (34, _KB_STATS_TOP + 14), "Savaş İstatistikleri", font=font_med)
+
+    _KB_LAYER_CACHE[key] = base
+    return base
+
+def _kb_render_cache_clear() -> None:
+    """Font/katman/sprite cache'lerini boşaltır (benchmark ve font değişimi için)."""
+    _KB_FONT_CACHE.clear()
+    _KB_LAYER_CACHE.clear()
+    _KB_SLOT_SPRITE_CACHE.clear()
+
+def _kb_icon_candidates(it: Optional[dict], size: int, *, size64_fallback: bool = False) -> List[str]:
+    """Render URL of one item + fallbacks, in preference order (prefetch and render use the same list)."""
+    if not it or not isinstance(it, dict):
+        return []
+    t = (it.get("Type") or "").strip()
+    if not t:
+        return []
+    ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
+    qual = _kb_safe_int(it.get("Quality"), 0)
+    cand = [_kb_render_url(t, enchant=ench, quality=qual, size=size)]
+    # Fallbacks (render service can be picky about quality/size for some items)
+    if qual:
+        cand.append(_kb_render_url(t, enchant=ench, quality=0, size=size))
+    if size64_fallback and int(size) != 64:
+        cand.append(_kb_render_url(t, enchant=ench, quality=qual, size=64))
+        if qual:
+            cand.append(_kb_render_url(t, enchant=ench, quality=0, size=64))
+    return cand
+
+def _kb_icon_image(icon_blobs: Dict[str, bytes], decoded: Dict[Any, Any], url: str, size: int) -> Optional["Image.Image"]:
+    """Decode a render blob once per job and reuse it (per url + target size).
+
+    `decoded` is owned by a single render job, so the main card and the
+    lost-items image share the same decoded RGBA icons.
+    """
+    key = (url, int(size))
+    if key in decoded:
+        return decoded[key]
+    icon = decoded.get(url)
+    if icon is None and url not in decoded:
+        blob = icon_blobs.get(url)
+        if blob:
+            try:
+                icon = Image.open(io.BytesIO(blob)).convert("RGBA")
+            except Exception:
+                icon = None
+        decoded[url] = icon
+    if icon is not None and icon.size != (size, size):
+        icon = icon.resize((size, size))
+    decoded[key] = icon
+    return icon
+
+def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes], decoded: Optional[Dict[Any, Any]] = None) -> Optional[bytes]:
     if not PIL_OK or not KILLBOT_IMAGE_ENABLED:
         return None
+    if decoded is None:
+        decoded = {}
 
-    kind = payload["kind"]
     ev = payload["event"]
     killer = payload["killer"]
     victim = payload["victim"]
@@ -5187,26 +7149,14 @@ def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional
     inv_items = payload["inv_items"]
     stats = payload["stats"]
 
-    W = 900
-    H = 1020 if inv_items else 720
-    bg = (35, 37, 41, 255)  # discord dark
-    card = (44, 47, 51, 255)
+    W = _KB_W
 
-    im = Image.new("RGBA", (W, H), bg)
+    # static layers are cached; only the dynamic parts are drawn below
+    im = _kb_main_base_layer(bool(inv_items)).copy()
     draw = ImageDraw.Draw(im)
-
-    # simple fonts
-    try:
-        font_big = ImageFont.truetype("DejaVuSans.ttf", 22)
-        font_med = ImageFont.truetype("DejaVuSans.ttf", 16)
-        font_small = ImageFont.truetype("DejaVuSans.ttf", 13)
-    except Exception:
-        font_big = None
-        font_med = None
-        font_small = None
+    font_big, font_med, font_small = _kb_fonts()
 
     # Header card
-    draw.rounded_rectangle([20, 20, W-20, 90], radius=14, fill=card)
     title = payload["title"]
     _kb_draw_text(draw, (34, 34), title, font=font_big)
     fame_str = f"{int(payload.get('fame') or 0):,}".replace(',', '.')
@@ -5220,14 +7170,10 @@ def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional
         fight_val = f"{p_total}" + (f" (Party {party})" if party else "")
         _kb_draw_stat_item(im, draw, x0, y0, icon="people", label="Fight", value=fight_val, font=font_med)
 
-    # Two player cards
-    left_x = 20
-    right_x = W//2 + 10
-    top_y = 110
-    box_w = W//2 - 30
-    box_h = 290
-    draw.rounded_rectangle([left_x, top_y, left_x + box_w, top_y + box_h], radius=14, fill=card)
-    draw.rounded_rectangle([right_x, top_y, right_x + box_w, top_y + box_h], radius=14, fill=card)
+    # Two player cards (card backgrounds come from the base layer)
+    left_x = _KB_LEFT_X
+    right_x = _KB_RIGHT_X
+    top_y = _KB_TOP_Y
 
     # Names
     _kb_draw_text(draw, (left_x+18, top_y+14), f"Öldüren: {killer.get('Name','?')}", font=font_med)
@@ -5243,20 +7189,14 @@ def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional
 
     # icon grid settings
     size = int(KILLBOT_RENDER_SIZE)
-    pad = 10
-    grid_top = top_y + 70
+    grid_top = _KB_GRID_TOP
     grid_left_l = left_x + 18
     grid_left_r = right_x + 18
 
     def paste_slot(eq: dict, base_x: int, base_y: int):
-        cols = 4
         for idx, (slot, _label) in enumerate(_SLOT_ORDER):
-            r = idx // cols
-            c = idx % cols
-            x = base_x + c * (size + pad)
-            y = base_y + r * (size + pad)
-            # placeholder
-            draw.rounded_rectangle([x, y, x+size, y+size], radius=10, outline=(90, 90, 90, 255), width=2)
+            # placeholder frame is already in the base layer
+            x, y = _kb_slot_grid_origin(idx, base_x, base_y, size)
             it = _kb_slot_item(eq, slot)
             if not it or not isinstance(it, dict):
                 continue
@@ -5264,25 +7204,13 @@ def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional
             if not t:
                 continue
             ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
-            qual = _kb_safe_int(it.get("Quality"), 0)
-            url = _kb_render_url(t, enchant=ench, quality=qual, size=size)
-            blob = icon_blobs.get(url)
-            # Fallbacks: try without quality, and try a safe size (64) if needed.
-            if not blob and qual:
-                url2 = _kb_render_url(t, enchant=ench, quality=0, size=size)
-                blob = icon_blobs.get(url2)
-            if not blob and int(size) != 64:
-                url3 = _kb_render_url(t, enchant=ench, quality=qual, size=64)
-                blob = icon_blobs.get(url3)
-                if not blob and qual:
-                    url4 = _kb_render_url(t, enchant=ench, quality=0, size=64)
-                    blob = icon_blobs.get(url4)
-            if not blob:
+            u = next((c for c in _kb_icon_candidates(it, size, size64_fallback=True) if icon_blobs.get(c)), None)
+            if not u:
                 continue
             try:
-                icon = Image.open(io.BytesIO(blob)).convert("RGBA")
-                if icon.size != (size, size):
-                    icon = icon.resize((size, size))
+                icon = _kb_icon_image(icon_blobs, decoded, u, size)
+                if icon is None:
+                    continue
                 im.alpha_composite(icon, (x, y))
                 # small enchant overlay
                 try:
@@ -5296,11 +7224,8 @@ def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional
     paste_slot(k_eq, grid_left_l, grid_top)
     paste_slot(v_eq, grid_left_r, grid_top)
 
-    # Combat stats
-    stats_top = top_y + box_h + 20
-    panel_h = 260
-    draw.rounded_rectangle([20, stats_top, W-20, stats_top+panel_h], radius=14, fill=card)
-    _kb_draw_text(draw, (34, stats_top+14), "Savaş İstatistikleri", font=font_med)
+    # Combat stats (panel + title come from the base layer)
+    stats_top = _KB_STATS_TOP
 
     try:
         p_total2 = _kb_safe_int(stats.get("participants_total"), 0) if isinstance(stats, dict) else 0
@@ -5368,10 +7293,12 @@ def _kb_make_image_sync(payload: dict, icon_blobs: Dict[str, bytes]) -> Optional
     return out.getvalue()
 
 
-def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], icon_blobs: Dict[str, bytes], *, title: str) -> Optional[bytes]:
+def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], icon_blobs: Dict[str, bytes], *, title: str, decoded: Optional[Dict[Any, Any]] = None) -> Optional[bytes]:
     """Render lost items as a separate image: victim equipment (incl. weapon) + inventory."""
     if not PIL_OK or not KILLBOT_IMAGE_ENABLED:
         return None
+    if decoded is None:
+        decoded = {}
 
     if not isinstance(v_eq, dict):
         v_eq = {}
@@ -5387,9 +7314,9 @@ def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], i
     if eq_count == 0 and not inv_items:
         return None
 
-    W = 900
-    bg = (35, 37, 41, 255)
-    card = (44, 47, 51, 255)
+    W = _KB_W
+    bg = _KB_BG
+    card = _KB_CARD
 
     cols = 10
     size2 = 64
@@ -5416,40 +7343,23 @@ def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], i
 
     im = Image.new("RGBA", (W, H), bg)
     draw = ImageDraw.Draw(im)
+    font_big, font_med, font_small = _kb_fonts()
+    slot_frame = _kb_slot_sprite(size2)
 
-    try:
-        font_big = ImageFont.truetype("DejaVuSans.ttf", 22)
-        font_med = ImageFont.truetype("DejaVuSans.ttf", 16)
-        font_small = ImageFont.truetype("DejaVuSans.ttf", 13)
-    except Exception:
-        font_big = None
-        font_med = None
-        font_small = None
-
-    def paste_item_icon(it: dict, x: int, y: int, *, size_px: int = 64):
+    def paste_item_icon(it: dict, x: int, y: int, *, size_px: int = 64, fetch_size: int = 64):
         if not isinstance(it, dict):
             return
-        t = (it.get("Type") or "").strip()
-        if not t:
-            return
         ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
-        qual = _kb_safe_int(it.get("Quality"), 0)
 
-        # Primary URL
-        url = _kb_render_url(t, enchant=ench, quality=qual, size=size_px)
-        blob = icon_blobs.get(url)
-
-        # Fallbacks (some items come back without quality or render behaves differently)
-        if not blob and qual:
-            url2 = _kb_render_url(t, enchant=ench, quality=0, size=size_px)
-            blob = icon_blobs.get(url2)
-        if not blob:
+        # fetch_size != size_px: ana kartla aynı URL (aynı decode), burada küçültülür
+        url = next((c for c in _kb_icon_candidates(it, fetch_size, size64_fallback=True) if icon_blobs.get(c)), None)
+        if not url:
             return
 
         try:
-            icon = Image.open(io.BytesIO(blob)).convert("RGBA")
-            if icon.size != (size_px, size_px):
-                icon = icon.resize((size_px, size_px))
+            icon = _kb_icon_image(icon_blobs, decoded, url, size_px)
+            if icon is None:
+                return
             im.alpha_composite(icon, (x, y))
 
             # overlays: enchant + stack count
@@ -5497,10 +7407,10 @@ def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], i
         for i, (slot, _label) in enumerate(_SLOT_ORDER):
             x = x0 + i * (size2 + pad2)
             y2 = row_y
-            draw.rounded_rectangle([x, y2, x + size2, y2 + size2], radius=10, outline=(90, 90, 90, 255), width=2)
+            im.alpha_composite(slot_frame, (x, y2))
             it = _kb_slot_item(v_eq, slot)
             if isinstance(it, dict):
-                paste_item_icon(it, x, y2, size_px=size2)
+                paste_item_icon(it, x, y2, size_px=size2, fetch_size=int(KILLBOT_RENDER_SIZE))
         cur_y = row_y + size2 + 26
 
     # Inventory section
@@ -5513,7 +7423,7 @@ def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], i
             c = i % cols
             x = x0 + c * (size2 + pad2)
             y2 = start_y + r * (size2 + pad2)
-            draw.rounded_rectangle([x, y2, x + size2, y2 + size2], radius=10, outline=(90, 90, 90, 255), width=2)
+            im.alpha_composite(slot_frame, (x, y2))
             paste_item_icon(it, x, y2, size_px=size2)
     else:
         _kb_draw_text(draw, (34, cur_y + 6), "Envanter boş.", font=font_med)
@@ -5523,152 +7433,165 @@ def _kb_make_inventory_image_sync(v_eq: Dict[str, Any], inv_items: List[dict], i
     return out.getvalue()
 
 
-async def _kb_make_image(bot: "CallidusBot", ev: dict, kind: str, *, include_inventory: bool = False) -> Optional[bytes]:
-    if not (PIL_OK and KILLBOT_IMAGE_ENABLED):
-        return None
-    if not bot._kb_http:
-        return None
-
-    killer = ev.get("Killer") if isinstance(ev.get("Killer"), dict) else {}
-    victim = ev.get("Victim") if isinstance(ev.get("Victim"), dict) else {}
-    k_eq = _kb_get_equipment(killer)
-    v_eq = _kb_get_equipment(victim)
+def _kb_render_benchmark_sync(n: int = 20) -> Dict[str, float]:
+    """Micro-benchmark: render başına CPU süresi (ms), boş cache vs dolu cache.
 
-    # victim inventory (kill + death)
-    inv_items: List[dict] = []
-    if include_inventory:
-        inv = victim.get("Inventory")
-        inv_items = [it for it in inv if isinstance(it, dict)] if isinstance(inv, list) else []
+    "cold_cache" her render'dan önce font/katman/sprite cache'ini boşaltır (cache
+    dolana kadarki ilk render maliyeti); eski implementasyonun kendisini ölçmez.
+    Süre sadece bu thread'in CPU'su (thread_time): render/sheets havuzundaki diğer
+    işler sonucu etkilemez. Sentetik payload, ikon blob'u yok (sadece iskelet maliyeti).
+    """
+    import time
+    if not PIL_OK or not KILLBOT_IMAGE_ENABLED:
+        return {}
+    n = max(1, int(n))
+    eq = {slot: {"Type": "T8_2H_CLAYMORE", "EnchantmentLevel": 3, "Quality": 4} for slot, _ in _SLOT_ORDER}
+    killer = {"Name": "Killer", "AverageItemPower": 1450.5, "Equipment": eq}
+    victim = {"Name": "Victim", "AverageItemPower": 1380.2, "Equipment": eq}
+    stats = {
+        "participants_total": 12, "party_size": 8, "dmg_count": 9, "heal_count": 3,
+        "dmg_total": 123456, "heal_total": 45678,
+        "top_damage_name": "Killer", "top_damage_val": 54321, "top_damage_frac": 0.44,
+        "top_damage": [("P%d" % i, 10000 - i * 700) for i in range(8)],
+        "top_heal": [("H%d" % i, 9000 - i * 900) for i in range(5)],
+    }
+    payload = {
+        "kind": "kill", "event": {}, "killer": killer, "victim": victim,
+        "k_eq": eq, "v_eq": eq, "inv_items": [], "stats": stats,
+        "title": "Killer adlı oyuncu Victim adlı oyuncuyu öldürdü",
+        "location": "?", "fame": 123456, "when": "01.01.2026 12:00", "event_id": 1,
+    }
 
-    # stats
-    try:
-        stats = _kb_compute_stats(ev)
-    except Exception:
-        stats = {"top_damage_name": "?", "top_damage_val": 0, "top_damage_frac": 0.65}
+    def run(cold: bool) -> float:
+        t0 = time.thread_time()
+        for _ in range(n):
+            if cold:
+                _kb_render_cache_clear()
+            _kb_make_image_sync(payload, {})
+        return (time.thread_time() - t0) * 1000.0 / n
 
-    # prefetch icons (with cache)
-    icon_urls = set()
+    cold_ms = run(True)
+    _kb_render_cache_clear()
+    _kb_make_image_sync(payload, {})  # warm-up
+    warm_ms = run(False)
+    return {"n": float(n), "cold_cache_ms": cold_ms, "warm_ms": warm_ms}
 
-    def add_eq_icons(eq: dict, size: int):
-        for slot, _ in _SLOT_ORDER:
-            it = _kb_slot_item(eq, slot)
-            if not it or not isinstance(it, dict):
-                continue
-            t = (it.get("Type") or "").strip()
-            if not t:
-                continue
-            ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
-            qual = _kb_safe_int(it.get("Quality"), 0)
-            icon_urls.add(_kb_render_url(t, enchant=ench, quality=qual, size=size))
-            # Fallbacks (render service can be picky about quality/size for some items)
-            if qual:
-                icon_urls.add(_kb_render_url(t, enchant=ench, quality=0, size=size))
-            if int(size) != 64:
-                icon_urls.add(_kb_render_url(t, enchant=ench, quality=qual, size=64))
-                if qual:
-                    icon_urls.add(_kb_render_url(t, enchant=ench, quality=0, size=64))
-
-    add_eq_icons(k_eq, int(KILLBOT_RENDER_SIZE))
-    add_eq_icons(v_eq, int(KILLBOT_RENDER_SIZE))
-
-    if inv_items:
-        for it in inv_items[:80]:
-            if not isinstance(it, dict):
-                continue
-            t = (it.get("Type") or "").strip()
-            if not t:
-                continue
-            ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
-            qual = _kb_safe_int(it.get("Quality"), 0)
-            icon_urls.add(_kb_render_url(t, enchant=ench, quality=qual, size=64))
 
-    # fetch icons (concurrent; mem+disk cache)
-    blobs = await _kb_prefetch_icons(bot, icon_urls)
+def _kb_add_item_icon_urls(icon_urls: set, it: Optional[dict], size: int, *, size64_fallback: bool = False) -> None:
+    """Add the render URL of one item to `icon_urls` as a candidate tuple (fallbacks fetched only on failure)."""
+    cand = _kb_icon_candidates(it, size, size64_fallback=size64_fallback)
+    if cand:
+        icon_urls.add(tuple(cand))
 
-    # event id (for labels / debug)
-    eid = _kb_safe_int(ev.get("EventId") or ev.get("id") or 0, 0)
+def _kb_has_equipment(eq: dict) -> bool:
+    for slot, _ in _SLOT_ORDER:
+        it = _kb_slot_item(eq, slot)
+        if isinstance(it, dict) and (it.get("Type") or "").strip():
+            return True
+    return False
 
-    payload = {
-        "kind": kind,
-        "event": ev,
-        "killer": killer,
-        "victim": victim,
-        "k_eq": k_eq,
-        "v_eq": v_eq,
-        "inv_items": inv_items,
-        "stats": stats,
-        "title": f"{(killer.get('Name') or '?').strip()} adlı oyuncu {(victim.get('Name') or '?').strip()} adlı oyuncuyu öldürdü",
-        "location": (ev.get("Location") or "?").strip() or "?",
-        "fame": _kb_safe_int(ev.get("TotalVictimKillFame") or 0, 0),
-        "when": _kb_when_str(ev.get("TimeStamp") or ""),
-        "event_id": eid,
-    }
-    return await run_io(_kb_make_image_sync, payload, blobs)
+def _kb_render_event_sync(payload: Optional[dict], lost: Optional[dict], icon_blobs: Dict[str, bytes]) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """Render main card + lost-items image in one executor hop with shared decoded icons."""
+    decoded: Dict[Any, Any] = {}
+    img = None
+    inv_img = None
+    if payload is not None:
+        try:
+            img = _kb_make_image_sync(payload, icon_blobs, decoded)
+        except Exception as e:
+            log("killbot main image render error:", repr(e))
+    if lost is not None:
+        try:
+            inv_img = _kb_make_inventory_image_sync(lost["v_eq"], lost["inv_items"], icon_blobs, title=lost["title"], decoded=decoded)
+        except Exception as e:
+            log("killbot lost image render error:", repr(e))
+    return img, inv_img
 
+async def _kb_make_event_images(bot: "CallidusBot", ev: dict, kind: str, *, include_main: bool = True, include_lost: bool = True, include_inventory: bool = False) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """One render job per event: resolve icons once, return (main_png, lost_items_png).
 
-async def _kb_make_inventory_image(bot: "CallidusBot", ev: dict, kind: str) -> Optional[bytes]:
-    """Create a separate "lost items" image (equipment + inventory)."""
+    Icon URLs for both images are collected into a single set, fetched with one
+    `_kb_prefetch_icons` call and rendered in one `run_io` call.
+    """
     if not (PIL_OK and KILLBOT_IMAGE_ENABLED):
-        return None
+        return None, None
     if not bot._kb_http:
-        return None
+        return None, None
 
+    killer = ev.get("Killer") if isinstance(ev.get("Killer"), dict) else {}
     victim = ev.get("Victim") if isinstance(ev.get("Victim"), dict) else {}
+    k_eq = _kb_get_equipment(killer)
     v_eq = _kb_get_equipment(victim)
 
-    inv = victim.get("Inventory")
-    inv_items = [it for it in inv if isinstance(it, dict)] if isinstance(inv, list) else []
+    inv = victim.get("Inventory")
+    victim_inv = [it for it in inv if isinstance(it, dict)] if isinstance(inv, list) else []
+
+    icon_urls = set()
+    payload: Optional[dict] = None
+    lost: Optional[dict] = None
+
+    if include_main:
+        # victim inventory on the main card (kill + death) - normally off
+        inv_items = victim_inv if include_inventory else []
+
+        # stats
+        try:
+            stats = _kb_compute_stats(ev)
+        except Exception:
+            stats = {"top_damage_name": "?", "top_damage_val": 0, "top_damage_frac": 0.65}
 
-    # check if there is anything to show
-    has_eq = False
-    try:
         for slot, _ in _SLOT_ORDER:
-            it = _kb_slot_item(v_eq, slot)
-            if isinstance(it, dict) and (it.get("Type") or "").strip():
-                has_eq = True
-                break
-    except Exception:
-        has_eq = False
+            _kb_add_item_icon_urls(icon_urls, _kb_slot_item(k_eq, slot), int(KILLBOT_RENDER_SIZE), size64_fallback=True)
+            _kb_add_item_icon_urls(icon_urls, _kb_slot_item(v_eq, slot), int(KILLBOT_RENDER_SIZE), size64_fallback=True)
+        for it in inv_items[:80]:
+            _kb_add_item_icon_urls(icon_urls, it, 64)
+
+        # event id (for labels / debug)
+        eid = _kb_safe_int(ev.get("EventId") or ev.get("id") or 0, 0)
+
+        payload = {
+            "kind": kind,
+            "event": ev,
+            "killer": killer,
+            "victim": victim,
+            "k_eq": k_eq,
+            "v_eq": v_eq,
+            "inv_items": inv_items,
+            "stats": stats,
+            "title": f"{(killer.get('Name') or '?').strip()} adlı oyuncu {(victim.get('Name') or '?').strip()} adlı oyuncuyu öldürdü",
+            "location": (ev.get("Location") or "?").strip() or "?",
+            "fame": _kb_safe_int(ev.get("TotalVictimKillFame") or 0, 0),
+            "when": _kb_when_str(ev.get("TimeStamp") or ""),
+            "event_id": eid,
+        }
 
-    if not has_eq and not inv_items:
-        return None
+    # lost items image (equipment incl. weapon + inventory) - only if there is anything to show
+    if include_lost and (_kb_has_equipment(v_eq) or victim_inv):
+        # ekipman ana kartla aynı boyutta (aynı URL -> tek indirme/decode), render'da 64'e küçültülür
+        for slot, _ in _SLOT_ORDER:
+            _kb_add_item_icon_urls(icon_urls, _kb_slot_item(v_eq, slot), int(KILLBOT_RENDER_SIZE), size64_fallback=True)
+        for it in victim_inv[:200]:
+            _kb_add_item_icon_urls(icon_urls, it, 64)
+        vname = (victim.get("Name") or "?").strip() or "?"
+        lost = {"v_eq": v_eq, "inv_items": victim_inv, "title": f"Kaybedilen Eşyalar • {vname}"}
 
-    # icon urls (equipment + inventory)
-    icon_urls = set()
+    if payload is None and lost is None:
+        return None, None
 
-    # equipment icons (this is where the weapon lives)
-    for slot, _ in _SLOT_ORDER:
-        it = _kb_slot_item(v_eq, slot)
-        if not isinstance(it, dict):
-            continue
-        t = (it.get("Type") or "").strip()
-        if not t:
-            continue
-        ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
-        qual = _kb_safe_int(it.get("Quality"), 0)
-        icon_urls.add(_kb_render_url(t, enchant=ench, quality=qual, size=64))
-        # fallback variant without quality (some payloads send 0/None)
-        if qual:
-            icon_urls.add(_kb_render_url(t, enchant=ench, quality=0, size=64))
+    # fetch icons once (concurrent; mem+disk cache)
+    blobs = await _kb_prefetch_icons(bot, icon_urls)
+    return await run_io(_kb_render_event_sync, payload, lost, blobs, pool="render")
 
-    # inventory icons
-    for it in inv_items[:200]:
-        if not isinstance(it, dict):
-            continue
-        t = (it.get("Type") or "").strip()
-        if not t:
-            continue
-        ench = _kb_safe_int(it.get("EnchantmentLevel"), 0)
-        qual = _kb_safe_int(it.get("Quality"), 0)
-        icon_urls.add(_kb_render_url(t, enchant=ench, quality=qual, size=64))
-        if qual:
-            icon_urls.add(_kb_render_url(t, enchant=ench, quality=0, size=64))
 
-    blobs = await _kb_prefetch_icons(bot, icon_urls)
+async def _kb_make_image(bot: "CallidusBot", ev: dict, kind: str, *, include_inventory: bool = False) -> Optional[bytes]:
+    img, _inv = await _kb_make_event_images(bot, ev, kind, include_lost=False, include_inventory=include_inventory)
+    return img
+
 
-    vname = (victim.get("Name") or "?").strip() or "?"
-    title = f"Kaybedilen Eşyalar • {vname}"
-    return await run_io(_kb_make_inventory_image_sync, v_eq, inv_items, blobs, title=title)
+async def _kb_make_inventory_image(bot: "CallidusBot", ev: dict, kind: str) -> Optional[bytes]:
+    """Create a separate "lost items" image (equipment + inventory)."""
+    _img, inv_img = await _kb_make_event_images(bot, ev, kind, include_main=False)
+    return inv_img
 
 # =========================================================
 #                           BOT
@@ -5707,6 +7630,7 @@ class CallidusBot(discord.Client):
         
         # Achievement system
         self._achievement_task: Optional[asyncio.Task] = None
+        self._gs_token_task: Optional[asyncio.Task] = None
         
         # Music system - her sunucu için ayrı queue
         self.music_queues: Dict[int, List[Dict[str, Any]]] = {}  # guild_id -> [songs]
@@ -5735,14 +7659,31 @@ class CallidusBot(discord.Client):
         _load_loot_sessions()
         
         if not hasattr(self, "_bb_task"):
-            self._bb_task = self.loop.create_task(_bb_worker(self))
+            self._bb_task = self.loop.create_task(_battleboard_worker(self))
 
-        # Killbot session + task
+        # Killbot session (Sheets REST client'ı ve battleboard da bunu kullanır)
         if self._kb_http is None:
             self._kb_http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        SHEETS_API.client = self
+        ACTIVITY_LEADERBOARD.client = self
+
+        # Google OAuth token'ı arka planda taze tut
+        if self._gs_token_task is None:
+            self._gs_token_task = asyncio.create_task(_gs_token_refresh_loop())
+
+        # Killbot task
         if self._kb_task is None:
             self._kb_task = asyncio.create_task(self._killbot_loop())
         
+        # Harici voice tracker'ın yazdığı activity_state.json'ı izle (run() hazır olmayı bekler)
+        if ACTIVITY_WATCH_ENABLED and not VOICE_TRACKER_ENABLED and _state_db_for("activity") is None:
+            if ACTIVITY_WATCHER.task is None or ACTIVITY_WATCHER.task.done():
+                ACTIVITY_WATCHER.task = asyncio.create_task(ACTIVITY_WATCHER.run(self))
+        
+        # Dahili voice tracker (periyodik flush, hazır olunca başlar; bootstrap dispatch()'ta)
+        if VOICE_TRACKER_ENABLED and (VOICE_TRACKER.task is None or VOICE_TRACKER.task.done()):
+            VOICE_TRACKER.task = asyncio.create_task(VOICE_TRACKER.run(self))
+        
         # Activity inactivity check task - DEVRE DIŞI
         # if self._activity_task is None:
         #     self._activity_task = asyncio.create_task(self._activity_check_loop())
@@ -5777,14 +7718,33 @@ class CallidusBot(discord.Client):
         # Templates yeniden yükle (başlangıçta JSON hazır olsun)
         reload_presets()
 
-    # NOT: Voice tracking ayrı voice_tracker_bot.py tarafından yapılıyor.
-    # Ana bot sadece activity_state.json'dan voice_minutes değerini okuyup Sheet'e yazıyor.
+    # NOT: Voice tracking varsayılan olarak ayrı voice_tracker_bot.py tarafından yapılıyor;
+    # ana bot activity_state.json'dan voice_minutes değerini okuyup Sheet'e yazıyor.
+    # VOICE_TRACKER=1 ise süre burada, VoiceTracker ile sayılır.
+
+    def dispatch(self, event: str, /, *args: Any, **kwargs: Any) -> None:
+        super().dispatch(event, *args, **kwargs)
+        # Her ready/resume'da voice oturumları eşitlenir. discord.Client olay başına tek handler
+        # tuttuğu için burada yapılır; modül seviyesindeki @bot.event on_ready bunu ezmez.
+        if VOICE_TRACKER_ENABLED and event in ("ready", "resumed"):
+            try:
+                VOICE_TRACKER.resync(self)
+            except Exception as e:
+                log(f"[VOICE] Bootstrap hatası: {repr(e)}")
+
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        if not VOICE_TRACKER_ENABLED:
+            return
+        try:
+            VOICE_TRACKER.on_update(member, before, after)
+        except Exception as e:
+            log(f"[VOICE] State update hatası: {repr(e)}")
 
     async def _activity_check_loop(self):
         """Her gün inaktif kullanıcıları kontrol eder ve DM atar."""
         await self.wait_until_ready()
         
-        state = _load_activity_state()
+        state = await _aload_activity_state()
         now = datetime.now(UTC_TZ)
         
         # İlk açılış tarihini kontrol et
@@ -5792,13 +7752,13 @@ class CallidusBot(discord.Client):
         if first_start is None:
             # İlk kez çalışıyor, tarihi kaydet
             state["first_start"] = now.isoformat()
-            _save_activity_state(state)
+            await _asave_activity_state(state)
             log(f"[ACTIVITY] İlk başlatma kaydedildi, 5 gün sonra kontroller başlayacak...")
         
         while not self.is_closed():
             try:
                 # İlk başlatmadan 5 gün geçti mi?
-                state = _load_activity_state()
+                state = await _aload_activity_state()
                 first_start_str = state.get("first_start")
                 if first_start_str:
                     first_start_dt = datetime.fromisoformat(first_start_str.replace("Z", "+00:00"))
@@ -5816,7 +7776,7 @@ class CallidusBot(discord.Client):
     
     async def _check_inactive_users(self):
         """5+ gün inaktif kullanıcılara DM gönderir."""
-        state = _load_activity_state()
+        state = await _aload_activity_state()
         guild = self.get_guild(GUILD_ID)
         if not guild:
             return
@@ -5865,7 +7825,7 @@ class CallidusBot(discord.Client):
                     pass
         
         state["warned_users"] = warned_users
-        _save_activity_state(state)
+        await _asave_activity_state(state)
     
     async def _send_inactivity_warning(self, member: discord.Member):
         """İnaktif kullanıcıya DM gönderir."""
@@ -6042,6 +8002,7 @@ veya
 
     async def on_member_remove(self, member: discord.Member):
         """Üye sunucudan ayrıldığında log kanalına bildirim gönderir."""
+        ACTIVITY_LEADERBOARD.remove(member.id)
         try:
             channel = self.get_channel(LEAVE_LOG_CHANNEL_ID)
             if not channel:
@@ -6091,6 +8052,47 @@ veya
                 self._kb_task.cancel()
         except Exception:
             pass
+        try:
+            await SHEET_WRITES.flush_all()
+        except Exception:
+            pass
+        ACTIVITY_WATCHER.stop()
+        if VOICE_TRACKER_ENABLED:
+            try:
+                await VOICE_TRACKER.flush(force=True)
+            except Exception:
+                pass
+        try:
+            await _drain_activity_patches()
+        except Exception:
+            pass
+        try:
+            await PUAN_STORE.flush()
+            await PUAN_HISTORY.flush()
+        except Exception:
+            pass
+        if STATE_DB is not None:
+            try:
+                await asyncio.to_thread(STATE_DB.close)
+            except Exception:
+                pass
+        try:
+            await SHEETS_API.close()
+        except Exception:
+            pass
+        try:
+            if self._gs_token_task:
+                self._gs_token_task.cancel()
+        except Exception:
+            pass
+        try:
+            await OUTBOUND.stop()
+        except Exception:
+            pass
+        try:
+            await BATTLES.close()
+        except Exception:
+            pass
         try:
             if self._achievement_task:
                 self._achievement_task.cancel()
@@ -6101,6 +8103,11 @@ veya
                 await self._kb_http.close()
         except Exception:
             pass
+        for io_pool in IO_POOLS.values():
+            try:
+                io_pool.shutdown()
+            except Exception:
+                pass
         await super().close()
 
     async def _kb_get_json(self, url: str) -> Any:
@@ -6205,9 +8212,8 @@ veya
             view = KillbotLinks(kill_url=kill_url, battle_url="")
 
             emb = _kb_build_embed(ev2, kind)
-            # Main image (equipment + stats) — inventory is sent as a separate image.
-            img = await _kb_make_image(self, ev2, kind, include_inventory=False)
-            inv_img = await _kb_make_inventory_image(self, ev2, kind)
+            # Main image (equipment + stats) + lost items image, rendered in one job.
+            img, inv_img = await _kb_make_event_images(self, ev2, kind)
             files: List[discord.File] = []
             try:
                 logo_path = _kb_find_guild_logo_path()
@@ -6222,16 +8228,21 @@ veya
                 files.append(discord.File(fp=io.BytesIO(img), filename=f"{kind}_{eid}.png"))
                 emb.set_image(url=f"attachment://{kind}_{eid}.png")
 
+            # Old events (catch-up after downtime) yield to live traffic.
+            prio = OUT_PRIO_BACKFILL if _kb_is_event_too_old(ev2, KILLBOT_BACKFILL_AGE_MINUTES / 60.0) else OUT_PRIO_LIVE
+
             # 1) Send the main kill/death card first.
             if files:
-                await ch.send(embed=emb, files=files, view=view)
+                await out_send(ch, prio=prio, embed=emb, files=files, view=view)
             else:
-                await ch.send(embed=emb, view=view)
+                await out_send(ch, prio=prio, embed=emb, view=view)
 
             # 2) Then send lost items as a separate image (so it shows cleanly after the main card).
             if inv_img:
                 try:
-                    await ch.send(
+                    await out_send(
+                        ch,
+                        prio=prio,
                         content="🎒 Kaybedilen eşyalar",
                         file=discord.File(fp=io.BytesIO(inv_img), filename=f"lost_{eid}.png"),
                     )
@@ -6634,7 +8645,7 @@ veya
             if re.fullmatch(r"\d{1,2}", text):
                 n = int(text)
                 try:
-                    headers, rows = await load_sheet_rows(st.sheet_tab, force=True)
+                    headers, rows = await load_sheet_rows(st.sheet_tab)
                     entries = build_role_entries(st.sheet_tab, st.slots, headers, rows)
                     total_pages = max(1, (len(entries) + SHEET_PAGE_SIZE - 1) // SHEET_PAGE_SIZE)
                     st.page = max(0, min(st.page, total_pages - 1))
@@ -6651,7 +8662,7 @@ veya
 
             # isim ile seçme (role/varyant label)
             try:
-                headers, rows = await load_sheet_rows(st.sheet_tab, force=True)
+                headers, rows = await load_sheet_rows(st.sheet_tab)
                 entries = build_role_entries(st.sheet_tab, st.slots, headers, rows)
                 want = _norm(text)
                 match = None
@@ -6705,7 +8716,7 @@ veya
         chosen_sig8 = chosen_sig8.strip()
 
         try:
-            headers, rows = await load_sheet_rows(st.sheet_tab, force=True)
+            headers, rows = await load_sheet_rows(st.sheet_tab)
             role_rows = _find_rows_for_variant(headers, rows, chosen_role_key, chosen_sig8)
             if not role_rows:
                 return
@@ -6738,7 +8749,7 @@ veya
             return
 
         try:
-            headers2, _rows2 = await load_sheet_rows(st.sheet_tab, force=True)
+            headers2, _rows2 = await load_sheet_rows(st.sheet_tab)
             await clear_user_from_sheet(st.sheet_tab, headers2, message.author.id)
             await set_role_nick(st.sheet_tab, headers2, chosen_row, sheet_user_string(message.author))
         except Exception as e:
@@ -6853,10 +8864,7 @@ async def _send_content_reminder_dm(bot_client: "CallidusBot", message_id: int,
             log(f"[REMINDER] Katılımcı yok, DM gönderilmedi: {content_name}")
             return
         
-        sent_count = 0
-        failed_count = 0
-        
-        for user_id in participant_ids:
+        async def send_one(user_id: int) -> bool:
             try:
                 user = bot_client.get_user(user_id)
                 if not user:
@@ -6872,12 +8880,18 @@ async def _send_content_reminder_dm(bot_client: "CallidusBot", message_id: int,
                     )
                     embed.set_footer(text="10 dakika kaldı • İyi oyunlar!")
                     
-                    await user.send(embed=embed)
-                    sent_count += 1
+                    await out_send(user, prio=OUT_PRIO_DM, embed=embed)
+                    return True
             except discord.Forbidden:
-                failed_count += 1  # DM kapalı
+                pass  # DM kapalı
             except Exception:
-                failed_count += 1
+                pass
+            return False
+        
+        # DM'ler outbound kuyruğunda (DM önceliği) paralel gider
+        results = await asyncio.gather(*[send_one(uid) for uid in participant_ids])
+        sent_count = sum(1 for r in results if r)
+        failed_count = len(results) - sent_count
         
         log(f"[REMINDER] DM gönderildi: {content_name} @ {time_str} ({sent_count} başarılı, {failed_count} başarısız)")
         
@@ -7007,7 +9021,7 @@ async def create_sheet_event(
     if not GOOGLE_CREDS_JSON or not sheet_id:
         raise RuntimeError("GOOGLE_CREDS_JSON veya Sheet ID ayarlı değil. (AVASKIP_SHEET_ID / BRAWLCOMP_SHEET_ID)")
 
-    headers, rows = await load_sheet_rows(sheet_tab, force=True)
+    headers, rows = await load_sheet_rows(sheet_tab, revalidate=True)
     if not rows:
         raise RuntimeError(f"Sheet ({sheet_tab})'te rol bulunamadı.")
 
@@ -8152,6 +10166,95 @@ async def killboard_debug_cmd(interaction: discord.Interaction):
         await safe_send(interaction, f"❌ Hata: {e}", ephemeral=True)
 
 
+@bot.tree.command(name="killboard-bench", description="Kill kartı render süresini ölçer (boş cache vs dolu cache).", guild=discord.Object(id=GUILD_ID))
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(n="Render sayısı (1-200)")
+async def killboard_bench_cmd(interaction: discord.Interaction, n: int = 20):
+    await safe_defer(interaction, ephemeral=True)
+
+    if not (PIL_OK and KILLBOT_IMAGE_ENABLED):
+        return await safe_send(interaction, "❌ Görsel üretimi kapalı (PIL yok veya KILLBOT_IMAGE_ENABLED=0).", ephemeral=True)
+
+    try:
+        res = await run_io(_kb_render_benchmark_sync, max(1, min(200, int(n))), pool="render")
+        cold_ms = res.get("cold_cache_ms", 0.0)
+        warm_ms = res.get("warm_ms", 0.0)
+        speedup = (cold_ms / warm_ms) if warm_ms > 0 else 0.0
+        await safe_send(
+            interaction,
+            f"**Kill kartı render (n={int(res.get('n', 0))})**\n"
+            f"• Boş cache (her render'da font/katman/sprite yeniden): `{cold_ms:.1f} ms/render`\n"
+            f"• Dolu cache: `{warm_ms:.1f} ms/render`\n"
+            f"• Hızlanma: `x{speedup:.2f}`",
+            ephemeral=True,
+        )
+    except Exception as e:
+        await safe_send(interaction, f"❌ Hata: {e}", ephemeral=True)
+
+
+@bot.tree.command(name="kuyruk-durum", description="Discord gönderim kuyruğu (outbound) metrikleri.", guild=discord.Object(id=GUILD_ID))
+@app_commands.default_permissions(administrator=True)
+async def kuyruk_durum_cmd(interaction: discord.Interaction):
+    await safe_defer(interaction, ephemeral=True)
+
+    st = OUTBOUND.stats()
+    lines = [
+        "**Outbound Kuyruk**",
+        f"• Bekleyen: `{st['depth_total']}` | Hedef: `{st['targets']}` | Çalışan: `{st['inflight']}` | Park: `{st['parked']}`",
+        f"• Gönderilen: `{st['sent']}` | Hata: `{st['failed']}` | Rate-limit: `{st['ratelimited']}`",
+        "",
+        "**Öncelik bazında (bekleyen / ort. bekleme / max bekleme):**",
+    ]
+    for name, depth in st["depth"].items():
+        w = st["wait"].get(name) or {}
+        lines.append(f"• `{name}`: {depth} / {w.get('avg_ms', 0.0):.0f} ms / {w.get('max_ms', 0.0):.0f} ms ({w.get('count', 0)} iş)")
+    sw = SHEET_WRITES.stats()
+    lines += [
+        "",
+        "**Sheets yazma tamponu:**",
+        f"• Bekleyen: `{sw['pending']}` | Yazı: `{sw['writes']}` | Birleşen: `{sw['coalesced']}` | batchUpdate: `{sw['batches']}` | Hata: `{sw['failed']}`",
+    ]
+    q = SHEETS_QUOTA.stats()
+    lines += [
+        "",
+        "**Sheets kotası (son 1 dk / limit):**",
+        f"• Okuma: `{q['last_min']['read']}/{q['limits']['read']}` | Yazma: `{q['last_min']['write']}/{q['limits']['write']}` | 429: `{q['throttled']}`",
+        f"• Toplam bekleme: okuma `{q['waited_s']['read']}` sn | yazma `{q['waited_s']['write']}` sn",
+    ]
+    lines += ["", "**Thread havuzları (aktif/worker | kuyruk/tepe | ort. bekleme | ort. iş | doluluk):**"]
+    for name, io_pool in IO_POOLS.items():
+        ps = io_pool.stats()
+        lines.append(
+            f"• `{name}`: {ps['active']}/{ps['workers']} | {ps['queued']}/{ps['peak_queued']} | "
+            f"{ps['wait_avg_ms']:.0f} ms (max {ps['wait_max_ms']:.0f}) | {ps['run_avg_ms']:.0f} ms (max {ps['run_max_ms']:.0f}) | "
+            f"%{ps['saturated_pct']:.1f} ({ps['submitted']} iş, {ps['failed']} hata)"
+        )
+    ab = ACTIVITY_SHEET_MIRROR.stats()
+    lines += [
+        "",
+        "**Activity Balance sync:**",
+        f"• Sync: `{ab['syncs']}` (tam yazım `{ab['full_writes']}`) | Son: `{ab['last_mode'] or '-'}` `{ab['last_cells']}` hücre | Toplam: `{ab['total_cells']}` hücre",
+    ]
+    pst = PUAN_STORE.stats()
+    lines += [
+        "",
+        "**Puan store:**",
+        f"• Kullanıcı: `{pst['users']}` | Değişiklik: `{pst['mutations']}` | Disk yazımı: `{pst['flushes']}` | Bekleyen: `{'evet' if pst['dirty'] else 'hayır'}`",
+        f"• Geçmiş: `{PUAN_HISTORY.stats()['users']}` kullanıcı | `{PUAN_HISTORY.stats()['days']}` gün kaydı",
+    ]
+    if ACTIVITY_WATCHER.task is not None:
+        aw = ACTIVITY_WATCHER.stats()
+        lines.append(f"• activity_state izleme ({aw['mode']}): `{aw['ingests']}` okuma | `{aw['users_updated']}` üye güncellendi | Hatalı okuma: `{aw['parse_errors']}`")
+    if VOICE_TRACKER_ENABLED:
+        vt = VOICE_TRACKER.stats()
+        state = "çalışıyor" if vt["running"] else "⚠️ ÇALIŞMIYOR"
+        lines.append(f"• Voice tracker ({state}): `{vt['active']}` aktif | Olay: `{vt['updates']}` | Tur: `{vt['ticks']}` | Flush: `{vt['flushes']}` | İşlenen: `{vt['minutes']}` dk | Kayıt: `{vt['saves']}` (bekleyen `{vt['unsaved']}` dk) | Bootstrap: `{vt['bootstraps']}`")
+    if STATE_DB is not None:
+        sdb = STATE_DB.stats()
+        lines.append(f"• SQLite: `{os.path.basename(sdb['path'])}` | Kayıt: `{sdb['saves']}` | Yazılan satır: `{sdb['rows_written']}` | Silinen: `{sdb['rows_deleted']}`")
+    await safe_send(interaction, "\n".join(lines), ephemeral=True)
+
+
 # =========================================================
 #                 ACHIEVEMENT COMMANDS
 # =========================================================
@@ -8284,30 +10387,20 @@ if PLAYER_LINK_OK:
 
 
 
-# Slash: /bbtest <n>
-@bot.tree.command(name="bbtest", description="Son savaşlardan seçip battleboard kanalına atar.", guild=discord.Object(id=GUILD_ID))
-@app_commands.describe(n="1=son battle, 2=sondan bir önceki, 3=sondan iki önceki ...")
-async def bbtest_cmd(interaction: discord.Interaction, n: int = 1):
-    await interaction.response.defer(ephemeral=True)
-    try:
-        # n is 1-based: 1=latest, 2=previous, ...
-        battle_id = await _bb_pick_battle_id(n)
-        if not battle_id:
-            await interaction.followup.send("❌ Battle bulunamadı.", ephemeral=True)
-            return
-        ok = await _bb_post_battleboard(interaction.client, battle_id)
-        if ok:
-            await interaction.followup.send(f"✅ Battleboard gönderildi. (battleId={battle_id})", ephemeral=True)
-        else:
-            await interaction.followup.send(f"❌ Bu battle CALLIDUS için yeterince büyük değil (min {MIN_CALLIDUS_PLAYERS} oyuncu).", ephemeral=True)
-    except Exception as e:
-        await interaction.followup.send(f"❌ Hata: {repr(e)}", ephemeral=True)
-
 # =========================
 # Battleboard helpers (py3.8 safe)
 # =========================
+def _bb_log(msg: str) -> None:
+    try:
+        print("[BB]", msg)
+    except Exception:
+        pass
+
 def _bb_load_state() -> Dict[str, Any]:
     try:
+        db = _state_db_for("battleboard")
+        if db is not None:
+            return db.load("battleboard", BATTLEBOARD_STATE_FILE) or {}
         with open(BATTLEBOARD_STATE_FILE, "r", encoding="utf-8") as f:
             return json.load(f)
     except Exception:
@@ -8315,6 +10408,10 @@ def _bb_load_state() -> Dict[str, Any]:
 
 def _bb_save_state(state: Dict[str, Any]) -> None:
     try:
+        db = _state_db_for("battleboard")
+        if db is not None:
+            db.save("battleboard", state)
+            return
         with open(BATTLEBOARD_STATE_FILE, "w", encoding="utf-8") as f:
             json.dump(state, f, ensure_ascii=False, indent=2)
     except Exception:
@@ -8338,14 +10435,18 @@ def _bb_fmt_k(n: int) -> str:
 def _albionbb_battle_link(battle_id: int) -> str:
     return f"{ALBIONBB_BASE}/battles/{int(battle_id)}"
 
-async def _ao_get_json(session: aiohttp.ClientSession, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+async def _ao_get_json_status(session: aiohttp.ClientSession, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Any], int]:
+    """(json, HTTP status); status 0 = bağlantı hatası / timeout / bozuk gövde."""
     try:
         async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=15)) as resp:
             if resp.status != 200:
-                return None
-            return await resp.json()
+                return None, resp.status
+            return await resp.json(), 200
     except Exception:
-        return None
+        return None, 0
+
+async def _ao_get_json(session: aiohttp.ClientSession, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+    return (await _ao_get_json_status(session, url, params=params))[0]
 
 async def _ao_fetch_recent_guild_battles(session: aiohttp.ClientSession, limit: int = 25) -> List[Dict[str, Any]]:
     # Uses official AO API list endpoint (stable).
@@ -8359,8 +10460,80 @@ async def _ao_fetch_recent_guild_battles(session: aiohttp.ClientSession, limit:
     data = await _ao_get_json(session, f"{AO_API_BASE}/battles", params=params)
     return data if isinstance(data, list) else []
 
-async def _ao_fetch_battle_detail(session: aiohttp.ClientSession, battle_id: int) -> Optional[Dict[str, Any]]:
-    return await _ao_get_json(session, f"{AO_API_BASE}/battles/{int(battle_id)}")
+async def _ao_fetch_battle_detail(session: aiohttp.ClientSession, battle_id: int) -> Tuple[Optional[Dict[str, Any]], int]:
+    """(detail, HTTP status)"""
+    return await _ao_get_json_status(session, f"{AO_API_BASE}/battles/{int(battle_id)}")
+
+_BB_BATTLE_HREF_RE = re.compile(rb"/battles/(\d+)")
+
+async def _bb_list_albionbb_ids(
+    session: aiohttp.ClientSession,
+    *,
+    stop_at: int = 0,
+    validators: Optional[Dict[str, str]] = None,
+) -> Optional[Tuple[List[int], Dict[str, str]]]:
+    """Battle ids from the AlbionBB guild battles page, newest first.
+
+    We only use AlbionBB for LISTING (battle ids) because its battle detail pages are JS-rendered.
+    validators: ETag / Last-Modified of the last fully processed response -> conditional GET;
+    304 returns None. Returns (ids, new_validators) otherwise.
+    stop_at: page is newest first, so the body is read in chunks and reading stops at the
+    first id <= stop_at (already known).
+    """
+    headers: Dict[str, str] = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    out: List[int] = []
+    seen = set()
+    new_validators: Dict[str, str] = {}
+
+    def take(m: "re.Match[bytes]") -> bool:
+        bid = int(m.group(1))
+        if stop_at and bid <= stop_at:
+            return False
+        if bid not in seen:
+            seen.add(bid)
+            out.append(bid)
+        return True
+
+    try:
+        async with session.get(ALBIONBB_GUILD_BATTLES_URL, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+            if resp.status == 304:
+                return None
+            if resp.status != 200:
+                return [], {}
+            new_validators = {
+                "etag": resp.headers.get("ETag") or "",
+                "last_modified": resp.headers.get("Last-Modified") or "",
+            }
+            carry = b""
+            async for chunk in resp.content.iter_chunked(16384):
+                buf = carry + chunk
+                last_end = 0
+                for m in _BB_BATTLE_HREF_RE.finditer(buf):
+                    if m.end() == len(buf):
+                        break  # rakamlar sonraki chunk'ta devam ediyor olabilir
+                    if not take(m):
+                        return out, new_validators
+                    last_end = m.end()
+                carry = buf[max(last_end, len(buf) - 32):]
+            for m in _BB_BATTLE_HREF_RE.finditer(carry):
+                if not take(m):
+                    break
+    except Exception:
+        return [], {}
+    return out, new_validators
+
+def _bb_guild_player_count(battle: Dict[str, Any]) -> Optional[int]:
+    """Our guild's player count from a battle (list summary or detail). None = unknown."""
+    players = battle.get("players")
+    if isinstance(players, dict) and players:
+        return sum(1 for p in players.values() if isinstance(p, dict) and (p.get("guildId") or "").strip() == AO_GUILD_ID)
+    return None
 
 def _bb_rows_from_ao_detail(detail: Dict[str, Any]) -> List[Dict[str, Any]]:
     guilds = detail.get("guilds") or {}
@@ -8372,39 +10545,448 @@ def _bb_rows_from_ao_detail(detail: Dict[str, Any]) -> List[Dict[str, Any]]:
         if gid:
             counts[gid] = counts.get(gid, 0) + 1
 
-    rows: List[Dict[str, Any]] = []
-    for gid, g in guilds.items():
-        rows.append({
-            "id": gid,
-            "name": g.get("name") or "Unknown",
-            "alliance": g.get("alliance") or "",
-            "players": int(counts.get(gid, 0)),
-            "kills": int(g.get("kills") or 0),
-            "deaths": int(g.get("deaths") or 0),
-            "fame": int(g.get("killFame") or 0),
-        })
-    rows.sort(key=lambda r: (r["fame"], r["kills"]), reverse=True)
-    return rows
+    rows: List[Dict[str, Any]] = []
+    for gid, g in guilds.items():
+        rows.append({
+            "id": gid,
+            "name": g.get("name") or "Unknown",
+            "alliance": g.get("alliance") or "",
+            "players": int(counts.get(gid, 0)),
+            "kills": int(g.get("kills") or 0),
+            "deaths": int(g.get("deaths") or 0),
+            "fame": int(g.get("killFame") or 0),
+        })
+    rows.sort(key=lambda r: (r["fame"], r["kills"]), reverse=True)
+    return rows
+
+def _bb_make_table(rows: List[Dict[str, Any]], top_n: int = 10) -> str:
+    # AlbionBB-like columns: Guild | Alliance | Players | Kills | Deaths | Fame
+    rows = rows[:top_n]
+    gw = min(20, max(5, max((len(r["name"]) for r in rows), default=5)))
+    aw = min(10, max(7, max((len((r.get("alliance") or "")) for r in rows), default=7)))
+    header = f'{"Guild":<{gw}}  {"Alliance":<{aw}}  {"Players":>7}  {"Kills":>5}  {"Deaths":>6}  {"Fame":>6}'
+    lines = [header]
+    for r in rows:
+        g = r["name"]
+        if len(g) > gw:
+            g = g[:gw-1] + "…"
+        a = (r.get("alliance") or "")
+        if len(a) > aw:
+            a = a[:aw-1] + "…"
+        lines.append(f'{g:<{gw}}  {a:<{aw}}  {r["players"]:>7}  {r["kills"]:>5}  {r["deaths"]:>6}  {_bb_fmt_k(r["fame"]):>6}')
+    return "```" + "\n".join(lines) + "```"
+
+# =========================
+# Battle events, member reports + summary card (PIL, kill kartlarıyla aynı font/katman altyapısı)
+# =========================
+BATTLEBOARD_CARD_ENABLED = os.getenv("BATTLEBOARD_CARD_ENABLED", "1").strip() not in ("0", "false", "False", "no")
+BATTLEBOARD_CARD_GUILDS = int(os.getenv("BATTLEBOARD_CARD_GUILDS", "8"))
+BATTLEBOARD_CARD_TOP = int(os.getenv("BATTLEBOARD_CARD_TOP", "8"))
+BATTLEBOARD_EVENTS_MAX_PAGES = int(os.getenv("BATTLEBOARD_EVENTS_MAX_PAGES", "20"))
+BATTLEBOARD_EVENTS_CONCURRENCY = int(os.getenv("BATTLEBOARD_EVENTS_CONCURRENCY", "4"))
+# üye raporları: battle_reports/<battle_id>.json
+BATTLEBOARD_REPORTS_ENABLED = os.getenv("BATTLEBOARD_REPORTS_ENABLED", "1").strip() not in ("0", "false", "False", "no")
+BATTLEBOARD_REPORT_DIR = (os.getenv("BATTLEBOARD_REPORT_DIR", "battle_reports") or "battle_reports").strip()
+
+# IP histogram buckets (lower bounds); last bucket is open-ended
+_BB_IP_BUCKETS: List[int] = [0, 1100, 1200, 1300, 1400, 1500, 1600]
+_BB_LAYER_CACHE: Dict[Tuple[str, int, bool], "Image.Image"] = {}
+
+_BB_GUILD_ROW_H = 34
+_BB_GUILD_TOP = 110
+_BB_PLAYER_ROW_H = 24
+_BB_IP_H = 170
+
+async def _bb_fetch_battle_events(session: aiohttp.ClientSession, battle_id: int) -> Optional[List[Dict[str, Any]]]:
+    """Kill events of a battle (paged /events/battle/{id}, 51 per page), oldest first.
+
+    Page 0 alone (most battles fit in it), then BATTLEBOARD_EVENTS_CONCURRENCY pages at a
+    time until a short page. None = a page failed (partial events would give wrong totals).
+    """
+    url = f"{AO_API_BASE}/events/battle/{int(battle_id)}"
+    max_pages = max(1, BATTLEBOARD_EVENTS_MAX_PAGES)
+    conc = max(1, BATTLEBOARD_EVENTS_CONCURRENCY)
+    by_id: Dict[int, Dict[str, Any]] = {}
+
+    def take(data: List[Any]) -> bool:
+        # True = full page, more may follow
+        for ev in data:
+            if isinstance(ev, dict):
+                by_id.setdefault(_kb_safe_int(ev.get("EventId") or 0, 0) or -len(by_id) - 1, ev)
+        return len(data) >= 51
+
+    first = await _ao_get_json(session, url, params={"offset": 0, "limit": 51})
+    if not isinstance(first, list):
+        return None
+    more = take(first)
+    nxt = 1
+    while more and nxt < max_pages:
+        pages = list(range(nxt, min(max_pages, nxt + conc)))
+        nxt = pages[-1] + 1
+        results = await asyncio.gather(*(_ao_get_json(session, url, params={"offset": i * 51, "limit": 51}) for i in pages))
+        for data in results:
+            if not isinstance(data, list):
+                return None
+            more = take(data)
+            if not more:
+                break
+    return [by_id[k] for k in sorted(by_id)]
+
+def _bb_item_str(item: Optional[dict]) -> str:
+    return _kb_item_line(item).replace("`", "")
+
+def _bb_player_stats_from_events(events: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """player_id -> {name, guild_id, dmg, heal, ip, kills, deaths, kill_fame, items_lost, lost} from kill events."""
+    stats: Dict[str, Dict[str, Any]] = {}
+
+    def rec(p: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        pid = (p.get("Id") or "").strip()
+        if not pid:
+            return None
+        r = stats.get(pid)
+        if r is None:
+            r = stats[pid] = {
+                "name": (p.get("Name") or "?").strip() or "?",
+                "guild_id": (p.get("GuildId") or "").strip(),
+                "dmg": 0, "heal": 0, "ip": 0.0,
+                "kills": 0, "deaths": 0, "kill_fame": 0, "items_lost": 0, "lost": [],
+            }
+        try:
+            ip = float(p.get("AverageItemPower") or 0.0)
+        except Exception:
+            ip = 0.0
+        if ip > r["ip"]:
+            r["ip"] = ip
+        return r
+
+    for ev in events:
+        killer = ev.get("Killer")
+        if isinstance(killer, dict):
+            r = rec(killer)
+            if r is not None:
+                r["kills"] += 1
+                r["kill_fame"] += _kb_safe_int(ev.get("TotalVictimKillFame") or 0, 0)
+        victim = ev.get("Victim")
+        if isinstance(victim, dict):
+            r = rec(victim)
+            if r is not None:
+                r["deaths"] += 1
+                for it in list(_kb_get_equipment(victim).values()) + list(victim.get("Inventory") or []):
+                    line = _bb_item_str(it) if isinstance(it, dict) else ""
+                    if line:
+                        r["items_lost"] += max(1, _kb_safe_int(it.get("Count") or 1, 1))
+                        r["lost"].append(line)
+        for p in ev.get("Participants") or []:
+            if not isinstance(p, dict):
+                continue
+            r = rec(p)
+            if r is None:
+                continue
+            r["dmg"] += _kb_safe_int(p.get("DamageDone") or 0, 0)
+            r["heal"] += _kb_safe_int(p.get("HealDone") or p.get("HealingDone") or 0, 0) + _kb_safe_int(p.get("SupportHealingDone") or 0, 0)
+    return stats
+
+def _bb_aggregate(detail: Dict[str, Any], player_stats: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Single pass over `players` + `guilds` -> everything the card needs."""
+    guilds = detail.get("guilds") or {}
+    players = detail.get("players") or {}
+    player_stats = player_stats or {}
+
+    counts: Dict[str, int] = {}
+    ours: List[Dict[str, Any]] = []
+    ip_hist = [0] * len(_BB_IP_BUCKETS)
+    for pid, p in players.items():
+        if not isinstance(p, dict):
+            continue
+        gid = (p.get("guildId") or "").strip()
+        if gid:
+            counts[gid] = counts.get(gid, 0) + 1
+        if gid != AO_GUILD_ID:
+            continue
+        ps = player_stats.get(pid) or {}
+        ip = float(ps.get("ip") or 0.0)
+        ours.append({
+            "name": (p.get("name") or ps.get("name") or "?").strip() or "?",
+            "kills": int(p.get("kills") or 0),
+            "deaths": int(p.get("deaths") or 0),
+            "fame": int(p.get("killFame") or 0),
+            "dmg": int(ps.get("dmg") or 0),
+            "heal": int(ps.get("heal") or 0),
+            "ip": ip,
+        })
+        if ip > 0:
+            ip_hist[max(0, bisect.bisect_right(_BB_IP_BUCKETS, ip) - 1)] += 1
+
+    rows = []
+    for gid, g in guilds.items():
+        rows.append({
+            "name": g.get("name") or "Unknown",
+            "alliance": g.get("alliance") or "",
+            "players": int(counts.get(gid, 0)),
+            "kills": int(g.get("kills") or 0),
+            "deaths": int(g.get("deaths") or 0),
+            "fame": int(g.get("killFame") or 0),
+            "ours": gid == AO_GUILD_ID,
+        })
+    rows.sort(key=lambda r: (r["fame"], r["kills"]), reverse=True)
+    top_rows = rows[:max(1, BATTLEBOARD_CARD_GUILDS)]
+    # bizim guild ilk N'de değilse son satıra koy
+    if not any(r["ours"] for r in top_rows):
+        mine = next((r for r in rows if r["ours"]), None)
+        if mine is not None:
+            top_rows[-1] = mine
+
+    top_n = max(1, BATTLEBOARD_CARD_TOP)
+    has_stats = any(o["dmg"] or o["heal"] for o in ours)
+    if has_stats:
+        top_a = [(o["name"], o["dmg"]) for o in heapq.nlargest(top_n, ours, key=lambda o: o["dmg"]) if o["dmg"] > 0]
+        top_b = [(o["name"], o["heal"]) for o in heapq.nlargest(top_n, ours, key=lambda o: o["heal"]) if o["heal"] > 0]
+    else:
+        # event verisi yoksa: kill fame / kill sayısı
+        top_a = [(o["name"], o["fame"]) for o in heapq.nlargest(top_n, ours, key=lambda o: o["fame"]) if o["fame"] > 0]
+        top_b = [(o["name"], o["kills"]) for o in heapq.nlargest(top_n, ours, key=lambda o: o["kills"]) if o["kills"] > 0]
+
+    return {
+        "id": int(detail.get("id") or 0),
+        "total_fame": int(detail.get("totalFame") or 0),
+        "total_kills": int(detail.get("totalKills") or 0),
+        "total_players": len(players),
+        "start": detail.get("startTime") or "",
+        "end": detail.get("endTime") or "",
+        "guild_rows": top_rows,
+        "our_players": len(ours),
+        "has_stats": has_stats,
+        "top_a": top_a,
+        "top_b": top_b,
+        "ip_hist": ip_hist,
+    }
+
+def _bb_card_layout(n_rows: int) -> Dict[str, int]:
+    guild_h = 54 + n_rows * _BB_GUILD_ROW_H
+    lists_top = _BB_GUILD_TOP + guild_h + 20
+    lists_h = 44 + max(1, BATTLEBOARD_CARD_TOP) * _BB_PLAYER_ROW_H + 10
+    ip_top = lists_top + lists_h + 20
+    return {"guild_h": guild_h, "lists_top": lists_top, "lists_h": lists_h, "ip_top": ip_top, "H": ip_top + _BB_IP_H + 20}
+
+def _bb_card_base_layer(n_rows: int, has_stats: bool) -> "Image.Image":
+    """Static battle card layer (cards, section titles, column labels). Shared - .copy() it."""
+    key = ("battle", int(n_rows), bool(has_stats))
+    base = _BB_LAYER_CACHE.get(key)
+    if base is not None:
+        return base
+    W = _KB_W
+    lay = _bb_card_layout(n_rows)
+    base = Image.new("RGBA", (W, lay["H"]), _KB_BG)
+    draw = ImageDraw.Draw(base)
+    _font_big, font_med, font_small = _kb_fonts()
+
+    draw.rounded_rectangle([20, 20, W-20, 90], radius=14, fill=_KB_CARD)
+    draw.rounded_rectangle([20, _BB_GUILD_TOP, W-20, _BB_GUILD_TOP + lay["guild_h"]], radius=14, fill=_KB_CARD)
+    _kb_draw_text(draw, (34, _BB_GUILD_TOP + 14), "Guild'ler", font=font_med)
+    for x, label in ((300, "Kill"), (500, "Death"), (700, "Fame")):
+        _kb_draw_text(draw, (x, _BB_GUILD_TOP + 18), label, font=font_small)
+
+    lt, lh = lay["lists_top"], lay["lists_h"]
+    draw.rounded_rectangle([20, lt, W//2 - 5, lt + lh], radius=14, fill=_KB_CARD)
+    draw.rounded_rectangle([W//2 + 5, lt, W-20, lt + lh], radius=14, fill=_KB_CARD)
+    _kb_draw_text(draw, (34, lt + 14), "En Yüksek Hasar" if has_stats else "En Yüksek Kill Fame", font=font_med)
+    _kb_draw_text(draw, (W//2 + 19, lt + 14), "En Yüksek Heal" if has_stats else "En Çok Kill", font=font_med)
+
+    it = lay["ip_top"]
+    draw.rounded_rectangle([20, it, W-20, it + _BB_IP_H], radius=14, fill=_KB_CARD)
+    _kb_draw_text(draw, (34, it + 14), "IP Dağılımı (CALLIDUS)", font=font_med)
+
+    _BB_LAYER_CACHE[key] = base
+    return base
+
+def _bb_render_card_sync(agg: Dict[str, Any]) -> Optional[bytes]:
+    if not PIL_OK or not BATTLEBOARD_CARD_ENABLED:
+        return None
+    W = _KB_W
+    rows = agg.get("guild_rows") or []
+    n_rows = max(1, len(rows))
+    lay = _bb_card_layout(n_rows)
+    im = _bb_card_base_layer(n_rows, bool(agg.get("has_stats"))).copy()
+    draw = ImageDraw.Draw(im)
+    font_big, font_med, font_small = _kb_fonts()
+
+    # header
+    _kb_draw_text(draw, (34, 30), f"Battle #{agg.get('id', 0)}", font=font_big)
+    when = _kb_when_str(agg.get("start") or "") if agg.get("start") else ""
+    sub = f"Fame: {_bb_fmt_k(agg.get('total_fame', 0))}   •   Kill: {agg.get('total_kills', 0)}   •   Oyuncu: {agg.get('total_players', 0)} (CALLIDUS {agg.get('our_players', 0)})"
+    if when:
+        sub += f"   •   {when}"
+    _kb_draw_text(draw, (34, 62), sub, font=font_small)
+
+    # guild rows with kills / deaths / fame bars
+    max_k = max([r["kills"] for r in rows] + [1])
+    max_d = max([r["deaths"] for r in rows] + [1])
+    max_f = max([r["fame"] for r in rows] + [1])
+    bar_w = 166
+
+    def bar(x: int, y: int, val: int, vmax: int, color, label: str):
+        draw.rounded_rectangle([x, y, x + bar_w, y + 18], radius=6, fill=(60, 63, 68, 255))
+        fw = int(bar_w * max(0.0, min(1.0, float(val) / float(vmax))))
+        if fw >= 4:
+            draw.rounded_rectangle([x, y, x + fw, y + 18], radius=6, fill=color)
+        _kb_draw_text(draw, (x + 6, y + 2), label, font=font_small)
+
+    y = _BB_GUILD_TOP + 44
+    for r in rows:
+        if r.get("ours"):
+            draw.rounded_rectangle([28, y - 4, W - 28, y + _BB_GUILD_ROW_H - 8], radius=8, fill=(58, 62, 70, 255))
+        name = r["name"] if len(r["name"]) <= 22 else r["name"][:21] + "…"
+        _kb_draw_text(draw, (34, y), name, font=font_small)
+        _kb_draw_text(draw, (230, y), f"{r['players']}p", font=font_small)
+        bar(300, y - 1, r["kills"], max_k, (70, 150, 80, 255), str(r["kills"]))
+        bar(500, y - 1, r["deaths"], max_d, (180, 60, 60, 255), str(r["deaths"]))
+        bar(700, y - 1, r["fame"], max_f, (190, 150, 40, 255), _bb_fmt_k(r["fame"]))
+        y += _BB_GUILD_ROW_H
+
+    # top lists
+    lt = lay["lists_top"]
+
+    def top_list(x0: int, items: List[Tuple[str, int]], color):
+        vmax = max([v for _n, v in items] + [1])
+        col_w = W // 2 - 60
+        for i, (nm, vv) in enumerate(items[:max(1, BATTLEBOARD_CARD_TOP)]):
+            yy = lt + 44 + i * _BB_PLAYER_ROW_H
+            fw = int((col_w - 4) * float(vv) / float(vmax))
+            if fw >= 4:
+                draw.rounded_rectangle([x0, yy, x0 + fw, yy + 18], radius=6, fill=color)
+            nm = nm if len(nm) <= 18 else nm[:17] + "…"
+            _kb_draw_text(draw, (x0 + 6, yy + 2), f"{i+1}. {nm}", font=font_small)
+            vs = f"{vv:,}".replace(",", ".")
+            _kb_draw_text(draw, (x0 + col_w - 6 - _kb_text_width(draw, vs, font=font_small), yy + 2), vs, font=font_small)
+        if not items:
+            _kb_draw_text(draw, (x0, lt + 44), "Veri yok", font=font_small)
+
+    top_list(34, agg.get("top_a") or [], (150, 60, 60, 255))
+    top_list(W // 2 + 19, agg.get("top_b") or [], (60, 120, 170, 255))
+
+    # IP histogram
+    it = lay["ip_top"]
+    hist = agg.get("ip_hist") or []
+    hmax = max(hist + [1])
+    nb = max(1, len(hist))
+    slot = (W - 80) // nb
+    base_y = it + _BB_IP_H - 30
+    bar_h = _BB_IP_H - 80
+    if not any(hist):
+        _kb_draw_text(draw, (34, it + 50), "Veri yok", font=font_small)
+    for i, c in enumerate(hist):
+        x = 40 + i * slot
+        h = int(bar_h * float(c) / float(hmax))
+        if c:
+            draw.rounded_rectangle([x + 8, base_y - h, x + slot - 8, base_y], radius=6, fill=(120, 170, 255, 255))
+            _kb_draw_text(draw, (x + 12, base_y - h - 16), str(c), font=font_small)
+        lo = _BB_IP_BUCKETS[i]
+        lbl = f"<{_BB_IP_BUCKETS[1]}" if i == 0 else (f"{lo}+" if i == nb - 1 else f"{lo}-{_BB_IP_BUCKETS[i+1] - 1}")
+        _kb_draw_text(draw, (x + 10, base_y + 6), lbl, font=font_small)
+
+    out = io.BytesIO()
+    im.save(out, format="PNG")
+    return out.getvalue()
+
+def _bb_build_member_report(detail: Dict[str, Any], player_stats: Dict[str, Dict[str, Any]], n_events: int) -> Dict[str, Any]:
+    """Per-member report for our guild (JSON-safe, stored as-is).
+
+    kills/deaths/fame: battle detail (full battle); dmg/heal/IP/items lost: kill events.
+    """
+    players = detail.get("players") or {}
+    ids = {pid for pid, p in players.items() if isinstance(p, dict) and (p.get("guildId") or "").strip() == AO_GUILD_ID}
+    # detail'de olmayan (event'lerde görünen) üyeler de dahil; detail'deki guild bilgisi esas
+    ids.update(pid for pid, r in player_stats.items() if pid not in players and r.get("guild_id") == AO_GUILD_ID)
+
+    members: List[Dict[str, Any]] = []
+    for pid in ids:
+        p = players.get(pid) if isinstance(players.get(pid), dict) else None
+        r = player_stats.get(pid) or {}
+        members.append({
+            "id": pid,
+            "name": ((p or {}).get("name") or r.get("name") or "?").strip() or "?",
+            "kills": int(p.get("kills") or 0) if p else int(r.get("kills") or 0),
+            "deaths": int(p.get("deaths") or 0) if p else int(r.get("deaths") or 0),
+            "fame": int(p.get("killFame") or 0) if p else int(r.get("kill_fame") or 0),
+            "dmg": int(r.get("dmg") or 0),
+            "heal": int(r.get("heal") or 0),
+            "ip": round(float(r.get("ip") or 0.0), 1),
+            "items_lost": int(r.get("items_lost") or 0),
+            "lost": list(r.get("lost") or []),
+        })
+    members.sort(key=lambda m: (m["fame"], m["kills"], m["dmg"]), reverse=True)
+    return {
+        "battle_id": int(detail.get("id") or 0),
+        "start": detail.get("startTime") or "",
+        "end": detail.get("endTime") or "",
+        "total_fame": int(detail.get("totalFame") or 0),
+        "total_kills": int(detail.get("totalKills") or 0),
+        "events": int(n_events),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "members": members,
+    }
+
+def _bb_format_member_report(report: Dict[str, Any]) -> str:
+    def fmt_int(n: int) -> str:
+        return f"{int(n):,}".replace(",", ".")
+
+    members = report.get("members") or []
+    out_lines: List[str] = []
+    out_lines.append(f"BattleId: {report.get('battle_id', 0)}")
+    if report.get("start"):
+        out_lines.append(f"Time: {_kb_when_str(report.get('start') or '')}")
+    out_lines.append(f"Fame: {fmt_int(report.get('total_fame', 0))} | Kills: {report.get('total_kills', 0)} | Events: {report.get('events', 0)}")
+    out_lines.append(f"CALLIDUS: {len(members)}")
+    out_lines.append("")
+    out_lines.append("=== Members ===")
+    for m in members:
+        out_lines.append(
+            f"- {m['name']} | IP {m['ip']:.0f} | K {m['kills']} | D {m['deaths']} | Fame {fmt_int(m['fame'])}"
+            f" | DMG {fmt_int(m['dmg'])} | HEAL {fmt_int(m['heal'])} | Lost {m['items_lost']}"
+        )
+    lost = [m for m in members if m.get("lost")]
+    if lost:
+        out_lines.append("")
+        out_lines.append("=== Items lost ===")
+        for m in lost:
+            cnt: Dict[str, int] = {}
+            for line in m["lost"]:
+                cnt[line] = cnt.get(line, 0) + 1
+            out_lines.append(f"- {m['name']}: " + ", ".join(f"{k} ×{v}" if v > 1 else k for k, v in cnt.items()))
+    return "\n".join(out_lines).strip() + "\n"
+
+def _bb_report_path(battle_id: int) -> str:
+    return os.path.join(BATTLEBOARD_REPORT_DIR or "battle_reports", f"{int(battle_id)}.json")
+
+def _bb_load_report(battle_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_bb_report_path(battle_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+def _bb_save_report(report: Dict[str, Any]) -> None:
+    try:
+        os.makedirs(BATTLEBOARD_REPORT_DIR or "battle_reports", exist_ok=True)
+        p = _bb_report_path(int(report.get("battle_id") or 0))
+        tmp = p + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False)
+        os.replace(tmp, p)
+    except Exception as e:
+        _bb_log("report save error: %r" % (e,))
 
-def _bb_make_table(rows: List[Dict[str, Any]], top_n: int = 10) -> str:
-    # AlbionBB-like columns: Guild | Alliance | Players | Kills | Deaths | Fame
-    rows = rows[:top_n]
-    gw = min(20, max(5, max((len(r["name"]) for r in rows), default=5)))
-    aw = min(10, max(7, max((len((r.get("alliance") or "")) for r in rows), default=7)))
-    header = f'{"Guild":<{gw}}  {"Alliance":<{aw}}  {"Players":>7}  {"Kills":>5}  {"Deaths":>6}  {"Fame":>6}'
-    lines = [header]
-    for r in rows:
-        g = r["name"]
-        if len(g) > gw:
-            g = g[:gw-1] + "…"
-        a = (r.get("alliance") or "")
-        if len(a) > aw:
-            a = a[:aw-1] + "…"
-        lines.append(f'{g:<{gw}}  {a:<{aw}}  {r["players"]:>7}  {r["kills"]:>5}  {r["deaths"]:>6}  {_bb_fmt_k(r["fame"]):>6}')
-    return "```" + "\n".join(lines) + "```"
+async def _bb_make_card(detail: Dict[str, Any], report: Optional[Dict[str, Any]] = None) -> Optional[bytes]:
+    if not (PIL_OK and BATTLEBOARD_CARD_ENABLED):
+        return None
+    member_stats = {m["id"]: m for m in (report or {}).get("members") or [] if m.get("id")}
+    agg = _bb_aggregate(detail, member_stats)
+    return await run_io(_bb_render_card_sync, agg, pool="render")
 
-async def _bb_post_battle(interaction_or_client: Any, battle_detail: Dict[str, Any]) -> None:
+async def _bb_post_battle(interaction_or_client: Any, battle_detail: Dict[str, Any], report: Optional[Dict[str, Any]] = None) -> None:
     # interaction_or_client: discord.Interaction or discord.Client
+    # report: _bb_build_member_report çıktısı; None ise kart sadece detail ile çizilir, rapor eklenmez
     client = getattr(interaction_or_client, "client", interaction_or_client)
     ch = client.get_channel(BATTLEBOARD_CHANNEL_ID)
     if ch is None:
@@ -8424,71 +11006,313 @@ async def _bb_post_battle(interaction_or_client: Any, battle_detail: Dict[str, A
     )
     embed.add_field(name="AlbionBB", value=_albionbb_battle_link(battle_id), inline=False)
 
-    await ch.send(embed=embed)
+    files: List[discord.File] = []
+    card = None
+    try:
+        card = await _bb_make_card(battle_detail, report)
+    except Exception as e:
+        _bb_log("battle card error: %r" % (e,))
+    if card:
+        # görsel tabloyu içeriyor; metin tablo sadece görsel yoksa
+        embed.description = None
+        embed.set_image(url=f"attachment://battle_{battle_id}.png")
+        files.append(discord.File(fp=io.BytesIO(card), filename=f"battle_{battle_id}.png"))
+    if report and report.get("members"):
+        txt = _bb_format_member_report(report)
+        files.append(discord.File(fp=io.BytesIO(txt.encode("utf-8")), filename=f"battle_{battle_id}_report.txt"))
+
+    if files:
+        await out_send(ch, prio=OUT_PRIO_LIVE, embed=embed, files=files)
+        return
+    await out_send(ch, prio=OUT_PRIO_LIVE, embed=embed)
 
-async def _battleboard_worker(bot: discord.Client) -> None:
-    await bot.wait_until_ready()
-    state = _bb_load_state()
-    last_posted = int(state.get("last_posted_battle_id") or 0)
+# =========================
+# Battle ingestion engine (tek cursor + detail cache)
+# =========================
+class BattleIngestEngine:
+    """Single battleboard pipeline.
+
+    - aday listesi: BATTLEBOARD_SOURCE (AlbionBB sayfası veya AO /battles)
+    - tek cursor (`last_battle_id`): sadece cursor'dan büyük id'ler işlenir,
+      aynı battle iki kez değerlendirilmez
+    - ucuz ön kontrol (liste özetindeki oyuncu/fame) geçmeyen battle için
+      /battles/{id} detail çekilmez
+    - detail cache: id -> (zaman, detail), BATTLEBOARD_DETAIL_TTL sn
+    - eşiği geçen battle için event'ler (sayfalı, sınırlı paralel) -> üye raporu,
+      BATTLEBOARD_REPORT_DIR altında saklanır
+    """
 
-    headers = {"User-Agent": "CALLIDUS-DiscordBot/1.0"}
-    async with aiohttp.ClientSession(headers=headers) as session:
-        while not bot.is_closed():
-            try:
-                battles = await _ao_fetch_recent_guild_battles(session, limit=30)
-                # process oldest -> newest for stable posting
-                for b in reversed(battles):
+    def __init__(self):
+        st = _bb_load_state()
+        # eski iki worker'ın cursor'ları tek cursor'a birleşiyor
+        self.last_battle_id = max(int(st.get("last_battle_id") or 0), int(st.get("last_posted_battle_id") or 0))
+        self._detail_cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._events_cache: Dict[int, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._own_http: Optional[aiohttp.ClientSession] = None
+        self.client: Optional[discord.Client] = None
+        self.fetches = 0
+        self.event_fetches = 0
+        self.cache_hits = 0
+        self.prechecks_skipped = 0
+        self.not_modified = 0
+        self.detail_skipped = 0
+        self._detail_failures: Dict[int, int] = {}  # battle id -> ardışık geçici hata sayısı
+        # AlbionBB list validators; committed only after every listed id is processed
+        self._list_validators: Dict[str, str] = {}
+        self._pending_validators: Optional[Dict[str, str]] = None
+
+    def _http(self) -> aiohttp.ClientSession:
+        # killbot ile aynı session (bağlantı havuzu paylaşılıyor)
+        s = getattr(self.client, "_kb_http", None) if self.client is not None else None
+        if s is not None and not s.closed:
+            return s
+        if self._own_http is None or self._own_http.closed:
+            self._own_http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        return self._own_http
+
+    def _save(self) -> None:
+        _bb_save_state({"last_battle_id": int(self.last_battle_id)})
+
+    def _commit_validators(self) -> None:
+        # yarım kalan poll'da (detail hatası) eski validator'lar kalır -> sonraki poll 304 almaz
+        if self._pending_validators is not None:
+            self._list_validators = self._pending_validators
+            self._pending_validators = None
+
+    async def close(self) -> None:
+        if self._own_http is not None and not self._own_http.closed:
+            await self._own_http.close()
+
+    @staticmethod
+    def _cache_put(cache: Dict[int, Tuple[float, Any]], bid: int, now: float, value: Any) -> None:
+        cache[bid] = (now, value)
+        # expired + oldest first
+        for k in [k for k, (t, _v) in cache.items() if (now - t) >= BATTLEBOARD_DETAIL_TTL]:
+            cache.pop(k, None)
+        while len(cache) > max(1, BATTLEBOARD_DETAIL_CACHE_MAX):
+            cache.pop(min(cache.keys()))
+
+    async def fetch_detail(self, battle_id: int) -> Tuple[Optional[Dict[str, Any]], int]:
+        """(detail, HTTP status); cache'ten gelirse status 200."""
+        bid = int(battle_id)
+        now = _loop_time()
+        hit = self._detail_cache.get(bid)
+        if hit and (now - hit[0]) < BATTLEBOARD_DETAIL_TTL:
+            self.cache_hits += 1
+            return hit[1], 200
+        self.fetches += 1
+        detail, status = await _ao_fetch_battle_detail(self._http(), bid)
+        if isinstance(detail, dict):
+            self._cache_put(self._detail_cache, bid, now, detail)
+            return detail, status
+        return None, (status if status != 200 else 0)
+
+    async def get_detail(self, battle_id: int) -> Optional[Dict[str, Any]]:
+        return (await self.fetch_detail(battle_id))[0]
+
+    async def get_events(self, battle_id: int) -> Optional[List[Dict[str, Any]]]:
+        bid = int(battle_id)
+        now = _loop_time()
+        hit = self._events_cache.get(bid)
+        if hit and (now - hit[0]) < BATTLEBOARD_DETAIL_TTL:
+            self.cache_hits += 1
+            return hit[1]
+        self.event_fetches += 1
+        events = await _bb_fetch_battle_events(self._http(), bid)
+        if events is not None:
+            self._cache_put(self._events_cache, bid, now, events)
+        return events
+
+    async def get_report(self, detail: Dict[str, Any], *, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Member report for a battle: local store first, else events -> report -> store."""
+        bid = int(detail.get("id") or 0)
+        if bid <= 0:
+            return None
+        if not refresh:
+            stored = await run_io(_bb_load_report, bid, pool="disk")
+            if stored is not None:
+                return stored
+        events = await self.get_events(bid)
+        if events is None:
+            _bb_log("battle events unavailable: %s" % bid)
+            return None
+        report = _bb_build_member_report(detail, _bb_player_stats_from_events(events), len(events))
+        if BATTLEBOARD_REPORTS_ENABLED:
+            await run_io(_bb_save_report, report, pool="disk")
+        return report
+
+    async def list_candidates(self, incremental: bool = False) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+        """[(battle_id, summary_or_None)], newest first.
+
+        incremental=True (worker): AlbionBB list via conditional GET, only ids above the cursor.
+        """
+        if BATTLEBOARD_SOURCE == "ao":
+            out: List[Tuple[int, Optional[Dict[str, Any]]]] = []
+            for b in await _ao_fetch_recent_guild_battles(self._http(), limit=30):
+                try:
                     bid = int(b.get("id") or b.get("Id") or 0)
-                    if bid <= 0 or bid <= last_posted:
-                        continue
-
-                    detail = await _ao_fetch_battle_detail(session, bid)
-                    if not detail:
-                        continue
-
-                    # Filters
-                    total_fame = int(detail.get("totalFame") or 0)
-                    if total_fame < BATTLEBOARD_MIN_TOTAL_FAME:
-                        continue
-
-                    # guild players count
-                    my_players = 0
-                    for p in (detail.get("players") or {}).values():
-                        if (p.get("guildId") or "") == AO_GUILD_ID:
-                            my_players += 1
-                    if my_players < BATTLEBOARD_MIN_GUILD_PLAYERS:
-                        continue
+                except Exception:
+                    continue
+                if bid > 0:
+                    out.append((bid, b))
+            out.sort(key=lambda x: x[0], reverse=True)
+            return out
+        if not incremental:
+            res = await _bb_list_albionbb_ids(self._http())
+            return [(bid, None) for bid in (res[0] if res else [])]
+        res = await _bb_list_albionbb_ids(self._http(), stop_at=self.last_battle_id, validators=self._list_validators)
+        if res is None:
+            self.not_modified += 1
+            return []
+        ids, self._pending_validators = res
+        return [(bid, None) for bid in ids]
+
+    @staticmethod
+    def precheck(summary: Optional[Dict[str, Any]]) -> bool:
+        """Cheap filter on the list summary; True = detail fetch gerekebilir."""
+        if not isinstance(summary, dict):
+            return True  # AlbionBB listesi zaten minPlayers ile filtreli
+        try:
+            if BATTLEBOARD_MIN_TOTAL_FAME and int(summary.get("totalFame") or 0) < BATTLEBOARD_MIN_TOTAL_FAME:
+                return False
+        except Exception:
+            pass
+        cnt = _bb_guild_player_count(summary)
+        if cnt is not None and cnt < BATTLEBOARD_MIN_GUILD_PLAYERS:
+            return False
+        guilds = summary.get("guilds")
+        if cnt is None and isinstance(guilds, dict) and guilds and AO_GUILD_ID not in guilds:
+            return False
+        return True
 
-                    await _bb_post_battle(bot, detail)
+    @staticmethod
+    def qualifies(detail: Dict[str, Any]) -> bool:
+        if int(detail.get("totalFame") or 0) < BATTLEBOARD_MIN_TOTAL_FAME:
+            return False
+        return (_bb_guild_player_count(detail) or 0) >= BATTLEBOARD_MIN_GUILD_PLAYERS
+
+    async def poll_once(self) -> int:
+        """Process every battle newer than the cursor (oldest first). Returns posted count."""
+        self._pending_validators = None
+        cands = await self.list_candidates(incremental=True)
+        if not cands:
+            self._commit_validators()
+            return 0
+        if self.last_battle_id <= 0:
+            # ilk açılış: geçmişi basma, cursor'u en yeniye al
+            self.last_battle_id = cands[0][0]
+            self._save()
+            self._commit_validators()
+            _bb_log("cursor bootstrap: %s" % self.last_battle_id)
+            return 0
 
-                    last_posted = bid
-                    state["last_posted_battle_id"] = last_posted
-                    _bb_save_state(state)
+        posted = 0
+        for bid, summary in sorted((c for c in cands if c[0] > self.last_battle_id), key=lambda c: c[0]):
+            if not self.precheck(summary):
+                self.prechecks_skipped += 1
+            else:
+                detail, status = await self.fetch_detail(bid)
+                if detail is None:
+                    if status in (404, 410):
+                        # kalıcı: battle yok, atlanır
+                        _bb_log("battle detail %s: HTTP %s, atlanıyor" % (bid, status))
+                        self.detail_skipped += 1
+                    else:
+                        # geçici hata (timeout / 5xx / 429): cursor ilerlemez, sonraki poll'da tekrar
+                        fails = self._detail_failures.get(bid, 0) + 1
+                        self._detail_failures[bid] = fails
+                        if fails < BATTLEBOARD_DETAIL_MAX_RETRIES:
+                            break
+                        _bb_log("battle detail %s: %s denemede alınamadı (son status %s), atlanıyor" % (bid, fails, status))
+                        self.detail_skipped += 1
+                elif self.qualifies(detail):
+                    await _bb_post_battle(self.client, detail, await self.get_report(detail))
+                    posted += 1
+                self._detail_failures.pop(bid, None)
+            self.last_battle_id = bid
+            self._save()
+        else:
+            self._commit_validators()
+        return posted
 
+    async def run(self, client: discord.Client) -> None:
+        self.client = client
+        await client.wait_until_ready()
+        while not client.is_closed():
+            try:
+                await self.poll_once()
             except Exception as e:
-                print(f"[BOT] [BB] worker error: {repr(e)}")
-
+                _bb_log("worker error: %r" % (e,))
             await asyncio.sleep(BATTLEBOARD_POLL_SECONDS)
 
-    if n < 1:
-        n = 1
+BATTLES = BattleIngestEngine()
 
-    headers = {"User-Agent": "CALLIDUS-DiscordBot/1.0"}
-    async with aiohttp.ClientSession(headers=headers) as session:
-        battles = await _ao_fetch_recent_guild_battles(session, limit=max(10, n + 5))
-        if not battles or n > len(battles):
-            await interaction.followup.send("❌ Bu aralıkta battle yok.", ephemeral=True)
-            return
+async def _battleboard_worker(bot: discord.Client) -> None:
+    await BATTLES.run(bot)
 
-        bid = int(battles[n-1].get("id") or 0)
-        detail = await _ao_fetch_battle_detail(session, bid)
-        if not detail:
-            await interaction.followup.send(f"❌ Bu battle CALLIDUS için yeterince büyük değil (min {MIN_CALLIDUS_PLAYERS} oyuncu).", ephemeral=True)
+
+# Slash: /bbtest <n>
+@bot.tree.command(name="bbtest", description="Son savaşlardan seçip battleboard kanalına atar.", guild=discord.Object(id=GUILD_ID))
+@app_commands.describe(n="1=son battle, 2=sondan bir önceki, 3=sondan iki önceki ...")
+async def bbtest_cmd(interaction: discord.Interaction, n: int = 1):
+    await interaction.response.defer(ephemeral=True)
+    try:
+        BATTLES.client = interaction.client
+        # n is 1-based: 1=latest, 2=previous, ...
+        cands = await BATTLES.list_candidates()
+        idx = max(0, int(n) - 1)
+        if idx >= len(cands):
+            await interaction.followup.send("❌ Battle bulunamadı.", ephemeral=True)
             return
+        battle_id = cands[idx][0]
+        detail = await BATTLES.get_detail(battle_id)
+        if detail and BATTLES.qualifies(detail):
+            await _bb_post_battle(interaction, detail, await BATTLES.get_report(detail))
+            await interaction.followup.send(f"✅ Battleboard gönderildi. (battleId={battle_id})", ephemeral=True)
+        else:
+            await interaction.followup.send(f"❌ Bu battle CALLIDUS için yeterince büyük değil (min {BATTLEBOARD_MIN_GUILD_PLAYERS} oyuncu).", ephemeral=True)
+    except Exception as e:
+        await interaction.followup.send(f"❌ Hata: {repr(e)}", ephemeral=True)
 
-        await _bb_post_battle(interaction, detail)
 
-    await interaction.followup.send(f"✅ Battleboard gönderildi. (battleId={bid})", ephemeral=True)
+# Slash: /battle-rapor <battle_id>
+@bot.tree.command(name="battle-rapor", description="Bir battle için CALLIDUS üye raporu (kill/death/fame/hasar/heal/kayıp item).", guild=discord.Object(id=GUILD_ID))
+@app_commands.describe(battle_id="Albion battle id", yenile="Saklanan raporu yok say, event'leri yeniden çek")
+async def battle_rapor_cmd(interaction: discord.Interaction, battle_id: int, yenile: bool = False):
+    await interaction.response.defer(ephemeral=True)
+    try:
+        if interaction.client is not None and BATTLES.client is None:
+            BATTLES.client = interaction.client
+        report = None if yenile else await run_io(_bb_load_report, battle_id, pool="disk")
+        if report is None:
+            detail = await BATTLES.get_detail(battle_id)
+            if not detail:
+                await interaction.followup.send("❌ Battle bulunamadı.", ephemeral=True)
+                return
+            report = await BATTLES.get_report(detail, refresh=yenile)
+        if not report or not report.get("members"):
+            await interaction.followup.send("❌ Bu battle'da CALLIDUS üyesi yok ya da event'ler alınamadı.", ephemeral=True)
+            return
+        members = report["members"]
+        top = "\n".join(
+            f"`{m['name'][:16]:<16}` K{m['kills']} D{m['deaths']} • {_bb_fmt_k(m['fame'])} • DMG {_bb_fmt_k(m['dmg'])} • HEAL {_bb_fmt_k(m['heal'])}"
+            for m in members[:10]
+        )
+        embed = discord.Embed(title=f"Battle #{battle_id} • Üye Raporu", description=top)
+        embed.add_field(
+            name="Toplam",
+            value=f"Üye: **{len(members)}** | Fame: **{_bb_fmt_k(int(report.get('total_fame') or 0))}** | Kayıp item: **{sum(m['items_lost'] for m in members)}**",
+            inline=False,
+        )
+        embed.add_field(name="AlbionBB", value=_albionbb_battle_link(battle_id), inline=False)
+        txt = _bb_format_member_report(report)
+        await interaction.followup.send(
+            embed=embed,
+            file=discord.File(fp=io.BytesIO(txt.encode("utf-8")), filename=f"battle_{battle_id}_report.txt"),
+            ephemeral=True,
+        )
+    except Exception as e:
+        await interaction.followup.send(f"❌ Hata: {repr(e)}", ephemeral=True)
 
 
 # =========================================================
@@ -8653,8 +11477,6 @@ async def _music_search(query: str) -> Optional[Dict[str, Any]]:
     
     is_url = query.startswith(('http://', 'https://'))
     
-    loop = asyncio.get_event_loop()
-    
     def _download():
         import glob
         import uuid
@@ -8759,7 +11581,7 @@ async def _music_search(query: str) -> Optional[Dict[str, Any]]:
     
     try:
         result = await asyncio.wait_for(
-            loop.run_in_executor(None, _download),
+            run_io(_download, pool="media"),
             timeout=60.0
         )
         return result
@@ -8798,8 +11620,6 @@ async def _music_extract_playlist(url: str, max_songs: int = 50) -> Tuple[Option
         
         _music_log(f"Playlist çıkarılıyor: {url}")
         
-        loop = asyncio.get_event_loop()
-        
         opts = {
             'extract_flat': True,
             'quiet': True,
@@ -8819,7 +11639,7 @@ async def _music_extract_playlist(url: str, max_songs: int = 50) -> Tuple[Option
         # Timeout ile çalıştır
         try:
             info = await asyncio.wait_for(
-                loop.run_in_executor(None, _extract),
+                run_io(_extract, pool="media"),
                 timeout=30.0
             )
         except asyncio.TimeoutError:
@@ -10369,8 +13189,7 @@ def _format_duration(minutes: int) -> str:
 @bot.tree.command(name="aktivite", description="Bir kullanıcının aktivite bilgilerini gösterir.", guild=discord.Object(id=GUILD_ID))
 @app_commands.describe(user="Aktivitesini görmek istediğin kullanıcı")
 async def aktivite_cmd(interaction: discord.Interaction, user: discord.Member):
-    state = _load_activity_state()
-    user_data = state["users"].get(str(user.id))
+    user_data = await _aget_activity_user(user.id)
     
     if user_data is None:
         return await interaction.response.send_message(
@@ -10448,56 +13267,48 @@ async def aktivite_cmd(interaction: discord.Interaction, user: discord.Member):
 
 @bot.tree.command(name="aktivite-top", description="En aktif 10 kullanıcıyı gösterir.", guild=discord.Object(id=GUILD_ID))
 async def aktivite_top_cmd(interaction: discord.Interaction):
-    state = _load_activity_state()
+    await ACTIVITY_LEADERBOARD.ensure_fresh()
+    index = ACTIVITY_LEADERBOARD
     guild = interaction.guild
+    viewer_id = interaction.user.id
     
-    if not state["users"]:
+    if not len(index):
         return await interaction.response.send_message("📊 Henüz aktivite verisi yok.", ephemeral=True)
     
-    # Toplam aktivite puanı hesapla (content*10 + voice_minutes/30)
-    scores = []
-    for user_id_str, data in state["users"].items():
-        try:
-            user_id = int(user_id_str)
-            member = guild.get_member(user_id)
-            if member and not member.bot:
-                score = (
-                    data.get("content_joins", 0) * 10 +
-                    data.get("voice_minutes", 0) / 30
-                )
-                scores.append((member, data, score))
-        except:
-            continue
-    
-    scores.sort(key=lambda x: x[2], reverse=True)
-    top_10 = scores[:10]
-    
-    if not top_10:
-        return await interaction.response.send_message("📊 Gösterilecek veri yok.", ephemeral=True)
-    
-    embed = discord.Embed(
-        title="📊 En Aktif 10 Üye",
-        color=0x5865F2
-    )
-    
-    lines = []
-    for i, (member, data, score) in enumerate(top_10, 1):
-        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-        lines.append(
-            f"{medal} **{member.name}** - "
-            f"{data.get('content_joins', 0)}C / {_format_duration(data.get('voice_minutes', 0))}"
+    def render(page: int) -> Tuple[discord.Embed, int]:
+        total_pages = max(1, (len(index) + 9) // 10)
+        page = max(0, min(page, total_pages - 1))
+        embed = discord.Embed(
+            title="📊 En Aktif 10 Üye" if page == 0 else f"📊 En Aktif Üyeler ({page * 10 + 1}-{page * 10 + 10})",
+            color=0x5865F2
         )
+        
+        lines = []
+        for i, (user_id, _score) in enumerate(index.page(page * 10, 10), page * 10 + 1):
+            member = guild.get_member(user_id) if guild else None
+            name = member.name if member else f"ID:{user_id}"
+            content_joins, voice_minutes = index.totals.get(user_id, (0, 0))
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+            lines.append(
+                f"{medal} **{name}** - "
+                f"{content_joins}C / {_format_duration(voice_minutes)}"
+            )
+        
+        embed.description = "\n".join(lines)
+        embed.set_footer(text=_rank_footer(index, viewer_id, f"Sayfa {page + 1}/{total_pages} • C=Content"))
+        return embed, total_pages
     
-    embed.description = "\n".join(lines)
-    embed.set_footer(text="C=Content")
-    
-    await interaction.response.send_message(embed=embed)
+    embed, total_pages = render(0)
+    if total_pages > 1:
+        await interaction.response.send_message(embed=embed, view=LeaderboardView(render))
+    else:
+        await interaction.response.send_message(embed=embed)
 
 
 @bot.tree.command(name="aktivite-inaktif", description="5+ gün inaktif üyeleri listeler.", guild=discord.Object(id=GUILD_ID))
 @app_commands.default_permissions(administrator=True)
 async def aktivite_inaktif_cmd(interaction: discord.Interaction):
-    state = _load_activity_state()
+    state = await _aload_activity_state()
     guild = interaction.guild
     now = datetime.now(UTC_TZ)
     
@@ -10612,6 +13423,85 @@ ACTIVITY_SHEET_TAB = os.getenv("ACTIVITY_SHEET_TAB", "Activity Balance")
 ACTIVITY_SYNC_INTERVAL = int(os.getenv("ACTIVITY_SYNC_INTERVAL", "600"))  # 10 dakika (saniye)
 ACTIVITY_MEMBER_ROLE_ID = int(os.getenv("ACTIVITY_MEMBER_ROLE_ID", "1419663333874729121"))  # Sadece bu role sahip olanlar
 PUAN_LOG_AUTO_SYNC_INTERVAL = int(os.getenv("PUAN_LOG_AUTO_SYNC_INTERVAL", "3600"))  # 1 saat (saniye) - Puan Log auto sync
+# Harici voice tracker activity_state.json'ı yazarken dosyayı izle; değişen kullanıcıları hemen işle
+ACTIVITY_WATCH_ENABLED = os.getenv("ACTIVITY_WATCH", "1").strip() in ("1", "true", "True", "yes")
+ACTIVITY_WATCH_POLL_SECONDS = float(os.getenv("ACTIVITY_WATCH_POLL_SECONDS", "5"))  # inotify yoksa stat aralığı
+ACTIVITY_WATCH_DEBOUNCE = float(os.getenv("ACTIVITY_WATCH_DEBOUNCE", "1"))  # yazımın bitmesi için bekleme
+# Activity Balance diff yazımı: değişen satır oranı bunu aşarsa (yoğun sıralama değişimi) tam yazım
+ACTIVITY_SHEET_DIFF_MAX_RATIO = float(os.getenv("ACTIVITY_SHEET_DIFF_MAX_RATIO", "0.5"))
+# elle yapılan düzenlemeleri düzeltmek için her N sync'te bir tam yazım (0 = sadece gerektiğinde)
+ACTIVITY_SHEET_FULL_EVERY = int(os.getenv("ACTIVITY_SHEET_FULL_EVERY", "36"))
+
+class SheetTableMirror:
+    """Sheet'e en son yazılan tablonun yerel kopyası (first_row'dan başlayan satırlar, A'dan itibaren).
+    plan() yeni tabloyu kopyayla karşılaştırır ve sadece değişen hücre aralıklarını döndürür."""
+
+    def __init__(self, first_row: int = 2):
+        self.first_row = first_row
+        self.rows: Optional[List[List[Any]]] = None
+        self.syncs = 0
+        # metrics
+        self.last_mode = ""
+        self.last_cells = 0
+        self.total_cells = 0
+        self.full_writes = 0
+
+    def reset(self) -> None:
+        self.rows = None
+
+    def plan(self, rows: List[List[Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Değişen hücreler için batch_update data'sı; tam yazım gerekiyorsa None."""
+        old = self.rows
+        if old is None or (ACTIVITY_SHEET_FULL_EVERY > 0 and self.syncs % ACTIVITY_SHEET_FULL_EVERY == 0):
+            return None
+        width = max([len(r) for r in rows] + [len(r) for r in old] + [1])
+        n = max(len(rows), len(old))
+        changed_rows = 0
+        data: List[Dict[str, Any]] = []
+        for i in range(n):
+            new_r = list(rows[i]) if i < len(rows) else []
+            old_r = list(old[i]) if i < len(old) else []
+            new_r += [""] * (width - len(new_r))
+            old_r += [""] * (width - len(old_r))
+            if new_r == old_r:
+                continue
+            changed_rows += 1
+            row_no = self.first_row + i
+            if i >= len(rows):
+                # tablo kısaldı: artan satırı tek aralıkta boşalt
+                data.append({"range": f"A{row_no}:{_col_num_to_letter(width)}{row_no}", "values": [[""] * width]})
+                continue
+            # satır içindeki değişen ardışık hücreleri tek aralıkta topla
+            c = 0
+            while c < width:
+                if new_r[c] == old_r[c]:
+                    c += 1
+                    continue
+                start = c
+                while c < width and new_r[c] != old_r[c]:
+                    c += 1
+                data.append({
+                    "range": f"{_col_num_to_letter(start + 1)}{row_no}:{_col_num_to_letter(c)}{row_no}",
+                    "values": [new_r[start:c]],
+                })
+        if n and changed_rows / n > ACTIVITY_SHEET_DIFF_MAX_RATIO:
+            return None
+        return data
+
+    def commit(self, rows: List[List[Any]], mode: str, cells: int) -> None:
+        self.rows = [list(r) for r in rows]
+        self.syncs += 1
+        self.last_mode = mode
+        self.last_cells = cells
+        self.total_cells += cells
+        if mode == "full":
+            self.full_writes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"syncs": self.syncs, "last_mode": self.last_mode, "last_cells": self.last_cells,
+                "total_cells": self.total_cells, "full_writes": self.full_writes}
+
+ACTIVITY_SHEET_MIRROR = SheetTableMirror(first_row=2)
 
 async def _sync_puan_to_sheet(bot_client):
     """
@@ -10625,12 +13515,11 @@ async def _sync_puan_to_sheet(bot_client):
     
     try:
         # Voice verisini activity_state.json'dan oku
-        activity_state = _load_activity_state()
+        activity_state = await _aload_activity_state()
         activity_users = activity_state.get("users", {})
         
-        # Puan state'ini yükle ve günlük reset kontrolü yap
-        puan_state = _load_puan_state()
-        reset_done = _check_and_reset_daily(puan_state)
+        # Günlük reset kontrolü (puan store'u bellekte; disk okunmaz)
+        reset_done = PUAN_STORE.reset_daily_if_needed()
         if reset_done:
             log("[SYNC] Günlük puan reset yapıldı (TR 00:00)")
         
@@ -10675,23 +13564,24 @@ async def _sync_puan_to_sheet(bot_client):
                 # Content katılımlarını activity_state'ten oku
                 content_joins = voice_data.get("content_joins", 0) or 0
                 
-                # Puanı güncelle (voice'tan)
-                result = _update_user_points_from_voice(user_id, current_voice_minutes)
+                # Puanı güncelle (voice'tan). Dahili tracker dakikaları zaten artımlı işliyor;
+                # activity_state'teki toplam debounce nedeniyle geride olabilir, buradan işlenmez.
+                if VOICE_TRACKER_ENABLED:
+                    pu = PUAN_STORE.get(user_id) or PuanUser()
+                    current_voice_minutes += VOICE_TRACKER.unsaved.get(user_id, 0)
+                    result = {"total_points": pu.total_points, "daily_points": pu.daily_points,
+                              "daily_minutes": pu.daily_minutes_counted}
+                else:
+                    result = _update_user_points_from_voice(user_id, current_voice_minutes)
                 
                 total_points = result["total_points"]
                 daily_points = result["daily_points"]
                 daily_minutes = result["daily_minutes"]
                 
-                # Eşik kontrolü
-                threshold_check = _check_puan_thresholds(user_id)
-                
-                # Uyarı gerekiyor mu?
-                if threshold_check["needs_kick_warning"] and not threshold_check["already_kick_warned"]:
-                    warnings_to_send.append((member, "kick", total_points))
-                    _mark_user_warned(user_id, "kick")
-                elif threshold_check["needs_warning"] and not threshold_check["already_warned"]:
-                    warnings_to_send.append((member, "warning", total_points))
-                    _mark_user_warned(user_id, "warning")
+                # Eşik kontrolü - uyarı gerekiyor mu?
+                warn_type = _puan_warning_due(user_id)
+                if warn_type:
+                    warnings_to_send.append((member, warn_type, total_points))
                 
                 # Durum belirleme
                 if total_points <= PUAN_KICK_THRESHOLD:
@@ -10721,13 +13611,16 @@ async def _sync_puan_to_sheet(bot_client):
             log("[SYNC] Yazılacak satır yok.")
             return
         
-        # Puana göre sırala (yüksekten düşüğe)
-        rows.sort(key=lambda x: x[5], reverse=True)
+        # Puana göre sırala (yüksekten düşüğe; eşitlikte isim - sıra her sync'te sabit kalsın)
+        rows.sort(key=lambda x: (-x[5], str(x[1]).lower()))
         
-        # Google Sheets'e yaz
-        client = _gs_authorize_sync()
-        sheet = client.open_by_key(ACTIVITY_SHEET_ID)
-        worksheet = sheet.worksheet(ACTIVITY_SHEET_TAB)
+        # Verisi değişmeyen üyelerin "Son Güncelleme"si korunur (aksi halde her satır her sync'te değişir)
+        mirror = ACTIVITY_SHEET_MIRROR
+        prev = {r[0]: r for r in (mirror.rows or [])}
+        for r in rows:
+            p = prev.get(r[0])
+            if p is not None and p[:7] == r[:7]:
+                r[7] = p[7]
         
         # Başlıklar (Toplam Content eklendi)
         headers = [
@@ -10735,16 +13628,34 @@ async def _sync_puan_to_sheet(bot_client):
             "Toplam Voice (dk)", "Toplam Content", "Toplam Puan", "Durum", "Son Güncelleme"
         ]
         
+        async def _write():
+            # Google Sheets'e yaz: sadece değişen hücreler (tek batch), gerekirse tam yazım
+            worksheet, _ = await _gs_tab(ACTIVITY_SHEET_ID, ACTIVITY_SHEET_TAB)
+            data = mirror.plan(rows)
+            if data is None:
+                await worksheet.batch_clear(["A2:I500", "I1"])
+                await worksheet.batch_update([
+                    {"range": "A1:H1", "values": [headers]},
+                    {"range": f"A2:H{len(rows) + 1}", "values": rows},
+                ])
+                cells = len(headers) + sum(len(r) for r in rows)
+                mirror.commit(rows, "full", cells)
+                return ("full", cells, len(rows))
+            if data:
+                await worksheet.batch_update(data)
+            cells = sum(len(d["values"][0]) for d in data)
+            mirror.commit(rows, "diff", cells)
+            return ("diff", cells, len(data))
+        
         try:
-            worksheet.update(values=[headers], range_name="A1:H1")
-            worksheet.batch_clear(["A2:I500", "I1"])
-            
-            if rows:
-                cell_range = f"A2:H{len(rows) + 1}"
-                worksheet.update(values=rows, range_name=cell_range)
-            
-            log(f"[SYNC] ✅ {len(rows)} üye Sheet'e yazıldı.")
+            mode, cells, n = await _write()
+            if mode == "full":
+                log(f"[SYNC] ✅ {len(rows)} üye Sheet'e yazıldı (tam yazım, {cells} hücre).")
+            else:
+                log(f"[SYNC] ✅ {len(rows)} üye | diff: {cells} hücre / {n} aralık.")
         except Exception as e:
+            # kopya artık güvenilmez: bir sonraki sync tam yazım yapar
+            mirror.reset()
             log(f"[SYNC] Sheet yazma hatası: {e}")
         
         # Uyarıları gönder
@@ -10754,6 +13665,17 @@ async def _sync_puan_to_sheet(bot_client):
     except Exception as e:
         log(f"[SYNC] Genel hata: {e}")
 
+def _puan_warning_due(user_id: int) -> Optional[str]:
+    """Eşik aşıldıysa ve daha önce uyarılmadıysa uyarı tipini döndürür ("kick"/"warning") ve işaretler."""
+    threshold_check = _check_puan_thresholds(user_id)
+    if threshold_check["needs_kick_warning"] and not threshold_check["already_kick_warned"]:
+        _mark_user_warned(user_id, "kick")
+        return "kick"
+    if threshold_check["needs_warning"] and not threshold_check["already_warned"]:
+        _mark_user_warned(user_id, "warning")
+        return "warning"
+    return None
+
 async def _send_puan_warning(bot_client, member: discord.Member, warn_type: str, total_points: float):
     """Puan uyarısı gönderir (DM ve/veya log kanalı)."""
     try:
@@ -10782,7 +13704,7 @@ async def _send_puan_warning(bot_client, member: discord.Member, warn_type: str,
         
         # DM gönder
         try:
-            await member.send(embed=embed)
+            await out_send(member, prio=OUT_PRIO_DM, embed=embed)
             log(f"[PUAN] {warn_type.upper()} DM gönderildi: {member.display_name}")
         except Exception as e:
             log(f"[PUAN] DM gönderilemedi ({member.display_name}): {e}")
@@ -10797,7 +13719,7 @@ async def _send_puan_warning(bot_client, member: discord.Member, warn_type: str,
                         description=f"**Üye:** {member.mention}\n**Puan:** {total_points:.1f}",
                         color=color
                     )
-                    await channel.send(embed=admin_embed)
+                    await out_send(channel, prio=OUT_PRIO_LIVE, embed=admin_embed)
             except Exception as e:
                 log(f"[PUAN] Log kanalına gönderilemedi: {e}")
                 
@@ -10817,6 +13739,132 @@ async def _puan_sync_loop(bot_client):
         
         await asyncio.sleep(ACTIVITY_SYNC_INTERVAL)
 
+class ActivityFileWatcher:
+    """activity_state.json'ı izler (inotify, yoksa mtime/size kontrolü).
+    Dosya değişince sadece voice_minutes'ı değişen üyelerin puanı güncellenir ve eşikleri
+    kontrol edilir; böylece uyarılar tam sync'i (ACTIVITY_SYNC_INTERVAL) beklemez.
+    Sheet yazımı yine periyodik sync'te yapılır."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.task: Optional[asyncio.Task] = None
+        self.mode = "inotify" if INOTIFY_OK else "poll"
+        self._sig: Optional[Tuple[int, int]] = None   # (mtime_ns, size)
+        self._minutes: Dict[str, int] = {}            # son işlenen voice_minutes
+        self._wake: Optional[asyncio.Event] = None
+        self._stop = threading.Event()
+        # metrics
+        self.ingests = 0
+        self.users_updated = 0
+        self.parse_errors = 0
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _read(self) -> Dict[str, int]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            users = (json.load(f) or {}).get("users", {})
+        return {uid: int(d.get("voice_minutes", 0) or 0) for uid, d in users.items() if isinstance(d, dict)}
+
+    def _inotify_thread(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Dizin izlenir: yazıcı dosyayı rename ile değiştirse de olay kaçmaz
+        base = os.path.basename(self.path)
+        ino = INotify()
+        try:
+            ino.add_watch(os.path.dirname(os.path.abspath(self.path)),
+                          inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE)
+            while not self._stop.is_set():
+                if any(ev.name == base for ev in ino.read(timeout=1000)):
+                    loop.call_soon_threadsafe(self._wake.set)
+        except Exception as e:
+            log(f"[WATCH] inotify hatası, stat kontrolüne geçiliyor: {e}")
+            self.mode = "poll"
+            loop.call_soon_threadsafe(self._wake.set)
+        finally:
+            ino.close()
+
+    async def _wait_change(self) -> None:
+        if self.mode == "inotify":
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=60)
+            except asyncio.TimeoutError:
+                pass  # güvenlik ağı: yine de stat kontrolü yapılır
+            self._wake.clear()
+        else:
+            await asyncio.sleep(ACTIVITY_WATCH_POLL_SECONDS)
+
+    async def ingest(self, bot_client) -> int:
+        """Dosyayı okur, voice_minutes'ı değişen üyeleri puan store'una işler."""
+        try:
+            minutes = await run_io(self._read, pool="disk")
+        except Exception as e:
+            # yarım yazılmış dosya: yazıcı bitirince imza değişir ve tekrar denenir
+            self.parse_errors += 1
+            log(f"[WATCH] activity_state okunamadı: {e}")
+            return 0
+        changed = {uid: vm for uid, vm in minutes.items() if self._minutes.get(uid) != vm}
+        self._minutes = minutes
+        self.ingests += 1
+        if not changed:
+            return 0
+
+        guild = bot_client.get_guild(GUILD_ID)
+        member_role = guild.get_role(ACTIVITY_MEMBER_ROLE_ID) if guild else None
+        if not member_role:
+            return 0
+        PUAN_STORE.reset_daily_if_needed()
+        count = 0
+        for uid, vm in changed.items():
+            member = guild.get_member(int(uid)) if uid.isdigit() else None
+            if member is None or member.bot or member_role not in member.roles:
+                continue
+            result = _update_user_points_from_voice(member.id, vm)
+            count += 1
+            warn_type = _puan_warning_due(member.id)
+            if warn_type:
+                await _send_puan_warning(bot_client, member, warn_type, result["total_points"])
+        self.users_updated += count
+        if count:
+            log(f"[WATCH] activity_state değişti: {count} üyenin puanı güncellendi")
+        return count
+
+    async def run(self, bot_client) -> None:
+        await bot_client.wait_until_ready()
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._sig = self._stat()
+        try:
+            self._minutes = await run_io(self._read, pool="disk")
+        except Exception:
+            self._minutes = {}
+        if self.mode == "inotify":
+            threading.Thread(target=self._inotify_thread, args=(loop,), name="activity-watch", daemon=True).start()
+        log(f"[WATCH] activity_state izleniyor ({self.mode}): {self.path}")
+        while not bot_client.is_closed() and not self._stop.is_set():
+            await self._wait_change()
+            sig = self._stat()
+            if sig is None or sig == self._sig:
+                continue
+            await asyncio.sleep(ACTIVITY_WATCH_DEBOUNCE)
+            self._sig = self._stat()
+            try:
+                await self.ingest(bot_client)
+            except Exception as e:
+                log(f"[WATCH] Ingest hatası: {repr(e)}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "ingests": self.ingests,
+                "users_updated": self.users_updated, "parse_errors": self.parse_errors}
+
+ACTIVITY_WATCHER = ActivityFileWatcher(ACTIVITY_STATE_FILE)
+
 # Eski fonksiyon ismi için uyumluluk
 async def _sync_activity_to_sheet(bot_client):
     """Eski fonksiyon ismi - yeni sisteme yönlendirir."""
@@ -10833,18 +13881,16 @@ async def puan_cmd(interaction: discord.Interaction):
     user_id = interaction.user.id
     
     # Voice verisini activity_state'ten oku
-    activity_state = _load_activity_state()
-    voice_data = activity_state.get("users", {}).get(str(user_id), {})
-    current_voice_minutes = voice_data.get("voice_minutes", 0) or 0
+    voice_data = await _aget_activity_user(user_id) or {}
+    current_voice_minutes = (voice_data.get("voice_minutes", 0) or 0) + VOICE_TRACKER.unsaved.get(user_id, 0)
     
-    # Puan verisini puan_state'ten oku
-    puan_state = _load_puan_state()
-    _check_and_reset_daily(puan_state)  # Günlük reset kontrolü
-    user_puan = _get_user_puan_data(puan_state, user_id)
+    # Puan verisini bellekteki store'dan oku
+    PUAN_STORE.reset_daily_if_needed()  # Günlük reset kontrolü
+    user_puan = PUAN_STORE.get(user_id) or PuanUser()
     
-    total_points = user_puan.get("total_points", 0.0) or 0.0
-    daily_points = user_puan.get("daily_points", 0.0) or 0.0
-    daily_minutes = user_puan.get("daily_minutes_counted", 0) or 0
+    total_points = user_puan.total_points
+    daily_points = user_puan.daily_points
+    daily_minutes = user_puan.daily_minutes_counted
     
     # Durum belirleme
     if total_points <= PUAN_KICK_THRESHOLD:
@@ -10891,50 +13937,121 @@ async def puan_cmd(interaction: discord.Interaction):
     
     await safe_send(interaction, embed=embed, ephemeral=True)
 
+class LeaderboardView(discord.ui.View):
+    """Sayfalı sıralama (önceki/sonraki). render(page) -> (embed, toplam sayfa)."""
+
+    def __init__(self, render: Callable[[int], Tuple[discord.Embed, int]], page: int = 0):
+        super().__init__(timeout=300)
+        self.render = render
+        self.page = page
+        self._sync_buttons(render(page)[1])
+
+    def _sync_buttons(self, total_pages: int) -> None:
+        self.prev_btn.disabled = self.page <= 0
+        self.next_btn.disabled = self.page >= total_pages - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        embed, total_pages = self.render(page)
+        self.page = max(0, min(page, total_pages - 1))
+        if self.page != page:
+            embed, total_pages = self.render(self.page)
+        self._sync_buttons(total_pages)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="⬅️ Önceki", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="Sonraki ➡️", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+def _rank_footer(index: LeaderboardIndex, user_id: int, text: str) -> str:
+    rank = index.rank(user_id)
+    mine = f"Senin sıran: #{rank}/{len(index)}" if rank else "Henüz sıralamada değilsin"
+    return f"{mine} • {text}"
+
 @bot.tree.command(name="puan-top", description="En yüksek puanlı üyeleri gösterir.", guild=discord.Object(id=GUILD_ID))
-@app_commands.describe(limit="Kaç kişi gösterilsin (varsayılan: 10)")
+@app_commands.describe(limit="Sayfa başına kaç kişi gösterilsin (varsayılan: 10)")
 async def puan_top_cmd(interaction: discord.Interaction, limit: int = 10):
     await safe_defer(interaction)
     
-    puan_state = _load_puan_state()
-    activity_state = _load_activity_state()
-    
-    puan_list = []
-    for user_id_str, user_data in puan_state.get("users", {}).items():
-        total_points = user_data.get("total_points", 0.0) or 0.0
-        
-        # Voice dakikasını activity_state'ten al
-        voice_minutes = activity_state.get("users", {}).get(user_id_str, {}).get("voice_minutes", 0) or 0
-        
-        puan_list.append((int(user_id_str), total_points, voice_minutes))
-    
-    puan_list.sort(key=lambda x: x[1], reverse=True)
-    
-    embed = discord.Embed(title="🏆 Puan Sıralaması", color=0xFFD700)
-    
-    lines = []
-    for i, (user_id, puan, voice) in enumerate(puan_list[:limit], 1):
-        member = interaction.guild.get_member(user_id)
-        name = member.display_name if member else f"ID:{user_id}"
-        
-        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"**{i}.**"
-        
-        # Durum ikonu
-        if puan <= PUAN_KICK_THRESHOLD:
-            status_icon = "🔴"
-        elif puan <= PUAN_WARNING_THRESHOLD:
-            status_icon = "🟠"
-        elif puan < 0:
-            status_icon = "🟡"
-        else:
-            status_icon = "🟢"
-        
-        lines.append(f"{medal} {name} — **{puan:.1f}** puan {status_icon} (🎤{voice}dk)")
-    
-    embed.description = "\n".join(lines) if lines else "Henüz veri yok."
-    embed.set_footer(text=f"Toplam {len(puan_list)} üye • 1 puan = 2 dk voice")
+    index = PUAN_STORE._ensure().leaderboard
+    limit = max(1, min(25, limit))
+    guild = interaction.guild
+    viewer_id = interaction.user.id
+    
+    def render(page: int) -> Tuple[discord.Embed, int]:
+        total_pages = max(1, (len(index) + limit - 1) // limit)
+        page = max(0, min(page, total_pages - 1))
+        embed = discord.Embed(title="🏆 Puan Sıralaması", color=0xFFD700)
+        lines = []
+        for i, (user_id, puan) in enumerate(index.page(page * limit, limit), page * limit + 1):
+            member = guild.get_member(user_id) if guild else None
+            name = member.display_name if member else f"ID:{user_id}"
+            
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"**{i}.**"
+            
+            # Durum ikonu
+            if puan <= PUAN_KICK_THRESHOLD:
+                status_icon = "🔴"
+            elif puan <= PUAN_WARNING_THRESHOLD:
+                status_icon = "🟠"
+            elif puan < 0:
+                status_icon = "🟡"
+            else:
+                status_icon = "🟢"
+            
+            # Voice dakikası: puan store'una son işlenen değer (activity_state okunmaz)
+            u = PUAN_STORE.get(user_id)
+            voice = u.last_voice_minutes if u else 0
+            lines.append(f"{medal} {name} — **{puan:.1f}** puan {status_icon} (🎤{voice}dk)")
+        
+        embed.description = "\n".join(lines) if lines else "Henüz veri yok."
+        embed.set_footer(text=_rank_footer(index, viewer_id, f"Sayfa {page + 1}/{total_pages} • Toplam {len(index)} üye • 1 puan = 2 dk voice"))
+        return embed, total_pages
+    
+    embed, total_pages = render(0)
+    if total_pages > 1:
+        await safe_send(interaction, embed=embed, view=LeaderboardView(render))
+    else:
+        await safe_send(interaction, embed=embed)
+
+@bot.tree.command(name="puan-gecmis", description="Günlük voice / content / puan geçmişini gösterir.", guild=discord.Object(id=GUILD_ID))
+@app_commands.describe(gun="Kaç günlük geçmiş (varsayılan: 7, en fazla 90)", uye="Başka bir üyenin geçmişi (opsiyonel)")
+async def puan_gecmis_cmd(interaction: discord.Interaction, gun: int = 7, uye: Optional[discord.Member] = None):
+    await safe_defer(interaction, ephemeral=True)
     
-    await safe_send(interaction, embed=embed)
+    target = uye or interaction.user
+    gun = max(1, min(90, gun))
+    end = datetime.now(TR_TZ).date()
+    start = end - timedelta(days=gun - 1)
+    data = PUAN_HISTORY.series(target.id, start.isoformat(), end.isoformat())
+    
+    minutes, content, points = data["minutes"], data["content"], data["points"]
+    active_days = sum(1 for m in minutes if m > 0)
+    
+    # Dakikalar için mini grafik (her gün bir blok)
+    blocks = "▁▂▃▄▅▆▇█"
+    peak = max(minutes) or 1
+    spark = "".join(blocks[min(7, int(m * 7 / peak))] if m else "·" for m in minutes)
+    
+    embed = discord.Embed(title=f"📅 {target.display_name} — Son {gun} Gün", color=0x3498DB)
+    embed.add_field(name="🎤 Voice", value=f"{_format_duration(sum(minutes))}\n(günlük ort. {sum(minutes) // gun} dk)", inline=True)
+    embed.add_field(name="⚔️ Content", value=f"{sum(content)}", inline=True)
+    embed.add_field(name="⭐ Kazanılan Puan", value=f"{sum(points):.1f}", inline=True)
+    embed.add_field(name="Aktif Gün", value=f"{active_days}/{gun}", inline=True)
+    embed.add_field(name=f"Voice grafiği ({start.strftime('%d.%m')} → {end.strftime('%d.%m')})", value=f"`{spark}`", inline=False)
+    
+    if gun <= 14:
+        lines = []
+        for i in range(gun):
+            day = start + timedelta(days=i)
+            lines.append(f"`{day.strftime('%d.%m')}` 🎤 {minutes[i]} dk • ⚔️ {content[i]} • ⭐ {points[i]:.1f}")
+        embed.add_field(name="Günlük", value="\n".join(lines), inline=False)
+    
+    embed.set_footer(text="Yerel geçmiş kaydı • Sheets okunmaz")
+    await safe_send(interaction, embed=embed, ephemeral=True)
 
 @bot.tree.command(name="sync", description="Activity verilerini Google Sheet'e sync eder.", guild=discord.Object(id=GUILD_ID))
 @app_commands.default_permissions(administrator=True)
@@ -10979,15 +14096,16 @@ async def puan_sifirla_cmd(interaction: discord.Interaction, onay: str = ""):
             ephemeral=True
         )
     
-    puan_state = _load_puan_state()
-    for user_id_str in puan_state.get("users", {}):
-        puan_state["users"][user_id_str]["total_points"] = 0.0
-        puan_state["users"][user_id_str]["daily_points"] = 0.0
-        puan_state["users"][user_id_str]["daily_minutes_counted"] = 0
+    for user_data in PUAN_STORE.all_users().values():
+        user_data.total_points = 0.0
+        user_data.daily_points = 0.0
+        user_data.daily_minutes_counted = 0
     
-    puan_state["warned_users"] = []
-    puan_state["kick_warned_users"] = []
-    _save_puan_state(puan_state)
+    PUAN_STORE.warned_users.clear()
+    PUAN_STORE.kick_warned_users.clear()
+    PUAN_STORE.reindex()
+    PUAN_STORE.mark_dirty()
+    await PUAN_STORE.flush()
     
     await safe_send(interaction, "✅ Tüm puanlar sıfırlandı!", ephemeral=True)
 
@@ -10996,13 +14114,12 @@ async def puan_sifirla_cmd(interaction: discord.Interaction, onay: str = ""):
 async def puan_debug_cmd(interaction: discord.Interaction):
     await safe_defer(interaction, ephemeral=True)
     
-    puan_state = _load_puan_state()
-    activity_state = _load_activity_state()
+    activity_state = await _aload_activity_state()
     
-    user_count = len(puan_state.get("users", {}))
-    warned_count = len(puan_state.get("warned_users", []))
-    kick_warned_count = len(puan_state.get("kick_warned_users", []))
-    last_reset = puan_state.get("last_reset_date", "Hiç")
+    user_count = len(PUAN_STORE.all_users())
+    warned_count = len(PUAN_STORE.warned_users)
+    kick_warned_count = len(PUAN_STORE.kick_warned_users)
+    last_reset = PUAN_STORE.last_reset_date or "Hiç"
     today = _get_today_tr()
     
     activity_users = len(activity_state.get("users", {}))
@@ -11038,6 +14155,23 @@ async def puan_debug_cmd(interaction: discord.Interaction):
 # =========================================================
 #     FULL SYNC (Activity Balance + Content Log + Puan Log + Voice)
 # =========================================================
+async def _run_step_graph(steps: Dict[str, Tuple[Tuple[str, ...], Callable[[], Awaitable[Any]]]]) -> None:
+    """Adımları bağımlılık sırasına göre çalıştırır; bağımsız adımlar aynı anda koşar.
+    Bir adım, bağımlı olduğu adımlar bitince (başarılı ya da değil) başlar.
+    Hız sınırı adımlar arası sabit bekleme yerine SHEETS_QUOTA üzerinden uygulanır."""
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def _run(name: str) -> Any:
+        deps, factory = steps[name]
+        if deps:
+            await asyncio.gather(*(tasks[d] for d in deps), return_exceptions=True)
+        return await factory()
+
+    for name in steps:
+        tasks[name] = asyncio.create_task(_run(name))
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
 async def _run_full_sync(bot_client: discord.Client) -> Dict[str, Any]:
     """Tek seferde TÜM sync işlemlerini yapar.
     - Activity Balance güncelleme
@@ -11045,8 +14179,9 @@ async def _run_full_sync(bot_client: discord.Client) -> Dict[str, Any]:
     - Puan Log member sync
     - Bugünün (DD.MM V / DD.MM C) sütunlarını garanti oluşturur
     - Bugünün voice dakikalarını Puan Log'a yazar
-    
-    Rate limit: 60 istek/dakika - her adım arasında 30sn bekle
+
+    Rate limit: istekler SHEETS_QUOTA'dan slot alır (dakikada okuma/yazma limiti);
+    Puan Log adımları (üyeler -> sütunlar -> voice) sırayla, diğer sekmeler paralel çalışır.
     """
     out: Dict[str, Any] = {
         "activity_balance": False,
@@ -11061,61 +14196,64 @@ async def _run_full_sync(bot_client: discord.Client) -> Dict[str, Any]:
         return out
 
     # 1) Activity Balance: ana özet tabloyu güncelle
-    try:
-        await _sync_puan_to_sheet(bot_client)
-        out["activity_balance"] = True
-        log(f"[FULL SYNC] Activity Balance tamamlandı")
-    except Exception as e:
-        out["activity_balance_error"] = str(e)
-        log(f"[FULL SYNC] Activity Balance hatası: {e}")
-    
-    # Rate limit için bekle (30 saniye)
-    await asyncio.sleep(30)
+    async def _activity_balance():
+        try:
+            await _sync_puan_to_sheet(bot_client)
+            out["activity_balance"] = True
+            log(f"[FULL SYNC] Activity Balance tamamlandı")
+        except Exception as e:
+            out["activity_balance_error"] = str(e)
+            log(f"[FULL SYNC] Activity Balance hatası: {e}")
 
     # 2) Content Log: üyeleri yaz
-    try:
-        out["content_log_added"] = await _sync_members_to_content_log(bot_client)
-        log(f"[FULL SYNC] Content Log tamamlandı: +{out['content_log_added']}")
-    except Exception as e:
-        out["content_log_error"] = str(e)
-        log(f"[FULL SYNC] Content Log hatası: {e}")
-    
-    # Rate limit için bekle (30 saniye)
-    await asyncio.sleep(30)
+    async def _content_log():
+        try:
+            out["content_log_added"] = await _sync_members_to_content_log(bot_client)
+            log(f"[FULL SYNC] Content Log tamamlandı: +{out['content_log_added']}")
+        except Exception as e:
+            out["content_log_error"] = str(e)
+            log(f"[FULL SYNC] Content Log hatası: {e}")
 
     # 3) Puan Log: üyeleri ekle
-    try:
-        out["puan_log_added"] = await _sync_members_to_puan_log(bot_client)
-        log(f"[FULL SYNC] Puan Log üyeler tamamlandı: +{out['puan_log_added']}")
-    except Exception as e:
-        out["puan_log_error"] = str(e)
-        log(f"[FULL SYNC] Puan Log üyeler hatası: {e}")
-    
-    # Rate limit için bekle (30 saniye)
-    await asyncio.sleep(30)
+    async def _puan_members():
+        try:
+            out["puan_log_added"] = await _sync_members_to_puan_log(bot_client)
+            log(f"[FULL SYNC] Puan Log üyeler tamamlandı: +{out['puan_log_added']}")
+        except Exception as e:
+            out["puan_log_error"] = str(e)
+            log(f"[FULL SYNC] Puan Log üyeler hatası: {e}")
 
     # 4) Bugünün sütunlarını oluştur (V/C header)
-    try:
-        def _ensure_cols():
-            ws = _get_puan_log_worksheet()
-            _find_or_create_daily_columns(ws, out["today"])
-            return True
-        await run_io(_ensure_cols)
-        log(f"[FULL SYNC] Günlük sütunlar oluşturuldu: {out['today']}")
-    except Exception as e:
-        out["cols_error"] = str(e)
-        log(f"[FULL SYNC] Sütun oluşturma hatası: {e}")
-    
-    # Rate limit için bekle (30 saniye)
-    await asyncio.sleep(30)
+    async def _daily_cols():
+        try:
+            ws = await _get_puan_log_worksheet()
+            await _find_or_create_daily_columns(ws, out["today"])
+            log(f"[FULL SYNC] Günlük sütunlar oluşturuldu: {out['today']}")
+        except Exception as e:
+            out["cols_error"] = str(e)
+            log(f"[FULL SYNC] Sütun oluşturma hatası: {e}")
 
-    # 5) Voice dakikalarını yaz
-    try:
-        out["voice_written"] = await _write_daily_voice_to_puan_log(bot_client)
-        log(f"[FULL SYNC] Voice dakikaları yazıldı: {out['voice_written']} üye")
-    except Exception as e:
-        out["voice_error"] = str(e)
-        log(f"[FULL SYNC] Voice yazma hatası: {e}")
+    # 5) Voice dakikalarını yaz (üye satırları + bugünün sütunları hazır olmalı)
+    async def _voice():
+        try:
+            out["voice_written"] = await _write_daily_voice_to_puan_log(bot_client)
+            log(f"[FULL SYNC] Voice dakikaları yazıldı: {out['voice_written']} üye")
+        except Exception as e:
+            out["voice_error"] = str(e)
+            log(f"[FULL SYNC] Voice yazma hatası: {e}")
+
+    t0 = time.monotonic()
+    await _run_step_graph({
+        "activity_balance": ((), _activity_balance),
+        "content_log": ((), _content_log),
+        "puan_members": ((), _puan_members),
+        # aynı Puan Log sekmesi: sekme oluşturma/satır ekleme ile sütun ekleme çakışmasın
+        "daily_cols": (("puan_members",), _daily_cols),
+        "voice": (("daily_cols",), _voice),
+    })
+    out["elapsed_s"] = round(time.monotonic() - t0, 1)
+    q = SHEETS_QUOTA.stats()
+    log(f"[FULL SYNC] Bitti: {out['elapsed_s']}s | kota bekleme R:{q['waited_s']['read']}s W:{q['waited_s']['write']}s | 429:{q['throttled']}")
 
     return out
 
@@ -11156,13 +14294,13 @@ async def _puan_log_auto_sync_loop(bot_client: discord.Client) -> None:
                 pass
 
 
-@bot.tree.command(name="fullsync", description="Tek komutla Activity Balance + Content Log + Puan Log + Voice sync (~2.5 dk).", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="fullsync", description="Tek komutla Activity Balance + Content Log + Puan Log + Voice sync.", guild=discord.Object(id=GUILD_ID))
 @app_commands.default_permissions(administrator=True)
 async def sync_all_cmd(interaction: discord.Interaction):
     await safe_defer(interaction, ephemeral=True)
     
     # Başlangıç mesajı
-    await safe_send(interaction, "⏳ Full sync başlatıldı... Bu işlem ~2.5 dakika sürebilir (rate limit nedeniyle).", ephemeral=True)
+    await safe_send(interaction, "⏳ Full sync başlatıldı... (Sheets kotasına göre birkaç saniye - 1 dk sürebilir)", ephemeral=True)
     
     try:
         res = await _run_full_sync(interaction.client)
@@ -11175,6 +14313,7 @@ async def sync_all_cmd(interaction: discord.Interaction):
             f"📋 Content Log: **+{res.get('content_log_added',0)}** üye\n"
             f"📊 Puan Log (üyeler): **+{res.get('puan_log_added',0)}** yeni\n"
             f"🎤 Voice yazıldı: **{res.get('voice_written',0)}** üye\n"
+            f"⏱️ Süre: **{res.get('elapsed_s',0)}** sn\n"
         )
         # varsa hata detaylarını ekle
         errs = []
@@ -11362,6 +14501,10 @@ class LootSession:
 def _save_loot_sessions():
     try:
         data = {str(k): v.to_dict() for k, v in LOOT_SESSIONS.items()}
+        db = _state_db_for("loot_sessions")
+        if db is not None:
+            db.save("loot_sessions", data)
+            return
         with open(LOOT_SESSIONS_FILE, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     except Exception as e:
@@ -11371,9 +14514,13 @@ def _save_loot_sessions():
 def _load_loot_sessions():
     global LOOT_SESSIONS
     try:
-        if os.path.exists(LOOT_SESSIONS_FILE):
-            with open(LOOT_SESSIONS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
+        db = _state_db_for("loot_sessions")
+        if db is not None or os.path.exists(LOOT_SESSIONS_FILE):
+            if db is not None:
+                data = db.load("loot_sessions", LOOT_SESSIONS_FILE) or {}
+            else:
+                with open(LOOT_SESSIONS_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
             LOOT_SESSIONS = {int(k): LootSession.from_dict(v) for k, v in data.items()}
             log(f"[LOOT] {len(LOOT_SESSIONS)} session yüklendi")
     except Exception as e:
@@ -11449,103 +14596,54 @@ async def _find_or_create_loot_columns(content_name: str, content_date: str, con
     Find or create content columns. Content name merged across both columns.
     Returns: (loot_col, tick_col)
     """
-    def _do():
-        ws = _get_content_log_worksheet()
-        content_lower = content_name.strip().lower()
-        
-        row1 = ws.row_values(1)
-        
-        # Search existing - each content spans 2 columns starting from B
-        col_idx = 1  # B column (0-indexed)
-        while col_idx < len(row1):
-            val = (row1[col_idx] or "").strip().lower()
-            if val == content_lower:
-                loot_col = col_idx + 1
-                tick_col = col_idx + 2
-                return (loot_col, tick_col)
-            col_idx += 2
-        
-        # Create new - find first empty pair
-        next_col = 2  # B column (1-indexed)
-        col_idx = 1
-        while col_idx < len(row1):
-            if not (row1[col_idx] or "").strip():
-                next_col = col_idx + 1
-                break
-            col_idx += 2
-        else:
-            next_col = len(row1) + 1
-            if next_col % 2 == 1:
-                next_col += 1
-        
-        loot_col = next_col
-        tick_col = next_col + 1
-        
-        loot_letter = _col_num_to_letter(loot_col)
-        tick_letter = _col_num_to_letter(tick_col)
-        
-        # Merge header cells and write content name
-        ws.merge_cells(f"{loot_letter}1:{tick_letter}1")
-        ws.update_acell(f"{loot_letter}1", content_name)
-        
-        # Write date to loot column only
-        ws.update_acell(f"{loot_letter}2", content_date)
-        
-        # Write time to loot column row 3 if provided
-        if content_time:
-            ws.update_acell(f"{loot_letter}3", content_time)
-        
-        log(f"[LOOT] Sütunlar oluşturuldu: {content_name} @ {loot_letter}:{tick_letter}")
+    ws = await _get_content_log_worksheet()
+    
+    # Search existing (layout index) - each content spans 2 columns starting from B.
+    # New block: merge + name + date (+ time) in a single batchUpdate
+    loot_col, created = await _find_or_create_header_block(ws, 2, content_name, [
+        [content_name, None],
+        [content_date, None],
+        [content_time or None, None],
+    ])
+    tick_col = loot_col + 1
+    if not created:
         return (loot_col, tick_col)
     
-    return await run_io(_do)
+    loot_letter = _col_num_to_letter(loot_col)
+    tick_letter = _col_num_to_letter(tick_col)
+    log(f"[LOOT] Sütunlar oluşturuldu: {content_name} @ {loot_letter}:{tick_letter}")
+    return (loot_col, tick_col)
 
 
 async def _write_loot_to_sheet(loot_col: int, participant_data: List[Tuple[str, int]]) -> int:
     """Write loot amounts for participants. Returns count updated."""
-    def _do():
-        ws = _get_content_log_worksheet()
-        col_letter = _col_num_to_letter(loot_col)
-        col_a = ws.col_values(1)
-        
-        updates = []
-        for display_name, loot_amount in participant_data:
-            name_lower = display_name.strip().lower()
-            for row_idx, cell_val in enumerate(col_a):
-                if row_idx < 3:
-                    continue
-                cell_lower = (cell_val or "").strip().lower()
-                if name_lower in cell_lower or cell_lower in name_lower:
-                    updates.append({"range": f"{col_letter}{row_idx + 1}", "values": [[loot_amount]]})
-                    break
-        
-        if updates:
-            ws.batch_update(updates)
-        log(f"[LOOT] {len(updates)} satıra loot yazıldı @ {col_letter}")
-        return len(updates)
+    ws = await _get_content_log_worksheet()
+    col_letter = _col_num_to_letter(loot_col)
+    index, _ = await _member_row_index(ws, CONTENT_LOG_MEMBER_START_ROW, with_ign=False)
     
-    return await run_io(_do)
+    updates = []
+    for display_name, loot_amount in participant_data:
+        row = index.find(display_name)
+        if row is not None:
+            updates.append({"range": f"{col_letter}{row}", "values": [[loot_amount]]})
+    
+    if updates:
+        await ws.batch_update(updates)
+    log(f"[LOOT] {len(updates)} satıra loot yazıldı @ {col_letter}")
+    return len(updates)
 
 
 async def _write_tick_to_sheet(tick_col: int, display_name: str):
     """Write ✅ tick when user claims loot."""
-    def _do():
-        ws = _get_content_log_worksheet()
-        col_letter = _col_num_to_letter(tick_col)
-        col_a = ws.col_values(1)
-        
-        name_lower = display_name.strip().lower()
-        for row_idx, cell_val in enumerate(col_a):
-            if row_idx < 3:
-                continue
-            cell_lower = (cell_val or "").strip().lower()
-            if name_lower in cell_lower or cell_lower in name_lower:
-                ws.update_acell(f"{col_letter}{row_idx + 1}", "✅")
-                log(f"[LOOT] Tick: {display_name} @ {col_letter}{row_idx + 1}")
-                return True
+    ws = await _get_content_log_worksheet()
+    index, _ = await _member_row_index(ws, CONTENT_LOG_MEMBER_START_ROW, with_ign=False)
+    row = index.find(display_name)
+    if row is None:
         return False
-    
-    return await run_io(_do)
+    # tick'ler write-behind buffer'dan geçer (art arda claim'ler tek batchUpdate)
+    await gs_update_cell(_make_sheet_ref(ACTIVITY_SHEET_ID, CONTENT_LOG_TAB_NAME), row, tick_col, "✅")
+    log(f"[LOOT] Tick: {display_name} @ {_col_num_to_letter(tick_col)}{row}")
+    return True
 
 
 # =========================================================
@@ -11825,4 +14923,39 @@ async def loot_cmd(interaction: discord.Interaction):
         await safe_send(interaction, f"❌ Modal açılamadı: {e}", ephemeral=True)
 
 
-bot.run(TOKEN)
+def migrate_state_to_sqlite(db_path: str = STATE_DB_FILE) -> int:
+    """JSON state dosyalarını SQLite'a aktarır (python bot.py migrate-state).
+    JSON dosyalarına dokunulmaz; STATE_BACKEND=json ile geri dönülebilir."""
+    sources = [
+        ("puan", PUAN_STATE_FILE, None),
+        ("activity", ACTIVITY_STATE_FILE, None),
+        ("tickets", TICKET_STATE_FILE, None),
+        ("loot_sessions", LOOT_SESSIONS_FILE, None),
+        ("player_links", str(_LINKS_FILE), "discord_id"),
+        ("sheet_events", SHEET_EVENTS_FILE, None),
+        ("killbot", KILLBOT_STATE_FILE, None),
+        ("battleboard", BATTLEBOARD_STATE_FILE, None),
+    ]
+    db = STATE_DB if STATE_DB is not None and STATE_DB.path == db_path else StateDB(db_path)
+    count = 0
+    try:
+        for table, path, list_key in sources:
+            try:
+                if db.import_json(table, path, list_key=list_key, force=True):
+                    count += 1
+                else:
+                    print(f"[STATE] {table}: {path} bulunamadı, atlandı")
+            except Exception as e:
+                print(f"[STATE] {table} aktarım hatası: {e}")
+        st = db.stats()
+        print(f"[STATE] {count} alt sistem aktarıldı, {st['rows_written']} satır yazıldı -> {db_path}")
+    finally:
+        db.close()
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate-state":
+        migrate_state_to_sqlite(sys.argv[2] if len(sys.argv) > 2 else STATE_DB_FILE)
+    else:
+        bot.run(TOKEN)
@@ -0,0 +1,610 @@
+"""
+sheets_fake.py  —  Yerel sahte Google Sheets v4 sunucusu + Sheets benchmark'ları
+==============================================================================
+Botun kullandığı Sheets v4 REST alt kümesini bellek içinde taklit eder:
+  - values get / batchGet / update (PUT) / batchUpdate / append / batchClear
+  - spreadsheets get (metadata) / spreadsheets.batchUpdate (mergeCells, updateCells, addSheet)
+  - Drive files.get (modifiedTime) ve OAuth token endpoint'i
+Ayarlanabilir gecikme ve dakika başı okuma/yazma kotası (aşılınca 429 RESOURCE_EXHAUSTED).
+
+Kullanım:
+  python sheets_fake.py serve [--port 8089] [--latency-ms 80] [--read-per-min 60] [--write-per-min 60]
+      -> bot'u şu env'lerle başlat:
+         SHEETS_API_BASE=http://127.0.0.1:8089/v4
+         DRIVE_API_BASE=http://127.0.0.1:8089/drive/v3
+         GOOGLE_TOKEN_URI=http://127.0.0.1:8089/token
+         (service account JSON'daki token_uri de aynı adresi göstermeli; bench bunu kendisi üretir)
+  python sheets_fake.py bench [--members 120] [--latency-ms 80] [--storm 30]
+      -> /fullsync, content kapatma ve 30 kişilik sheet-event join fırtınası için
+         API çağrı sayısı + süre ölçer. bot.py'yi import eder (discord.py, gspread,
+         google-auth gerekir), state dosyaları geçici dizine yönlendirilir.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import deque
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+
+# =========================================================
+#                       A1 NOTASYONU
+# =========================================================
+_CELL_RE = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def _col_to_num(letters: str) -> int:
+    n = 0
+    for ch in letters.upper():
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+
+def _num_to_col(n: int) -> str:
+    out = ""
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        out = chr(65 + r) + out
+    return out
+
+
+def _split_tab(a1: str) -> Tuple[Optional[str], str]:
+    """"'Puan Log'!A1:B2" -> ("Puan Log", "A1:B2"); tab yoksa (None, a1)."""
+    a1 = a1.strip()
+    if a1.startswith("'"):
+        i, name = 1, ""
+        while i < len(a1):
+            if a1[i] == "'":
+                if i + 1 < len(a1) and a1[i + 1] == "'":
+                    name += "'"
+                    i += 2
+                    continue
+                break
+            name += a1[i]
+            i += 1
+        rest = a1[i + 1:]
+        return name, rest[1:] if rest.startswith("!") else ""
+    if "!" in a1:
+        tab, rng = a1.rsplit("!", 1)
+        return tab, rng
+    return None, a1
+
+
+class FakeSheet:
+    """Tek worksheet: seyrek hücre map'i (0-indexed (row, col) -> değer)."""
+
+    def __init__(self, gid: int, title: str, index: int, rows: int = 1000, cols: int = 26):
+        self.gid = gid
+        self.title = title
+        self.index = index
+        self.rows = rows
+        self.cols = cols
+        self.cells: Dict[Tuple[int, int], Any] = {}
+        self.merges: List[Dict[str, int]] = []
+
+    def props(self) -> Dict[str, Any]:
+        return {"sheetId": self.gid, "title": self.title, "index": self.index, "sheetType": "GRID",
+                "gridProperties": {"rowCount": self.rows, "columnCount": self.cols}}
+
+    def bounds(self, rng: str) -> Tuple[int, int, int, int]:
+        """A1 aralığı -> (r0, c0, r1, c1) 0-indexed, uçlar dahil."""
+        if not rng:
+            return 0, 0, self.rows - 1, self.cols - 1
+        a, _, b = rng.partition(":")
+        ma, mb = _CELL_RE.match(a.strip()), _CELL_RE.match((b or a).strip())
+        if not ma or not mb:
+            raise ValueError(f"Unable to parse range: {rng}")
+        c0 = _col_to_num(ma.group(1)) - 1 if ma.group(1) else 0
+        r0 = int(ma.group(2)) - 1 if ma.group(2) else 0
+        c1 = _col_to_num(mb.group(1)) - 1 if mb.group(1) else self.cols - 1
+        r1 = int(mb.group(2)) - 1 if mb.group(2) else self.rows - 1
+        return r0, c0, r1, c1
+
+    def ensure(self, r: int, c: int) -> None:
+        self.rows = max(self.rows, r + 1)
+        self.cols = max(self.cols, c + 1)
+
+    def set(self, r: int, c: int, v: Any) -> None:
+        self.ensure(r, c)
+        if v is None or v == "":
+            self.cells.pop((r, c), None)
+        else:
+            self.cells[(r, c)] = v
+
+    @staticmethod
+    def _fmt(v: Any) -> str:
+        if isinstance(v, bool):
+            return "TRUE" if v else "FALSE"
+        if isinstance(v, float) and v.is_integer():
+            return str(int(v))
+        return str(v)
+
+    def read(self, rng: str, major: str = "ROWS") -> List[List[str]]:
+        r0, c0, r1, c1 = self.bounds(rng)
+        r1, c1 = min(r1, self.rows - 1), min(c1, self.cols - 1)
+        used = [(r, c) for (r, c) in self.cells if r0 <= r <= r1 and c0 <= c <= c1]
+        if not used:
+            return []
+        if major == "COLUMNS":
+            last_c = max(c for _, c in used)
+            out = []
+            for c in range(c0, last_c + 1):
+                col = [self._fmt(self.cells.get((r, c), "")) for r in range(r0, r1 + 1)]
+                while col and col[-1] == "":
+                    col.pop()
+                out.append(col)
+            return out
+        last_r = max(r for r, _ in used)
+        out = []
+        for r in range(r0, last_r + 1):
+            row = [self._fmt(self.cells.get((r, c), "")) for c in range(c0, c1 + 1)]
+            while row and row[-1] == "":
+                row.pop()
+            out.append(row)
+        return out
+
+    def write(self, rng: str, values: List[List[Any]], major: str = "ROWS") -> int:
+        r0, c0, _, _ = self.bounds(rng)
+        n = 0
+        for i, row in enumerate(values or []):
+            for j, v in enumerate(row or []):
+                r, c = (r0 + i, c0 + j) if major != "COLUMNS" else (r0 + j, c0 + i)
+                self.set(r, c, v)
+                n += 1
+        return n
+
+    def clear(self, rng: str) -> None:
+        r0, c0, r1, c1 = self.bounds(rng)
+        for key in [k for k in self.cells if r0 <= k[0] <= r1 and c0 <= k[1] <= c1]:
+            del self.cells[key]
+
+
+class FakeSpreadsheet:
+    def __init__(self, sid: str, title: str = "Fake"):
+        self.sid = sid
+        self.title = title
+        self.sheets: List[FakeSheet] = []
+        self.modified = time.time()
+        self._next_gid = 0
+
+    def add(self, title: str, rows: int = 1000, cols: int = 26) -> FakeSheet:
+        ws = FakeSheet(self._next_gid, title, len(self.sheets), rows, cols)
+        self._next_gid += 1
+        self.sheets.append(ws)
+        return ws
+
+    def by_title(self, title: Optional[str]) -> FakeSheet:
+        if title is None:
+            return self.sheets[0]
+        for ws in self.sheets:
+            if ws.title == title:
+                return ws
+        raise KeyError(title)
+
+    def by_gid(self, gid: int) -> FakeSheet:
+        for ws in self.sheets:
+            if ws.gid == int(gid):
+                return ws
+        raise KeyError(gid)
+
+    def resolve(self, a1: str) -> Tuple[FakeSheet, str]:
+        tab, rng = _split_tab(a1)
+        return self.by_title(tab), rng
+
+    def touch(self) -> None:
+        self.modified = time.time()
+
+
+# =========================================================
+#                       FAKE SERVER
+# =========================================================
+class FakeSheetsServer:
+    """aiohttp tabanlı Sheets v4 taklidi. stats: işlem türü başına çağrı sayısı."""
+
+    def __init__(self, *, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 read_per_min: int = 0, write_per_min: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.limits = {"read": read_per_min, "write": write_per_min}  # 0 = limitsiz
+        self.spreadsheets: Dict[str, FakeSpreadsheet] = {}
+        self._window: Dict[str, deque] = {"read": deque(), "write": deque()}
+        self.stats: Dict[str, int] = {}
+        self.runner: Optional[web.AppRunner] = None
+        self.port = 0
+
+    # ---- veri ----
+    def spreadsheet(self, sid: str, title: str = "Fake") -> FakeSpreadsheet:
+        if sid not in self.spreadsheets:
+            self.spreadsheets[sid] = FakeSpreadsheet(sid, title)
+        return self.spreadsheets[sid]
+
+    def reset_stats(self) -> None:
+        self.stats = {}
+
+    def _count(self, op: str) -> None:
+        self.stats[op] = self.stats.get(op, 0) + 1
+        kind = "read" if op.startswith("GET ") else "write"
+        self.stats[f"total_{kind}"] = self.stats.get(f"total_{kind}", 0) + 1
+
+    def _quota_ok(self, kind: str) -> bool:
+        limit = self.limits.get(kind) or 0
+        if limit <= 0:
+            return True
+        now = time.monotonic()
+        q = self._window[kind]
+        while q and now - q[0] >= 60.0:
+            q.popleft()
+        if len(q) >= limit:
+            return False
+        q.append(now)
+        return True
+
+    @staticmethod
+    def _error(status: int, msg: str, reason: str) -> web.Response:
+        return web.json_response({"error": {"code": status, "message": msg, "status": reason}}, status=status)
+
+    # ---- HTTP ----
+    async def _handle(self, request: web.Request) -> web.Response:
+        segs = [urllib.parse.unquote(p) for p in request.raw_path.split("?", 1)[0].split("/") if p]
+        method = request.method.upper()
+        body: Dict[str, Any] = {}
+        if request.can_read_body:
+            raw = await request.read()
+            if raw:
+                ctype = request.headers.get("Content-Type", "")
+                if "json" in ctype:
+                    body = json.loads(raw.decode("utf-8"))
+                else:
+                    body = dict(urllib.parse.parse_qsl(raw.decode("utf-8")))
+
+        if segs == ["token"]:
+            self._count("POST token")
+            return web.json_response({"access_token": f"fake-{random.getrandbits(48):x}", "expires_in": 3600, "token_type": "Bearer"})
+        if segs == ["__stats"]:
+            return web.json_response(self.stats)
+        if segs == ["__reset"]:
+            self.reset_stats()
+            return web.json_response({})
+
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000.0)
+
+        try:
+            if segs[:3] == ["drive", "v3", "files"] and len(segs) == 4:
+                op = "GET drive.files"
+                ss = self.spreadsheets.get(segs[3])
+                if ss is None:
+                    return self._error(404, "File not found", "NOT_FOUND")
+                if not self._quota_ok("read"):
+                    return self._error(429, "Quota exceeded", "RESOURCE_EXHAUSTED")
+                self._count(op)
+                ts = datetime.fromtimestamp(ss.modified, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+                return web.json_response({"modifiedTime": ts})
+
+            if len(segs) < 3 or segs[:2] != ["v4", "spreadsheets"]:
+                return self._error(404, "Not found", "NOT_FOUND")
+            sid, _, action = segs[2].partition(":")
+            ss = self.spreadsheets.get(sid)
+            if ss is None:
+                return self._error(404, f"Requested entity was not found: {sid}", "NOT_FOUND")
+            rest = segs[3:]
+            kind = "read" if method == "GET" else "write"
+            if not self._quota_ok(kind):
+                return self._error(429, f"Quota exceeded for quota metric '{kind.title()} requests'", "RESOURCE_EXHAUSTED")
+            return self._dispatch(ss, method, action, rest, request.query, body)
+        except KeyError as e:
+            return self._error(400, f"Unable to parse range: {e}", "INVALID_ARGUMENT")
+        except ValueError as e:
+            return self._error(400, str(e), "INVALID_ARGUMENT")
+
+    def _dispatch(self, ss: FakeSpreadsheet, method: str, action: str, rest: List[str], query, body: Dict[str, Any]) -> web.Response:
+        # spreadsheets.get / spreadsheets.batchUpdate
+        if not rest:
+            if method == "GET" and not action:
+                self._count("GET spreadsheets.get")
+                return web.json_response({"spreadsheetId": ss.sid, "properties": {"title": ss.title},
+                                          "sheets": [{"properties": ws.props(), "merges": [dict(m, sheetId=ws.gid) for m in ws.merges]} for ws in ss.sheets]})
+            if method == "POST" and action == "batchUpdate":
+                self._count("POST spreadsheets.batchUpdate")
+                replies = [self._apply_request(ss, r) for r in body.get("requests") or []]
+                ss.touch()
+                return web.json_response({"spreadsheetId": ss.sid, "replies": replies})
+            return self._error(404, "Not found", "NOT_FOUND")
+
+        head, _, vaction = rest[0].partition(":")
+        if head != "values":
+            return self._error(404, "Not found", "NOT_FOUND")
+        major = query.get("majorDimension", "ROWS")
+
+        if len(rest) == 1:
+            if method == "GET" and vaction == "batchGet":
+                self._count("GET values.batchGet")
+                out = []
+                for a1 in query.getall("ranges", []):
+                    ws, rng = ss.resolve(a1)
+                    out.append({"range": a1, "majorDimension": major, "values": ws.read(rng, major)})
+                return web.json_response({"spreadsheetId": ss.sid, "valueRanges": out})
+            if method == "POST" and vaction == "batchUpdate":
+                self._count("POST values.batchUpdate")
+                cells = 0
+                for d in body.get("data") or []:
+                    ws, rng = ss.resolve(d.get("range", ""))
+                    cells += ws.write(rng, d.get("values") or [], d.get("majorDimension", "ROWS"))
+                ss.touch()
+                self.stats["cells_written"] = self.stats.get("cells_written", 0) + cells
+                return web.json_response({"spreadsheetId": ss.sid, "totalUpdatedCells": cells})
+            if method == "POST" and vaction == "batchClear":
+                self._count("POST values.batchClear")
+                for a1 in body.get("ranges") or []:
+                    ws, rng = ss.resolve(a1)
+                    ws.clear(rng)
+                ss.touch()
+                return web.json_response({"spreadsheetId": ss.sid, "clearedRanges": body.get("ranges") or []})
+            return self._error(404, "Not found", "NOT_FOUND")
+
+        # values/{range}[:append|:clear]
+        a1, _, raction = rest[1].rpartition(":") if rest[1].endswith((":append", ":clear")) else (rest[1], "", "")
+        ws, rng = ss.resolve(a1)
+        if method == "GET":
+            self._count("GET values.get")
+            return web.json_response({"range": a1, "majorDimension": major, "values": ws.read(rng, major)})
+        if method == "PUT":
+            self._count("PUT values.update")
+            cells = ws.write(rng, body.get("values") or [], body.get("majorDimension", "ROWS"))
+            ss.touch()
+            self.stats["cells_written"] = self.stats.get("cells_written", 0) + cells
+            return web.json_response({"spreadsheetId": ss.sid, "updatedRange": a1, "updatedCells": cells})
+        if method == "POST" and raction == "append":
+            self._count("POST values.append")
+            r0, c0, _, _ = ws.bounds(rng)
+            last = max([r for (r, c) in ws.cells if c >= c0] + [r0 - 1])
+            start = f"{_num_to_col(c0 + 1)}{last + 2}"
+            cells = ws.write(start, body.get("values") or [])
+            ss.touch()
+            self.stats["cells_written"] = self.stats.get("cells_written", 0) + cells
+            return web.json_response({"spreadsheetId": ss.sid, "updates": {"updatedRange": f"{ws.title}!{start}", "updatedCells": cells}})
+        if method == "POST" and raction == "clear":
+            self._count("POST values.clear")
+            ws.clear(rng)
+            ss.touch()
+            return web.json_response({"spreadsheetId": ss.sid, "clearedRange": a1})
+        return self._error(404, "Not found", "NOT_FOUND")
+
+    def _apply_request(self, ss: FakeSpreadsheet, req: Dict[str, Any]) -> Dict[str, Any]:
+        if "addSheet" in req:
+            p = (req["addSheet"] or {}).get("properties") or {}
+            grid = p.get("gridProperties") or {}
+            ws = ss.add(p.get("title") or f"Sheet{len(ss.sheets) + 1}", int(grid.get("rowCount", 1000)), int(grid.get("columnCount", 26)))
+            return {"addSheet": {"properties": ws.props()}}
+        if "mergeCells" in req:
+            rg = req["mergeCells"]["range"]
+            ws = ss.by_gid(rg.get("sheetId", 0))
+            ws.merges.append({k: int(rg.get(k, 0)) for k in ("startRowIndex", "endRowIndex", "startColumnIndex", "endColumnIndex")})
+            self.stats["merges"] = self.stats.get("merges", 0) + 1
+            return {}
+        if "updateCells" in req:
+            uc = req["updateCells"]
+            if "start" in uc:
+                ws = ss.by_gid(uc["start"].get("sheetId", 0))
+                r0, c0 = int(uc["start"].get("rowIndex", 0)), int(uc["start"].get("columnIndex", 0))
+            else:
+                ws = ss.by_gid(uc["range"].get("sheetId", 0))
+                r0, c0 = int(uc["range"].get("startRowIndex", 0)), int(uc["range"].get("startColumnIndex", 0))
+            for i, row in enumerate(uc.get("rows") or []):
+                for j, cell in enumerate(row.get("values") or []):
+                    uev = cell.get("userEnteredValue") or {}
+                    v = next(iter(uev.values()), "") if uev else ""
+                    ws.set(r0 + i, c0 + j, v)
+                    self.stats["cells_written"] = self.stats.get("cells_written", 0) + 1
+            return {}
+        if "appendDimension" in req or "updateSheetProperties" in req or "repeatCell" in req:
+            return {}
+        raise ValueError(f"Unsupported request: {list(req)}")
+
+    # ---- yaşam döngüsü ----
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}"
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+# =========================================================
+#                       BENCHMARK
+# =========================================================
+def _fake_service_account(token_uri: str) -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode("ascii")
+    return json.dumps({
+        "type": "service_account", "project_id": "fake", "private_key_id": "fake",
+        "private_key": pem, "client_email": "bench@fake.iam.gserviceaccount.com",
+        "client_id": "0", "token_uri": token_uri,
+    })
+
+
+def _seed(server: FakeSheetsServer, sheet_id: str, tabs: Dict[str, str], members: List[str], storm_tab: str, storm_roles: int) -> None:
+    ss = server.spreadsheet(sheet_id, "Bench")
+    ss.add(tabs["activity"], 500, 9)
+    content = ss.add(tabs["content"], 500, 100)
+    content.write("A3", [["Content"]])
+    content.write("A4", [[m] for m in sorted(members, key=str.lower)])
+    puan = ss.add(tabs["puan"], 500, 200)
+    puan.write("A1", [["Üye", "IGN", "Toplam"]])
+    comp = ss.add(storm_tab, 200, 6)
+    comp.write("A1", [["Role", "Weapon", "Nick"]] + [[f"Role{i:02d}", f"W{i % 7}", ""] for i in range(storm_roles)])
+
+
+class _Role:
+    def __init__(self, rid: int):
+        self.id = rid
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+def _fake_guild(n: int, role_id: int) -> SimpleNamespace:
+    role = _Role(role_id)
+    members = [SimpleNamespace(id=10_000 + i, display_name=f"Member{i:03d}", name=f"member{i:03d}",
+                               bot=False, roles=[role], mention=f"<@{10_000 + i}>") for i in range(n)]
+    guild = SimpleNamespace(id=1, members=members, get_role=lambda rid: role if rid == role_id else None,
+                            get_member=lambda uid: next((m for m in members if m.id == uid), None))
+    return guild
+
+
+async def _measure(server: FakeSheetsServer, label: str, coro) -> Dict[str, Any]:
+    server.reset_stats()
+    t0 = time.perf_counter()
+    err = ""
+    try:
+        await coro
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+    dt = time.perf_counter() - t0
+    st = dict(server.stats)
+    calls = st.get("total_read", 0) + st.get("total_write", 0)
+    print(f"{label:<34} {dt:8.2f}s  calls={calls:<4} read={st.get('total_read', 0):<4} write={st.get('total_write', 0):<4} "
+          f"cells={st.get('cells_written', 0)}" + (f"  HATA: {err}" if err else ""))
+    ops = {k: v for k, v in st.items() if " " in k and k != "POST token"}
+    print("    " + ", ".join(f"{k}={v}" for k, v in sorted(ops.items())))
+    return {"label": label, "seconds": round(dt, 3), "stats": st, "error": err}
+
+
+async def run_bench(args) -> List[Dict[str, Any]]:
+    server = FakeSheetsServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              read_per_min=args.read_per_min, write_per_min=args.write_per_min)
+    base = await server.start(port=args.port)
+    tmp = tempfile.mkdtemp(prefix="sheets_bench_")
+    sheet_id = "bench-sheet-0000000000000000000000"  # _split_sheet_ref en az 20 karakter bekler
+    tabs = {"activity": "Activity Balance", "content": "Content Log", "puan": "Puan Log"}
+    storm_tab = "Bench Comp"
+    role_id = 4242
+
+    os.environ.update({
+        "DISCORD_TOKEN": os.environ.get("DISCORD_TOKEN") or "bench", "GUILD_ID": os.environ.get("GUILD_ID") or "1",
+        "SHEETS_API_BASE": f"{base}/v4", "DRIVE_API_BASE": f"{base}/drive/v3", "GOOGLE_TOKEN_URI": f"{base}/token",
+        "GOOGLE_CREDS_JSON": _fake_service_account(f"{base}/token"),
+        "ACTIVITY_SHEET_ID": sheet_id, "ACTIVITY_SHEET_TAB": tabs["activity"],
+        "CONTENT_LOG_TAB_NAME": tabs["content"], "PUAN_LOG_TAB_NAME": tabs["puan"],
+        "ACTIVITY_MEMBER_ROLE_ID": str(role_id),
+        "ACTIVITY_STATE_FILE": os.path.join(tmp, "activity_state.json"),
+        "PUAN_STATE_FILE": os.path.join(tmp, "puan_state.json"),
+        "SHEET_LAYOUT_FILE": os.path.join(tmp, "sheet_layout.json"),
+        "PUAN_HISTORY_FILE": os.path.join(tmp, "puan_history.bin"),
+        "PLAYER_LINKS_FILE": os.path.join(tmp, "player_links.json"),
+        "STATE_DB_FILE": os.path.join(tmp, "state.db"),
+        "SHEETS_READ_PER_MIN": str(args.read_per_min or 60), "SHEETS_WRITE_PER_MIN": str(args.write_per_min or 60),
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bot  # noqa: E402  (env yukarıda ayarlanmalı)
+
+    guild = _fake_guild(args.members, role_id)
+    client = SimpleNamespace(get_guild=lambda gid: guild, get_channel=lambda cid: None, fetch_user=None)
+    _seed(server, sheet_id, tabs, [m.display_name for m in guild.members], storm_tab, max(args.storm, 1))
+    names = [m.display_name for m in guild.members[: min(20, len(guild.members))]]
+    storm_ref = bot._make_sheet_ref(sheet_id, storm_tab)
+    results = []
+
+    print(f"Fake Sheets: {base} | üye={args.members} | gecikme={args.latency_ms}ms | kota R/W={args.read_per_min}/{args.write_per_min}\n")
+    try:
+        results.append(await _measure(server, "/fullsync (soğuk)", bot._run_full_sync(client)))
+        results.append(await _measure(server, "/fullsync (sıcak)", bot._run_full_sync(client)))
+
+        async def _content_close(name: str):
+            date_str = datetime.now(bot.TR_TZ).strftime("%Y-%m-%d")
+            _, tick_col = await bot._add_content_to_log(name, date_str, "20:00")
+            await bot._mark_content_participation(tick_col, names)
+            await bot._write_content_count_to_puan_log(names)
+
+        results.append(await _measure(server, "content kapatma (yeni sütun)", _content_close("Bench ZvZ")))
+        results.append(await _measure(server, "content kapatma (2.)", _content_close("Bench Ganking")))
+
+        async def _join(member):
+            # sheet_assign_role'ün Sheets kısmı: satırları yükle, eski nick'i sil, yenisini yaz
+            headers, rows = await bot.load_sheet_rows(storm_ref)
+            row = rows[guild.members.index(member) % len(rows)]
+            headers2, _ = await bot.load_sheet_rows(storm_ref)
+            await bot.clear_user_from_sheet(storm_ref, headers2, member.id)
+            await bot.set_role_nick(storm_ref, headers2, row, bot.sheet_user_string(member))
+
+        async def _storm():
+            await asyncio.gather(*(_join(m) for m in guild.members[: args.storm]))
+            await bot.SHEET_WRITES.flush_all()
+
+        results.append(await _measure(server, f"sheet-event join fırtınası ({args.storm})", _storm()))
+    finally:
+        try:
+            await bot.SHEETS_API.close()
+        except Exception:
+            pass
+        await server.stop()
+
+    q = bot.SHEETS_QUOTA.stats()
+    print(f"\nBot kota istatistiği: kullanılan={q['used']} bekleme={q['waited_s']} 429={q['throttled']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+async def run_serve(args) -> None:
+    server = FakeSheetsServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              read_per_min=args.read_per_min, write_per_min=args.write_per_min)
+    for sid in args.sheet or []:
+        server.spreadsheet(sid).add("Sheet1")
+    base = await server.start(port=args.port)
+    print(f"[FAKE SHEETS] {base}  (SHEETS_API_BASE={base}/v4 DRIVE_API_BASE={base}/drive/v3 GOOGLE_TOKEN_URI={base}/token)")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Yerel sahte Google Sheets sunucusu ve Sheets benchmark'ları")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--port", type=int, default=8089 if name == "serve" else 0)
+        p.add_argument("--latency-ms", type=float, default=80.0 if name == "bench" else 0.0)
+        p.add_argument("--jitter-ms", type=float, default=20.0 if name == "bench" else 0.0)
+        p.add_argument("--read-per-min", type=int, default=60)
+        p.add_argument("--write-per-min", type=int, default=60)
+        if name == "serve":
+            p.add_argument("--sheet", action="append", help="Boş spreadsheet oluştur (id); tekrar edilebilir")
+        else:
+            p.add_argument("--members", type=int, default=120)
+            p.add_argument("--storm", type=int, default=30)
+            p.add_argument("--json", default="", help="Sonuçları JSON dosyasına yaz")
+    args = ap.parse_args()
+    asyncio.run(run_bench(args) if args.cmd == "bench" else run_serve(args))
+
+
+if __name__ == "__main__":
+    main()